@@ -2,7 +2,9 @@ package src
 
 import (
 	"bytes"
+	"crypto/sha256"
 	"database/sql"
+	"encoding/hex"
 	"encoding/json"
 	"errors"
 	"fmt"
@@ -29,6 +31,7 @@ var ENDPOINT_MAP = map[string]string{
 	"audio":   BASE + "/file/process/audio",
 	"video":   BASE + "/file/process/video",
 	"image":   BASE + "/file/process/image",
+	"images":  BASE + "/file/process/images",
 	"note":    BASE + "/text/process/note",
 }
 
@@ -94,13 +97,18 @@ func MakeRequest(endpoint string, data []byte, apiKey string) (*http.Response, e
 	client := &http.Client{
 		Timeout: 30 * time.Hour,
 	}
-	req, err := http.NewRequest("POST", FAST_API_SERVER+endpoint, bytes.NewBuffer(data))
+	// Only ids and the title are read from the response, so skip the transcript and chunks
+	req, err := http.NewRequest("POST", FAST_API_SERVER+endpoint+"?response_mode=summary", bytes.NewBuffer(data))
 	if err != nil {
 		log.Printf("Failed to create request: %s", err)
 		return nil, err
 	}
 	req.Header.Set("x-api-key", apiKey)
 	req.Header.Set("Content-Type", "application/json")
+	// Retries of a task send the same payload, so the processor can
+	// recognise them and return the original result instead of re-ingesting
+	payloadHash := sha256.Sum256(append([]byte(endpoint+"\n"), data...))
+	req.Header.Set("Idempotency-Key", hex.EncodeToString(payloadHash[:]))
 	resp, err := client.Do(req)
 	if err != nil {
 		log.Printf("Failed to send request: %s", err)
@@ -1,12 +1,17 @@
 import time
 import uuid
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException
 
-from app.schemas.Common import AgentResponseWrapper
-from app.schemas.Media import (AudioRequest, FileRequest, ImageRequest,
-                               VideoRequest)
+from app.schemas.Common import AgentResponse, AgentResponseWrapper
+from app.schemas.Media import (AudioRequest, FileRequest, ImageBatchRequest,
+                               ImageRequest, VideoRequest)
 from app.services import AudioService, FileService, ImageService, VideoService
+from app.services.IdempotencyService import IDEMPOTENCY_HEADER, run_idempotent
+from app.services.JobService import (PREFER_HEADER, IngestionJob,
+                                     prefers_async, submit_job)
+from app.services.ResponseService import RESPONSE_MODE_QUERY, render_response
 from app.utils.app_logger_config import logger
 
 router = APIRouter(
@@ -16,52 +21,99 @@ router = APIRouter(
 
 
 @router.post("/process/pdf")
-async def process_pdf(request: FileRequest) -> AgentResponseWrapper:
+async def process_pdf(request: FileRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process  pdf, and transcribe."""
     try:
         req_id = str(uuid.uuid4())
         logger.info(f"Processing PDF with request id: {req_id}")
-        start_time = time.time()
-        transcription = await FileService.extract_text_from_pdf(request.file_id, request.metadata)
+        started_at = time.time()
+        job = IngestionJob(
+            "pdf", "file:pdf", request, request.metadata.user_id,
+            lambda: FileService.extract_text_from_pdf(request.file_id, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
         logger.info(
-            f"Request {req_id}  processed in {time.time() - start_time} seconds")
-        return AgentResponseWrapper(
-            response=transcription
-        )
+            f"Request {req_id}  processed in {time.time() - started_at} seconds")
+        return render_response(transcription, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/process/audio")
-async def process_audio(request: AudioRequest) -> dict:
+async def process_audio(request: AudioRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process  audio, and transcribe."""
     try:
-        transcription = await AudioService.get_audio_transcript(request.video_id)
-        return transcription
+        started_at = time.time()
+        job = IngestionJob(
+            "audio", "file:audio", request, request.metadata.user_id,
+            lambda: AudioService.get_audio_transcript(request.audio_id, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+        return render_response(transcription, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/process/video")
-async def process_video(request: VideoRequest) -> AgentResponseWrapper:
+async def process_video(request: VideoRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process video, extract audio, and transcribe."""
     try:
-        transcription = await VideoService.get_video_transcript(request.video_id, request.metadata)
-        return AgentResponseWrapper(
-            response=transcription
-        )
+        started_at = time.time()
+        job = IngestionJob(
+            "video", "file:video", request, request.metadata.user_id,
+            lambda: VideoService.get_video_transcript(request.video_id, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+        return render_response(transcription, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/process/image")
-async def process_image(request: ImageRequest) -> AgentResponseWrapper:
+async def process_image(request: ImageRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process  image, and transcribe."""
     try:
-        transcription = await ImageService.get_image_transcript(
-            request.image_id, request.metadata)
-        return AgentResponseWrapper(
-            response=transcription
-        )
+        started_at = time.time()
+        job = IngestionJob(
+            "image", "file:image", request, request.metadata.user_id,
+            lambda: ImageService.get_image_transcript(request.image_id, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+        return render_response(transcription, response_mode, started_at)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/process/images")
+async def process_images(request: ImageBatchRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
+    """Process several images as a single memory."""
+    try:
+        started_at = time.time()
+        job = IngestionJob(
+            "images", "file:images", request, request.metadata.user_id,
+            lambda: ImageService.get_batch_image_transcript(request.image_ids, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+        return render_response(transcription, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,22 @@
+import time
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
 
-from app.schemas.Common import AgentResponseWrapper
-from app.schemas.Integration import GDriveRequest, NotionRequest
-from app.services import GDriveService, NotionService
+from app.schemas.Common import (AgentBatchResponseWrapper, AgentResponse,
+                                AgentResponseWrapper)
+from app.schemas.Integration import (GDriveFolderRequest, GDriveRequest,
+                                     GDriveSyncRequest, GDriveSyncResponse,
+                                     NotionRequest, NotionSyncRequest,
+                                     NotionSyncResponse)
+from app.services import (GDriveService, GDriveSyncService, NotionService,
+                          NotionSyncService)
+from app.services.IdempotencyService import IDEMPOTENCY_HEADER, run_idempotent
+from app.services.JobService import (PREFER_HEADER, IngestionJob,
+                                     prefers_async, submit_job)
+from app.services.ResponseService import (RESPONSE_MODE_QUERY,
+                                          render_batch_response,
+                                          render_response)
 
 router = APIRouter(
     prefix='/integration',
@@ -11,24 +25,95 @@ router = APIRouter(
 
 
 @router.post("/process/notion")
-async def process_notion(request: NotionRequest) -> AgentResponseWrapper:
+async def process_notion(request: NotionRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     try:
-        response = await NotionService.extract_text_from_notion_page(access_token=request.access_token, resource_link=request.page_id, metadata=request.metadata)
+        started_at = time.time()
+        job = IngestionJob(
+            "notion", "integration:notion", request, request.metadata.user_id,
+            lambda: NotionService.extract_text_from_notion_page(access_token=request.access_token, resource_link=request.page_id, metadata=request.metadata, crawl_child_pages=request.crawl_child_pages))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        response = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
 
-        return AgentResponseWrapper(
-            response=response
-        )
+        return render_response(response, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/process/gdrive")
-async def process_notion(request: GDriveRequest) -> AgentResponseWrapper:
+async def process_notion(request: GDriveRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
+    try:
+        started_at = time.time()
+        job = IngestionJob(
+            "gdrive", "integration:gdrive", request, request.metadata.user_id,
+            lambda: GDriveService.extract_text_from_drive_file(access_token=request.access_token, resource_link=request.file_id, metadata=request.metadata, refresh_token=request.refresh_token))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        response = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+
+        return render_response(response, response_mode, started_at)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/process/gdrive/folder")
+async def process_gdrive_folder(request: GDriveFolderRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentBatchResponseWrapper:
+    try:
+        started_at = time.time()
+        if not request.folder_id and not request.file_ids:
+            raise ValueError("Either folder_id or file_ids is required")
+        job = IngestionJob(
+            "gdrive_folder", "integration:gdrive:folder", request, request.metadata.user_id,
+            lambda: GDriveService.extract_text_from_drive_files(
+                access_token=request.access_token, metadata=request.metadata, refresh_token=request.refresh_token,
+                folder_id=request.folder_id, file_ids=request.file_ids, recursive=request.recursive))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        batch = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentBatchResponseWrapper, job.execute)
+        return render_batch_response(batch, response_mode, started_at)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/sync/gdrive")
+async def sync_gdrive(request: GDriveSyncRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER) -> GDriveSyncResponse:
     try:
-        response = await GDriveService.extract_text_from_drive_file(access_token=request.access_token, resource_link=request.file_id, metadata=request.metadata, refresh_token=request.refresh_token)
+        job = IngestionJob(
+            "sync", "integration:sync:gdrive", request, request.metadata.user_id,
+            lambda: GDriveSyncService.sync_user_drive_files(
+                access_token=request.access_token, metadata=request.metadata, refresh_token=request.refresh_token))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key)
+        return await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, GDriveSyncResponse, job.execute)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return AgentResponseWrapper(
-            response=response
-        )
+
+@router.post("/sync/notion")
+async def sync_notion(request: NotionSyncRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER) -> NotionSyncResponse:
+    try:
+        job = IngestionJob(
+            "sync", "integration:sync:notion", request, request.metadata.user_id,
+            lambda: NotionSyncService.sync_user_notion_pages(
+                access_token=request.access_token, metadata=request.metadata,
+                page_ids=request.page_ids, crawl_child_pages=request.crawl_child_pages))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key)
+        return await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, NotionSyncResponse, job.execute)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException
+
+from app.schemas.Jobs import JobStatus
+from app.services.JobService import USER_ID_QUERY, get_job_status
+
+router = APIRouter(
+    prefix='/jobs',
+    responses={404: {"description": "Not found in jobs route"}},
+)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, user_id: str = USER_ID_QUERY) -> JobStatus:
+    """Status, and once finished the result, of a job submitted with Prefer: respond-async."""
+    status = get_job_status(job_id)
+    # Another user's job is reported as missing, not forbidden
+    if status is None or status.user_id != user_id:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return status
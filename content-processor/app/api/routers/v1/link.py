@@ -1,8 +1,15 @@
+import time
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
 
 from app.schemas import Link
-from app.schemas.Common import AgentResponseWrapper
+from app.schemas.Common import AgentResponse, AgentResponseWrapper
 from app.services import LinkService
+from app.services.IdempotencyService import IDEMPOTENCY_HEADER, run_idempotent
+from app.services.JobService import (PREFER_HEADER, IngestionJob,
+                                     prefers_async, submit_job)
+from app.services.ResponseService import RESPONSE_MODE_QUERY, render_response
 from app.utils.app_logger_config import logger
 
 router = APIRouter(
@@ -12,14 +19,20 @@ router = APIRouter(
 
 
 @router.post("/process/git")
-async def process_git_link(request: Link.GitLinkRequest) -> AgentResponseWrapper:
+async def process_git_link(request: Link.GitLinkRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process  link, and transcribe."""
     try:
-        transcription = await LinkService.get_code_from_git_repo(
-            request.repo_url, request.metadata)
-        return AgentResponseWrapper(
-            response=transcription
-        )
+        started_at = time.time()
+        job = IngestionJob(
+            "git", "link:git", request, request.metadata.user_id,
+            lambda: LinkService.get_code_from_git_repo(request.repo_url, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+        return render_response(transcription, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -28,17 +41,21 @@ async def process_git_link(request: Link.GitLinkRequest) -> AgentResponseWrapper
     "/process/youtube",
     response_model=AgentResponseWrapper,
 )
-async def process_youtube_link(request: Link.YoutubeLinkRequest) -> AgentResponseWrapper:
+async def process_youtube_link(request: Link.YoutubeLinkRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process  link, and transcribe."""
     try:
-        transcription = await LinkService.get_youtube_video_transcript(
-            request.video_url, request.metadata)
-        print(transcription)
-        print("here")
-        return AgentResponseWrapper(
-            response=transcription
-        )
+        started_at = time.time()
+        job = IngestionJob(
+            "youtube", "link:youtube", request, request.metadata.user_id,
+            lambda: LinkService.get_youtube_video_transcript(request.video_url, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+        return render_response(transcription, response_mode, started_at)
         # return transcription
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing youtube link: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -48,13 +65,19 @@ async def process_youtube_link(request: Link.YoutubeLinkRequest) -> AgentRespons
     "/process/web",
     response_model=AgentResponseWrapper,
 )
-async def process_web_link(request: Link.WebLinkRequest) -> AgentResponseWrapper:
+async def process_web_link(request: Link.WebLinkRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process  link, and transcribe."""
     try:
-        transcription = await LinkService.get_web_scraped_data(
-            request.url, request.metadata)
-        return AgentResponseWrapper(
-            response=transcription
-        )
+        started_at = time.time()
+        job = IngestionJob(
+            "web", "link:web", request, request.metadata.user_id,
+            lambda: LinkService.get_web_scraped_data(request.url, request.metadata))
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        transcription = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
+        return render_response(transcription, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,9 +1,15 @@
+import time
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
 
 from app.core.agents.TextAgent import TextAgent
-from app.schemas.Common import AgentResponseWrapper
-from app.schemas.Metadata import Metadata, NoteSpecificMd
+from app.schemas.Common import AgentResponse, AgentResponseWrapper
+from app.schemas.Text import TextRequest
+from app.services.IdempotencyService import IDEMPOTENCY_HEADER, run_idempotent
+from app.services.JobService import (PREFER_HEADER, IngestionJob,
+                                     prefers_async, submit_job)
+from app.services.ResponseService import RESPONSE_MODE_QUERY, render_response
 from app.utils.app_logger_config import logger
 
 router = APIRouter(
@@ -12,22 +18,24 @@ router = APIRouter(
 )
 
 
-class TextRequest(BaseModel):
-    text: str
-    metadata: Metadata[NoteSpecificMd]
-
-
 @router.post("/process/note")
-async def process_text(request: TextRequest) -> AgentResponseWrapper:
+async def process_text(request: TextRequest, idempotency_key: Optional[str] = IDEMPOTENCY_HEADER, prefer: Optional[str] = PREFER_HEADER, response_mode: str = RESPONSE_MODE_QUERY) -> AgentResponseWrapper:
     """Process text content and store it with embeddings."""
     try:
+        started_at = time.time()
         # Initialize and process with TextAgent
         agent = TextAgent(text=request.text, md=request.metadata)
-        response = await agent.process_media()
+        job = IngestionJob(
+            "note", "text:note", request, request.metadata.user_id,
+            agent.process_media)
+        if prefers_async(prefer):
+            return await submit_job(job, idempotency_key, response_mode)
+        response = await run_idempotent(
+            idempotency_key, job.scope, request, job.user_id, AgentResponse, job.execute)
 
-        return AgentResponseWrapper(
-            response=response
-        )
+        return render_response(response, response_mode, started_at)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing text: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
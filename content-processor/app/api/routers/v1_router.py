@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routers.v1 import files, integration, link, text
+from app.api.routers.v1 import files, integration, jobs, link, text
 
 router = APIRouter(
     prefix='/v1',
@@ -11,6 +11,7 @@ router.include_router(files.router)
 router.include_router(link.router)
 router.include_router(integration.router)
 router.include_router(text.router)
+router.include_router(jobs.router)
 # router.include_router(audio.router)
 # router.include_router(image.router)
 # router.include_router(video.router)
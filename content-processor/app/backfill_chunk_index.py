@@ -0,0 +1,75 @@
+"""
+Backfill Memory.chunkIndex and build the indexes that use it.
+
+Rows written before the column existed only carry the position in their
+chunkId suffix (``<memId>_<n>``, or a bare ``<n>`` for config-file chunks
+of older git memories). This fills chunkIndex in small batches so
+the table is never locked for long, then creates the
+(userId, memId, chunkIndex) and (chunkId) indexes concurrently. Safe to run
+again; run it once after deploying the schema change:
+
+    python -m app.backfill_chunk_index
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from .prisma import prisma
+from .utils.app_logger_config import logger
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "5000"))
+
+ADD_COLUMN = 'ALTER TABLE "Memory" ADD COLUMN IF NOT EXISTS "chunkIndex" INTEGER'
+
+BACKFILL_BATCH = '''
+    UPDATE "Memory" SET "chunkIndex" = substring("chunkId" from '([0-9]+)$')::int
+    WHERE ctid IN (
+        SELECT ctid FROM "Memory"
+        WHERE "chunkIndex" IS NULL AND "chunkId" ~ '(^|_)[0-9]+$'
+        LIMIT $1
+    )
+'''
+
+# Same names Prisma gives the @@index entries in schema.prisma
+CREATE_INDEXES = [
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "Memory_userId_memId_chunkIndex_idx" '
+    'ON "Memory" ("userId", "memId", "chunkIndex")',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "Memory_chunkId_idx" ON "Memory" ("chunkId")',
+]
+
+
+async def backfill(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    await prisma.prisma.execute_raw(ADD_COLUMN)
+
+    total = 0
+    while True:
+        updated = await prisma.prisma.execute_raw(BACKFILL_BATCH, batch_size)
+        if not updated:
+            break
+        total += updated
+        logger.info(f"Backfilled chunkIndex on {total} rows")
+
+    partitioned = await prisma.prisma.query_raw(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('\"Memory\"')")
+    # app.partition_tables creates these on partitioned tables, where CONCURRENTLY is not allowed
+    if not partitioned:
+        for statement in CREATE_INDEXES:
+            await prisma.prisma.execute_raw(statement)
+    return total
+
+
+async def main():
+    await prisma.prisma.connect()
+    try:
+        total = await backfill()
+        logger.info(f"chunkIndex backfill done, {total} rows updated")
+    finally:
+        await prisma.prisma.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
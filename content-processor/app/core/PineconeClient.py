@@ -1,12 +1,20 @@
 import os
 
+from cortex_shared import providers
 from dotenv import load_dotenv
-from pinecone import Pinecone
 
 if (os.path.exists('.env')):
     load_dotenv()
 
 
+def _pinecone():
+    from pinecone import Pinecone
+    return Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+
+
+_pinecone_client = providers.register("pinecone", _pinecone)
+
+
 class PineconeClient:
     def __init__(self):
         self.api_key = os.getenv("PINECONE_API_KEY")
@@ -16,11 +24,8 @@ class PineconeClient:
         self.client = self.connect()
 
     def connect(self):
-        try:
-            return Pinecone(api_key=self.api_key)
-        except Exception as e:
-            print(f"Error connecting to Pinecone: {e}")
-            return None
+        # Shared by every PineconeClient in the process; the SDK loads on first use
+        return _pinecone_client
 
     def create_index(self):
         try:
@@ -1,10 +1,11 @@
+import asyncio
 import logging
 import os
 import re
 import time
 import uuid
 from abc import ABC, abstractmethod
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 
 from dotenv import load_dotenv
 
@@ -14,9 +15,17 @@ from app.core.voyage import voyage_client
 from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import (GitSpecificMd, Metadata, TextSpecificMd,
                                   YouTubeSpecificMd)
+from app.services.ArtifactService import (SourceArtifact, get_remote_head_sha,
+                                          git_artifact_key, load_artifact,
+                                          save_artifact, web_artifact_key,
+                                          youtube_artifact_key)
+from app.services.EnrichmentService import (TWO_PHASE_INGESTION,
+                                            embed_raw_chunks,
+                                            schedule_enrichment)
 from app.services.MemoryService import insert_many_memories_to_db
 from app.services.youtube_transcription import TranscriptChunker
 from app.utils.app_logger_config import logger
+from app.utils.chunk_metadata import ChunkMetadata
 from app.utils.chunk_processing import update_chunks
 from app.utils.Link import extract_code_from_repo
 from app.utils.status_tracking import TRACKER, ProcessingStatus
@@ -54,6 +63,12 @@ class LinkAgent(ABC, Generic[T]):
 
     async def embed_and_store_chunks(self, chunks: List[str], metadata: List[Metadata], isCode=False):
         try:
+            if TWO_PHASE_INGESTION:
+                self.pending_enrichment = dict(
+                    md=self.md.model_copy(), chunks=chunks, metadata=metadata, is_code=isCode)
+                await embed_raw_chunks(self.md, chunks, metadata, isCode)
+                return
+
             title = self.md.title
             description = self.md.description
             preprocessed_chunks = await update_chunks(chunks=chunks, memoryId=self.md.memId, userId=self.md.user_id)
@@ -65,7 +80,7 @@ class LinkAgent(ABC, Generic[T]):
 
             TRACKER.update_status(
                 self.md.user_id, self.md.memId, ProcessingStatus.CREATING_EMBEDDINGS, 85)
-            embeddings = voyage_client.get_embeddings(
+            embeddings = await voyage_client.embed(
                 preprocessed_chunks, isCode)
 
             vectors = get_vectors(metadata, embeddings)
@@ -81,6 +96,76 @@ class LinkAgent(ABC, Generic[T]):
             )
             raise RuntimeError(f"Error embedding and storing chunks: {str(e)}")
 
+    def start_enrichment(self, update_search: bool = False) -> None:
+        """Queue contextualization of the chunks stored by the fast phase."""
+        pending = getattr(self, "pending_enrichment", None)
+        self.pending_enrichment = None
+        if pending is not None:
+            schedule_enrichment(**pending, update_search=update_search)
+
+    async def store_source_vectors(self, artifact: Optional[SourceArtifact], key: Optional[str], chunks: List[str], metadata: List[Metadata], title: str, description: str, isCode=False, chunk_details: List[dict] = [], extra: dict = {}) -> None:
+        """
+        Store this user's vectors for a public source, from its cached
+        ``artifact`` if there is one. Otherwise the artifact is built, or,
+        with two-phase ingestion, raw chunks are embedded now and the
+        queued enrichment builds it (see start_enrichment).
+        """
+        if artifact is None and key is not None and TWO_PHASE_INGESTION:
+            await self.embed_and_store_chunks(chunks, metadata, isCode)
+            self.pending_enrichment["artifact"] = dict(
+                key=key, title=title, description=description, chunk_details=chunk_details, extra=extra)
+            return
+        if artifact is None and key is not None:
+            artifact = await self.build_artifact(
+                key, chunks, title, description, isCode, chunk_details, extra)
+        if artifact is not None:
+            await self.store_artifact_vectors(artifact, metadata)
+        else:
+            await self.embed_and_store_chunks(chunks, metadata, isCode)
+
+    async def build_artifact(self, key: str, chunks: List[str], title: str, description: str, isCode=False, chunk_details: List[dict] = [], extra: dict = {}) -> SourceArtifact:
+        """
+        Contextualize and embed the chunks of a public source and cache the
+        result for every user. Embeddings use the source's own title and
+        description so they are valid for anyone ingesting it.
+        """
+        try:
+            contextualized = await update_chunks(chunks=chunks, memoryId=self.md.memId, userId=self.md.user_id)
+            TRACKER.update_status(
+                self.md.user_id, self.md.memId, ProcessingStatus.CREATING_EMBEDDINGS, 85)
+            embeddings = await voyage_client.embed(
+                [title + " " + description + " " + chunk for chunk in contextualized], isCode)
+            artifact = SourceArtifact(
+                key=key,
+                chunks=chunks,
+                contextualized=contextualized,
+                embeddings=embeddings,
+                title=title,
+                description=description,
+                chunk_details=chunk_details,
+                extra=extra,
+            )
+            await asyncio.to_thread(save_artifact, artifact)
+            return artifact
+        except Exception as e:
+            TRACKER.update_status(
+                user_id=self.md.user_id, document_id=self.md.memId, status=ProcessingStatus.FAILED, progress=100
+            )
+            raise RuntimeError(f"Error building source artifact: {str(e)}")
+
+    async def store_artifact_vectors(self, artifact: SourceArtifact, metadata: List[Metadata]):
+        """Upsert the artifact's embeddings under this user's memory."""
+        try:
+            vectors = get_vectors(metadata, artifact.embeddings)
+            pinecone_client = PineconeClient()
+            res = pinecone_client.upsert(vectors, 100)
+            logger.debug(res)
+        except Exception as e:
+            TRACKER.update_status(
+                user_id=self.md.user_id, document_id=self.md.memId, status=ProcessingStatus.FAILED, progress=100
+            )
+            raise RuntimeError(f"Error embedding and storing chunks: {str(e)}")
+
 
 class GitAgent(LinkAgent[GitSpecificMd]):
     """
@@ -112,28 +197,50 @@ class GitAgent(LinkAgent[GitSpecificMd]):
 
             TRACKER.create_status(
                 self.md.user_id, memId, self.md.title)
-            code = extract_code_from_repo(
-                repo_url=repo_url, metadata=self.md, mem_id=memId)
 
-            chunks = code.chunks
-            meta_chunks = code.metadata
-            content = code.transcript
-
-            # Add memory id to chunks' metadata
-            for meta in meta_chunks:
-                meta.memId = memId
-
-            await self.embed_and_store_chunks(chunks, meta_chunks, isCode=True)
+            # A repo at a given commit is the same for everyone who ingests it
+            commit_sha = await asyncio.to_thread(get_remote_head_sha, repo_url)
+            artifact_key = git_artifact_key(
+                repo_url, commit_sha) if commit_sha else None
+            artifact = await asyncio.to_thread(load_artifact, artifact_key) if artifact_key else None
+
+            if artifact is not None:
+                chunks = artifact.chunks
+                content = "\n".join(chunks)
+                meta_chunks = ChunkMetadata(self.md, GitSpecificMd)
+                for i, details in enumerate(artifact.chunk_details):
+                    meta_chunks.append(**details, chunk_id=f"{memId}_{i}")
+            else:
+                # Cloning and chunking block; keep them off the event loop
+                code = await asyncio.to_thread(
+                    extract_code_from_repo, repo_url=repo_url, metadata=self.md, mem_id=memId)
+
+                chunks = code.chunks
+                meta_chunks = code.metadata
+                content = code.transcript
+                if not chunks:
+                    raise ValueError(
+                        f"Could not extract any code from {repo_url}")
+
+            await self.store_source_vectors(
+                artifact, artifact_key, chunks, meta_chunks,
+                title=repo_url.rstrip("/").removesuffix(".git").split("/", 3)[-1],
+                description="",
+                isCode=True,
+                chunk_details=[{key: value for key, value in meta_chunks.specific(i).items() if key != "chunk_id"}
+                               for i in range(len(meta_chunks))],
+            )
             TRACKER.update_status(
                 self.md.user_id, memId, ProcessingStatus.STORING_DOCUMENT, 85)
             await self.store_memory_in_database(chunks, meta_chunks, memId)
+            self.start_enrichment()
 
             TRACKER.update_status(
                 self.md.user_id, memId, ProcessingStatus.COMPLETED, 100)
 
             return AgentResponse(
                 chunks=chunks,
-                metadata=meta_chunks,
+                metadata=meta_chunks.to_list(),
                 transcript=content,
                 userId=self.md.user_id,
                 memoryId=memId,
@@ -150,22 +257,9 @@ class GitAgent(LinkAgent[GitSpecificMd]):
 
             raise RuntimeError(f"Error processing Git repository: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], meta_chunks: List[GitSpecificMd], memId: str) -> None:
+    async def store_memory_in_database(self, chunks: List[str], meta_chunks: ChunkMetadata, memId: str) -> None:
         try:
-            memories = []
-            for i, (chunk, meta) in enumerate(zip(chunks, meta_chunks)):
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f"{memId}_{i}",
-                    "title": self.md.title,
-                    "memData": chunk,
-                    "memType": 'git',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": meta.json(),
-                }
-                memories.append(mem_data)
+            memories = meta_chunks.rows('git', chunks)
 
             # Store memory in database using batches
             batch_size = 100
@@ -225,9 +319,19 @@ class YoutubeAgent(LinkAgent[YouTubeSpecificMd]):
             TRACKER.update_status(
                 self.md.user_id, memId, ProcessingStatus.PROCESSING, 20
             )
-            chunks, video_title, video_desc, author, channel_name = await self.chunker.process_video(
-                video_url, api_url
-            )
+            artifact_key = youtube_artifact_key(video_id)
+            artifact = await asyncio.to_thread(load_artifact, artifact_key)
+            if artifact is not None:
+                chunks = [{"text": text, **details}
+                          for text, details in zip(artifact.chunks, artifact.chunk_details)]
+                video_title = artifact.title
+                video_desc = artifact.description
+                author = artifact.extra.get("author", "Unknown")
+                channel_name = artifact.extra.get("channel_name", "Unknown")
+            else:
+                chunks, video_title, video_desc, author, channel_name = await self.chunker.process_video(
+                    video_url, api_url
+                )
             extract_end = time.time()
             logger.info(
                 f"Transcript extraction took {extract_end - extract_start:.2f} seconds")
@@ -240,12 +344,12 @@ class YoutubeAgent(LinkAgent[YouTubeSpecificMd]):
 
             # Create metadata for each chunk
             metadata_start = time.time()
-            meta_chunks = []
+            meta_chunks = ChunkMetadata(self.md, YouTubeSpecificMd)
             formatted_chunks = []
 
             for i, chunk in enumerate(chunks):
-                # Create YouTube specific metadata
-                ymd = YouTubeSpecificMd(
+                # YouTube specific metadata; the base metadata is shared
+                meta_chunks.append(
                     video_id=video_id,
                     chunk_id=f'{memId}_{i}',
                     channel_name=channel_name,
@@ -254,11 +358,6 @@ class YoutubeAgent(LinkAgent[YouTubeSpecificMd]):
                     end_time=format_timestamp(chunk['end_time']),
                 )
 
-                # Copy base metadata and add specific metadata
-                md_copy = self.md.model_copy()
-                md_copy.specific_desc = ymd
-                meta_chunks.append(md_copy)
-
                 # Format chunk for storage
                 formatted_chunks.append(chunk['text'])
 
@@ -268,7 +367,12 @@ class YoutubeAgent(LinkAgent[YouTubeSpecificMd]):
 
             embed_start = time.time()
 
-            await self.embed_and_store_chunks(formatted_chunks, meta_chunks)
+            await self.store_source_vectors(
+                artifact, artifact_key, formatted_chunks, meta_chunks, video_title, video_desc,
+                chunk_details=[{"start_time": chunk['start_time'], "end_time": chunk['end_time']}
+                               for chunk in chunks],
+                extra={"author": author, "channel_name": channel_name},
+            )
             embed_end = time.time()
             logger.info(
                 f"Embedding and storing took {embed_end - embed_start:.2f} seconds")
@@ -279,6 +383,7 @@ class YoutubeAgent(LinkAgent[YouTubeSpecificMd]):
                 self.md.user_id, memId, ProcessingStatus.STORING_DOCUMENT, 85
             )
             await self.store_memory_in_database(formatted_chunks, meta_chunks, memId)
+            self.start_enrichment()
             store_end = time.time()
             logger.info(
                 f"Storing memory took {store_end - store_start:.2f} seconds")
@@ -297,7 +402,7 @@ class YoutubeAgent(LinkAgent[YouTubeSpecificMd]):
             return AgentResponse(
                 transcript=full_transcript,
                 chunks=formatted_chunks,
-                metadata=meta_chunks,
+                metadata=meta_chunks.to_list(),
                 userId=self.md.user_id,
                 memoryId=memId,
             )
@@ -308,22 +413,9 @@ class YoutubeAgent(LinkAgent[YouTubeSpecificMd]):
             )
             raise Exception(f"Error processing YouTube video: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], meta_chunks: List[TextSpecificMd], memId: str):
+    async def store_memory_in_database(self, chunks: List[str], meta_chunks: ChunkMetadata, memId: str):
         try:
-            memories = []
-            for i, (chunk, meta) in enumerate(zip(chunks, meta_chunks)):
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f"{memId}_{i}",
-                    "title": self.md.title,
-                    "memData": chunk,
-                    "memType": 'youtube',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": meta.json(),
-                }
-                memories.append(mem_data)
+            memories = meta_chunks.rows('youtube', chunks)
 
             batch_size = 100
             for i in range(0, len(memories), batch_size):
@@ -361,30 +453,29 @@ class WebAgent(LinkAgent[TextSpecificMd]):
                 description = response.get("data").get("description")
 
                 content = re.sub(r'<[^>]+>', '', content)
-                chunks = use_jina.segment_data(content)
+                artifact_key = web_artifact_key(link, content)
+                artifact = await asyncio.to_thread(load_artifact, artifact_key)
+                chunks = artifact.chunks if artifact is not None else await use_jina.segment_data(
+                    content)
 
                 self.md.memId = memId
                 self.md.title += " " + title
                 self.md.description += " " + description
-                meta_chunks = []
+                meta_chunks = ChunkMetadata(self.md, TextSpecificMd)
                 for i in range(len(chunks)):
-                    tmd = TextSpecificMd(
-                        chunk_id=f'{memId}_{i}',
-                        url=link,
-                    )
-                    md_copy = self.md.model_copy()
-                    md_copy.specific_desc = tmd
-                    meta_chunks.append(md_copy)
-
-                await self.embed_and_store_chunks(chunks, meta_chunks)
+                    meta_chunks.append(chunk_id=f'{memId}_{i}', url=link)
+
+                await self.store_source_vectors(
+                    artifact, artifact_key, chunks, meta_chunks, title, description)
                 TRACKER.update_status(
                     self.md.user_id, memId, ProcessingStatus.STORING_DOCUMENT, 85)
                 await self.store_memory_in_database(chunks, meta_chunks, memId)
+                self.start_enrichment()
                 TRACKER.update_status(
                     self.md.user_id, memId, ProcessingStatus.COMPLETED, 100)
                 return AgentResponse(
                     chunks=chunks,
-                    metadata=meta_chunks,
+                    metadata=meta_chunks.to_list(),
                     transcript=content,
                     userId=self.md.user_id,
                     memoryId=memId,
@@ -395,22 +486,9 @@ class WebAgent(LinkAgent[TextSpecificMd]):
             )
             raise Exception(f"Error processing web page: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], meta_chunks: List[TextSpecificMd], memId: str):
+    async def store_memory_in_database(self, chunks: List[str], meta_chunks: ChunkMetadata, memId: str):
         try:
-            memories = []
-            for i, (chunk, meta) in enumerate(zip(chunks, meta_chunks)):
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f"{memId}_{i}",
-                    "title": self.md.title,
-                    "memData": chunk,
-                    "memType": 'web',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": meta.json(),
-                }
-                memories.append(mem_data)
+            memories = meta_chunks.rows('web', chunks)
 
             batch_size = 100
             for i in range(0, len(memories), batch_size):
@@ -1,28 +1,43 @@
+import asyncio
+import bisect
 import io
+import os
 import uuid
 from abc import ABC, abstractmethod
-from typing import Generic, List, TypeVar
+from typing import Dict, Generic, List, Optional, Tuple, TypeVar
 
-from PIL import Image
-from PyPDF2 import PdfReader
+from cortex_shared import providers
 
 from app.core.jina_ai import use_jina
 from app.core.PineconeClient import PineconeClient
 from app.core.voyage import voyage_client
 from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import ImageSpecificMd, MediaSpecificMd, Metadata
+from app.services.CheckpointService import (NO_CHECKPOINT, JobCheckpoint,
+                                            make_job_id)
+from app.services.EnrichmentService import (TWO_PHASE_INGESTION,
+                                            embed_raw_chunks,
+                                            schedule_enrichment)
 from app.services.MemoryService import insert_many_memories_to_db
 from app.utils.app_logger_config import logger
 from app.utils.AV import (extract_audio_from_video,
                           process_audio_for_transcription)
+from app.utils.chunk_metadata import ChunkMetadata
 from app.utils.chunk_processing import update_chunks
 # from app.utils.chunk_preprocessing import update_chunks
-from app.utils.image import ImageDescriptionGenerator
+from app.utils.image import (ImageDescriptionGenerator, PreparedImage,
+                             prepare_image)
 from app.utils.s3 import S3Operations
 from app.utils.status_tracking import TRACKER, ProcessingStatus
-from app.utils.Vectors import combine_data_chunks, get_vectors
+from app.utils.Vectors import get_vectors, memory_data
 
 s3Opr = S3Operations()
+PyPDF2 = providers.lazy_import("PyPDF2")
+
+# Shared across all batch requests on this worker so one large upload cannot
+# monopolise S3, tesseract and Gemini quota.
+IMAGE_BATCH_LIMITER = asyncio.Semaphore(
+    int(os.getenv("IMAGE_BATCH_CONCURRENCY", "6")))
 
 T = TypeVar('T', MediaSpecificMd, ImageSpecificMd)
 
@@ -32,6 +47,9 @@ class MediaAgent(ABC, Generic[T]):
         super().__init__()
         self.s3_media_key = s3_media_key
         self.md = md
+        # Consumer retries resend the same payload, so they resume this job
+        self.checkpoint: JobCheckpoint = JobCheckpoint(make_job_id(
+            md.user_id, md.type, s3_media_key, md.created_at)) if s3_media_key else NO_CHECKPOINT
 
     @abstractmethod
     async def process_media(self) -> AgentResponse:
@@ -43,9 +61,15 @@ class MediaAgent(ABC, Generic[T]):
 
     async def embed_and_store_chunks(self, chunks: List[str], metadata: List[Metadata]):
         try:
+            if TWO_PHASE_INGESTION:
+                self.pending_enrichment = (
+                    self.md.model_copy(), chunks, metadata, False)
+                return await embed_raw_chunks(self.md, chunks, metadata, False, self.checkpoint)
+
             logger.debug(f"Embedding and storing chunks: {len(chunks)}")
 
-            preprocessed_chunks = await update_chunks(chunks=chunks, userId=self.md.user_id, memoryId=self.md.memId)
+            preprocessed_chunks = await self.checkpoint.stage("contextualized", lambda: update_chunks(
+                chunks=chunks, userId=self.md.user_id, memoryId=self.md.memId))
 
             title = self.md.title
             description = self.md.description
@@ -53,7 +77,8 @@ class MediaAgent(ABC, Generic[T]):
             preprocessed_chunks = [
                 title + " " + description + " " + chunk for chunk in preprocessed_chunks]
 
-            embeddings = voyage_client.get_embeddings(preprocessed_chunks)
+            embeddings = await self.checkpoint.stage(
+                "embeddings", lambda: voyage_client.embed(preprocessed_chunks))
             logger.debug(f"Length after embedding: {len(embeddings)}")
 
             logger.debug(f"Embedding dimensions: {len(embeddings[0])}")
@@ -71,35 +96,49 @@ class MediaAgent(ABC, Generic[T]):
         except Exception as e:
             raise RuntimeError(f"Error embedding and storing chunks: {str(e)}")
 
+    def start_enrichment(self, update_search: bool = False) -> None:
+        """Queue contextualization of the chunks stored by the fast phase."""
+        pending = getattr(self, "pending_enrichment", None)
+        self.pending_enrichment = None
+        if pending is not None:
+            schedule_enrichment(*pending, update_search=update_search)
+
 
 class VideoAgent(MediaAgent):
     async def process_media(self) -> AgentResponse:
         try:
-            memId = str(uuid.uuid4())
+            memId = await self.checkpoint.stage("memory_id", lambda: str(uuid.uuid4()))
             self.md.memId = memId
 
             TRACKER.create_status(
                 user_id=self.md.user_id, document_id=memId, document_title=self.md.title
             )
 
-            video_bytes = s3Opr.download_object(object_key=self.s3_media_key)
-            audio_content = await extract_audio_from_video(video_bytes)
+            async def transcribe() -> dict:
+                video_bytes = s3Opr.download_object(object_key=self.s3_media_key)
+                audio_content = await extract_audio_from_video(video_bytes)
 
-            TRACKER.update_status(
-                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=15
-            )
-            transcription, timestamps = await process_audio_for_transcription(
-                audio_content=audio_content, language=self.md.language)
+                TRACKER.update_status(
+                    user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=15
+                )
+                transcription, timestamps = await process_audio_for_transcription(
+                    audio_content=audio_content, language=self.md.language)
+                return {"transcript": transcription, "timestamps": timestamps}
+
+            transcript_stage = await self.checkpoint.stage("transcript", transcribe)
+            transcription = transcript_stage["transcript"]
+            timestamps = transcript_stage["timestamps"]
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=20
             )
 
-            chunks = use_jina.segment_data(transcription)
-            metadata = []
-            chunk_id = 0
-            for _ in chunks:
-                md_copy = self.md.model_copy()
-                md_v = MediaSpecificMd(
+            chunks = await self.checkpoint.stage("chunks", lambda: use_jina.segment_data(transcription))
+            if not chunks:
+                chunks = [transcription]
+
+            metadata = ChunkMetadata(self.md, MediaSpecificMd)
+            for chunk_id in range(len(chunks)):
+                metadata.append(
                     chunk_id=f"{memId}_{chunk_id}",
                     type='video',
                     end_time=timestamps[chunk_id]["end_time"] if chunk_id < len(
@@ -107,12 +146,6 @@ class VideoAgent(MediaAgent):
                     start_time=timestamps[chunk_id]["start_time"] if chunk_id < len(
                         timestamps) else 0
                 )
-                md_copy.specific_desc = md_v
-                metadata.append(md_copy)
-                chunk_id += 1
-
-            if not chunks:
-                chunks = [transcription]
 
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.CREATING_EMBEDDINGS, progress=20
@@ -122,13 +155,15 @@ class VideoAgent(MediaAgent):
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.STORING_DOCUMENT, progress=90
             )
             await self.store_memory_in_database(chunks, metadata, memId)
+            self.start_enrichment()
+            await self.checkpoint.clear()
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.COMPLETED, progress=100
             )
             response = AgentResponse(
                 transcript=transcription,
                 chunks=chunks,
-                metadata=metadata,
+                metadata=metadata.to_list(),
                 userId=self.md.user_id,
                 memoryId=memId
             )
@@ -140,26 +175,9 @@ class VideoAgent(MediaAgent):
             )
             raise RuntimeError(f"Error processing video: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], metadata: List[Metadata], memId: str) -> None:
+    async def store_memory_in_database(self, chunks: List[str], metadata: ChunkMetadata, memId: str) -> None:
         try:
-            memories = []
-            combined_chunks = combine_data_chunks(chunks, metadata, memId)
-            i = 0
-            for chunk in combined_chunks:
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f'{memId}_{i}',
-                    "title": self.md.title,
-                    "userId": self.md.user_id,
-                    "memType": 'video',
-                    "memData": chunk["memData"],
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": chunk["metadata"],
-                }
-                memories.append(mem_data)
-                i += 1
+            memories = metadata.rows('video', memory_data(chunks))
             batch_size = 100
 
             for i in range(0, len(memories), batch_size):
@@ -178,38 +196,34 @@ class VideoAgent(MediaAgent):
 class AudioAgent(MediaAgent):
     async def process_media(self) -> AgentResponse:
         try:
-            memId = str(uuid.uuid4())
+            memId = await self.checkpoint.stage("memory_id", lambda: str(uuid.uuid4()))
             self.md.memId = memId
 
             TRACKER.create_status(
                 user_id=self.md.user_id, document_id=memId, document_title=self.md.title
             )
 
-            audio_bytes = s3Opr.download_object(object_key=self.s3_media_key)
+            async def transcribe() -> str:
+                audio_bytes = s3Opr.download_object(object_key=self.s3_media_key)
 
-            TRACKER.update_status(
-                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=15
-            )
+                TRACKER.update_status(
+                    user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=15
+                )
 
-            transcription, _ = await process_audio_for_transcription(
-                audio_content=audio_bytes, language=self.md.language)
+                transcription, _ = await process_audio_for_transcription(
+                    audio_content=audio_bytes, language=self.md.language)
+                return transcription
+
+            transcription = await self.checkpoint.stage("transcript", transcribe)
 
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=20
             )
 
-            chunks = use_jina.segment_data(transcription)
-            metadata = []
-            chunk_id = 0
-            for _ in chunks:
-                md_copy = self.md.model_copy()
-                md_v = MediaSpecificMd(
-                    chunk_id=f"{memId}_{chunk_id}",
-                    type='audio',
-                )
-                md_copy.specific_desc = md_v
-                metadata.append(md_copy)
-                chunk_id += 1
+            chunks = await self.checkpoint.stage("chunks", lambda: use_jina.segment_data(transcription))
+            metadata = ChunkMetadata(self.md, MediaSpecificMd)
+            for chunk_id in range(len(chunks)):
+                metadata.append(chunk_id=f"{memId}_{chunk_id}", type='audio')
 
             if not chunks:
                 chunks = [transcription]
@@ -225,6 +239,8 @@ class AudioAgent(MediaAgent):
             )
 
             await self.store_memory_in_database(chunks, metadata, memId)
+            self.start_enrichment()
+            await self.checkpoint.clear()
 
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.COMPLETED, progress=100
@@ -233,7 +249,7 @@ class AudioAgent(MediaAgent):
             response = AgentResponse(
                 transcript=transcription,
                 chunks=chunks,
-                metadata=metadata,
+                metadata=metadata.to_list(),
                 userId=self.md.user_id,
                 memoryId=memId
             )
@@ -244,23 +260,9 @@ class AudioAgent(MediaAgent):
             )
             raise RuntimeError(f"Error processing audio: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], metadata: List[Metadata], memId: str) -> None:
+    async def store_memory_in_database(self, chunks: List[str], metadata: ChunkMetadata, memId: str) -> None:
         try:
-            memories = []
-            i = 0
-            for chunk, meta in zip(chunks, metadata):
-                mem_data = {
-                    "memId": memId,
-                    "chunkId": f'{memId}_{i}',
-                    "title": self.md.title,
-                    "memData": chunk,
-                    "memType": 'audio',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": meta.json(),
-                }
-                memories.append(mem_data)
-                i += 1
+            memories = metadata.rows('audio', chunks)
 
             batch_size = 100
             for i in range(0, len(memories), batch_size):
@@ -274,48 +276,51 @@ class AudioAgent(MediaAgent):
 class ImageAgent(MediaAgent):
     async def process_media(self) -> AgentResponse:
         try:
-            memId = str(uuid.uuid4())
+            memId = await self.checkpoint.stage("memory_id", lambda: str(uuid.uuid4()))
             self.md.memId = memId
 
             TRACKER.create_status(
                 user_id=self.md.user_id, document_id=memId, document_title=self.md.title
             )
 
-            image_bytes = s3Opr.download_object(object_key=self.s3_media_key)
+            async def describe() -> dict:
+                image_bytes = s3Opr.download_object(object_key=self.s3_media_key)
 
-            TRACKER.update_status(
-                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=15
-            )
-            image = Image.open(io.BytesIO(image_bytes))
+                TRACKER.update_status(
+                    user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=15
+                )
+                image = await asyncio.to_thread(prepare_image, image_bytes)
 
-            processor = ImageDescriptionGenerator()
+                processor = ImageDescriptionGenerator()
 
-            result = processor.generate_description(
-                image_bytes, self.md.title, self.md.description)
+                result = await processor.generate_description(
+                    image, self.md.title, self.md.description, self.md.user_id)
 
-            # The result now directly includes a vectorizable_description that's ready to use
-            transcript = result['vectorizable_description']
+                # The result now directly includes a vectorizable_description that's ready to use
+                return {
+                    "transcript": result['vectorizable_description'],
+                    "width": image.width or 0,
+                    "height": image.height or 0,
+                    "format": image.format or "",
+                }
+
+            image = await self.checkpoint.stage("transcript", describe)
+            transcript = image["transcript"]
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=20
             )
 
-            chunks = use_jina.segment_data(transcript)
-            metadata = []
-            chunk_id = 0
-            for _ in chunks:
-                md_copy = self.md.model_copy()
-                md_v = ImageSpecificMd(
-                    chunk_id=f"{memId}_{chunk_id}",
-                    type='image',
-                    width=image.width or 0,
-                    height=image.height or 0,
-                    format=image.format or ""
-                )
-                md_copy.specific_desc = md_v
-                metadata.append(md_copy)
-                chunk_id += 1
+            chunks = await self.checkpoint.stage("chunks", lambda: use_jina.segment_data(transcript))
             if not chunks:
                 chunks = [transcript]
+            metadata = ChunkMetadata(self.md, ImageSpecificMd)
+            for chunk_id in range(len(chunks)):
+                metadata.append(
+                    chunk_id=f"{memId}_{chunk_id}",
+                    width=image["width"],
+                    height=image["height"],
+                    format=image["format"]
+                )
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.CREATING_EMBEDDINGS, progress=20
             )
@@ -324,10 +329,12 @@ class ImageAgent(MediaAgent):
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.STORING_DOCUMENT, progress=90
             )
             await self.store_memory_in_database(chunks, metadata, memId)
+            self.start_enrichment()
+            await self.checkpoint.clear()
             response = AgentResponse(
                 transcript=transcript,
                 chunks=chunks,
-                metadata=metadata,
+                metadata=metadata.to_list(),
                 userId=self.md.user_id,
                 memoryId=memId
             )
@@ -338,25 +345,9 @@ class ImageAgent(MediaAgent):
             )
             raise RuntimeError(f"Error processing image: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], metadata: List[Metadata], memId: str) -> None:
+    async def store_memory_in_database(self, chunks: List[str], metadata: ChunkMetadata, memId: str) -> None:
         try:
-            memories = []
-            combined_memories = combine_data_chunks(chunks, metadata, memId)
-            i = 0
-            for chunk in combined_memories:
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f"{memId}_{i}",
-                    "title": self.md.title,
-                    "memData": chunk["memData"],
-                    "memType": 'image',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": chunk["metadata"],
-                }
-                memories.append(mem_data)
-                i += 1
+            memories = metadata.rows('image', memory_data(chunks))
             batch_size = 100
             for i in range(0, len(memories), batch_size):
                 batch = memories[i:i + batch_size]
@@ -367,56 +358,177 @@ class ImageAgent(MediaAgent):
                 f"Error storing image memory in database: {str(e)}")
 
 
-class File_PDFAgent(MediaAgent):
+class ImageBatchAgent(ImageAgent):
+    """
+    Ingests several images (e.g. screenshots of one web page) as a single memory.
+
+    Download, OCR and vision run concurrently under a shared limiter; the
+    descriptions are then segmented, embedded and upserted in one pass.
+    """
+
+    def __init__(self, s3_media_keys: List[str], md: Metadata[ImageSpecificMd]) -> None:
+        super().__init__(s3_media_key=None, md=md)
+        self.s3_media_keys = s3_media_keys
+        self.descriptions: Dict[str, asyncio.Future] = {}
+        self.checkpoint = JobCheckpoint(make_job_id(
+            md.user_id, md.type, *s3_media_keys, md.created_at))
+
+    async def describe_image(self, processor: ImageDescriptionGenerator, s3_media_key: str) -> Optional[Tuple[PreparedImage, str]]:
+        async with IMAGE_BATCH_LIMITER:
+            image_bytes = await asyncio.to_thread(
+                s3Opr.download_object, object_key=s3_media_key)
+            image = await asyncio.to_thread(prepare_image, image_bytes)
+            # Byte-identical images in one batch share a description
+            description = self.descriptions.get(image.content_hash)
+            if description is None:
+                description = asyncio.ensure_future(processor.generate_description(
+                    image, self.md.title, self.md.description, self.md.user_id))
+                self.descriptions[image.content_hash] = description
+            result = await description
+
+        if not result.get("success"):
+            logger.error(
+                f"Skipping image {s3_media_key}: {result.get('error')}")
+            return None
+        return image, result['vectorizable_description']
+
     async def process_media(self) -> AgentResponse:
         try:
-            memId = str(uuid.uuid4())
+            memId = await self.checkpoint.stage("memory_id", lambda: str(uuid.uuid4()))
             self.md.memId = memId
+
             TRACKER.create_status(
                 user_id=self.md.user_id, document_id=memId, document_title=self.md.title
             )
 
-            pdf_bytes = s3Opr.download_object(object_key=self.s3_media_key)
+            processor = ImageDescriptionGenerator()
+            results = await asyncio.gather(
+                *[self.describe_image(processor, key) for key in self.s3_media_keys],
+                return_exceptions=True
+            )
+
+            images = []
+            descriptions = []
+            for key, result in zip(self.s3_media_keys, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Skipping image {key}: {str(result)}")
+                    continue
+                if result is None:
+                    continue
+                image, description = result
+                images.append(image)
+                descriptions.append(
+                    f"Image {len(descriptions) + 1}:\n{description}")
+
+            if not descriptions:
+                raise ValueError("None of the images could be processed")
 
             TRACKER.update_status(
-                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=5
+                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=20
             )
 
-            pdf_reader = PdfReader(io.BytesIO(pdf_bytes))
+            transcript = "\n\n".join(descriptions)
+            chunks = await use_jina.segment_data(transcript)
+            if not chunks:
+                chunks = [transcript]
 
-            combine_pages = min(5, len(pdf_reader.pages))
-            chunks = []
-            text = []
-            chunking_data = []
+            # Attribute each chunk to the image whose description it starts in
+            description_offsets = []
+            offset = 0
+            for description in descriptions:
+                description_offsets.append(offset)
+                offset += len(description) + 2
+
+            metadata = ChunkMetadata(self.md, ImageSpecificMd)
+            chunk_offset = 0
+            for chunk_id, chunk in enumerate(chunks):
+                image = images[max(
+                    bisect.bisect_right(description_offsets, chunk_offset) - 1, 0)]
+                chunk_offset += len(chunk)
+                metadata.append(
+                    chunk_id=f"{memId}_{chunk_id}",
+                    width=image.width or 0,
+                    height=image.height or 0,
+                    format=image.format or ""
+                )
 
-            for page_no, page in enumerate(pdf_reader.pages, 1):
-                page_text = sanitize_input(page.extract_text())
-                # page_text = page.extract_text()
-                text.append(page_text)
-                chunking_data.append(page_text.replace('\n', ''))
+            TRACKER.update_status(
+                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.CREATING_EMBEDDINGS, progress=20
+            )
+            await self.embed_and_store_chunks(chunks, metadata)
+            TRACKER.update_status(
+                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.STORING_DOCUMENT, progress=90
+            )
+            await self.store_memory_in_database(chunks, metadata, memId)
+            self.start_enrichment()
+            await self.checkpoint.clear()
+            TRACKER.update_status(
+                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.COMPLETED, progress=100
+            )
+            return AgentResponse(
+                transcript=transcript,
+                chunks=chunks,
+                metadata=metadata.to_list(),
+                userId=self.md.user_id,
+                memoryId=memId
+            )
+        except Exception as e:
+            TRACKER.update_status(
+                user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.FAILED, progress=100
+            )
+            raise RuntimeError(f"Error processing images: {str(e)}")
 
-                if page_no % combine_pages == 0:
-                    chunk = use_jina.segment_data(''.join(chunking_data))
-                    if chunk:
-                        chunks.extend(chunk)
-                    chunking_data.clear()
 
-            if chunking_data:
-                chunk = use_jina.segment_data(''.join(chunking_data))
-                chunks.extend(chunk)
+class File_PDFAgent(MediaAgent):
+    async def process_media(self) -> AgentResponse:
+        try:
+            memId = await self.checkpoint.stage("memory_id", lambda: str(uuid.uuid4()))
+            self.md.memId = memId
+            TRACKER.create_status(
+                user_id=self.md.user_id, document_id=memId, document_title=self.md.title
+            )
 
-            full_text = '\n\n'.join(f"{page_content}\n\n{'*' * 50}Page {i} ends{'*' * 50}"
-                                    for i, page_content in enumerate(text, 1))
+            async def extract_and_segment() -> dict:
+                pdf_bytes = s3Opr.download_object(object_key=self.s3_media_key)
 
-            metadata = []
-            for chunk_id, _ in enumerate(chunks):
-                md_copy = self.md.model_copy()
-                md_v = MediaSpecificMd(
-                    chunk_id=f"{memId}_{chunk_id}",
-                    type='pdf',
+                TRACKER.update_status(
+                    user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.PROCESSING, progress=5
                 )
-                md_copy.specific_desc = md_v
-                metadata.append(md_copy)
+
+                pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+
+                combine_pages = min(5, len(pdf_reader.pages))
+                chunks = []
+                text = []
+                chunking_data = []
+
+                for page_no, page in enumerate(pdf_reader.pages, 1):
+                    page_text = sanitize_input(page.extract_text())
+                    # page_text = page.extract_text()
+                    text.append(page_text)
+                    chunking_data.append(page_text.replace('\n', ''))
+
+                    if page_no % combine_pages == 0:
+                        chunk = await use_jina.segment_data(''.join(chunking_data))
+                        if chunk:
+                            chunks.extend(chunk)
+                        chunking_data.clear()
+
+                if chunking_data:
+                    chunk = await use_jina.segment_data(''.join(chunking_data))
+                    chunks.extend(chunk)
+
+                full_text = '\n\n'.join(f"{page_content}\n\n{'*' * 50}Page {i} ends{'*' * 50}"
+                                        for i, page_content in enumerate(text, 1))
+                return {"transcript": full_text, "chunks": chunks}
+
+            pdf_stage = await self.checkpoint.stage("chunks", extract_and_segment)
+            full_text = pdf_stage["transcript"]
+            chunks = pdf_stage["chunks"]
+
+            metadata = ChunkMetadata(self.md, MediaSpecificMd)
+            for chunk_id in range(len(chunks)):
+                metadata.append(chunk_id=f"{memId}_{chunk_id}", type='pdf')
 
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.CREATING_EMBEDDINGS, progress=15)
@@ -426,6 +538,8 @@ class File_PDFAgent(MediaAgent):
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.STORING_DOCUMENT, progress=90)
             await self.store_memory_in_database(chunks, preprocessed_chunks, metadata, memId)
+            self.start_enrichment(update_search=True)
+            await self.checkpoint.clear()
 
             TRACKER.update_status(
                 user_id=self.md.user_id, document_id=memId, status=ProcessingStatus.COMPLETED, progress=100)
@@ -433,7 +547,7 @@ class File_PDFAgent(MediaAgent):
             response = AgentResponse(
                 transcript=full_text,
                 chunks=chunks,
-                metadata=metadata,
+                metadata=metadata.to_list(),
                 userId=self.md.user_id,
                 memoryId=memId
             )
@@ -444,25 +558,9 @@ class File_PDFAgent(MediaAgent):
             )
             raise RuntimeError(f"Error processing PDF: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], preprocessed_chunks: List[str], metadata: List[Metadata], memId: str) -> None:
+    async def store_memory_in_database(self, chunks: List[str], preprocessed_chunks: List[str], metadata: ChunkMetadata, memId: str) -> None:
         try:
-            memories = []
-            combined_chunks = combine_data_chunks(chunks, metadata, memId)
-            i = 0
-            for chunk in combined_chunks:
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f"{memId}_{i}",
-                    "title": self.md.title,
-                    "memData": chunk["memData"],
-                    "memType": 'pdf',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": chunk["metadata"],
-                }
-                memories.append(mem_data)
-                i += 1
+            memories = metadata.rows('pdf', memory_data(chunks))
 
             batch_size = 100
             for i in range(0, len(memories), batch_size):
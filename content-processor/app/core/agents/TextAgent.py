@@ -6,11 +6,15 @@ from app.core.PineconeClient import PineconeClient
 from app.core.voyage import voyage_client
 from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import Metadata, NoteSpecificMd
+from app.services.EnrichmentService import (TWO_PHASE_INGESTION,
+                                            embed_raw_chunks,
+                                            schedule_enrichment)
 from app.services.MemoryService import insert_many_memories_to_db
 from app.utils.app_logger_config import logger
+from app.utils.chunk_metadata import ChunkMetadata
 from app.utils.chunk_processing import update_chunks
 from app.utils.status_tracking import TRACKER, ProcessingStatus
-from app.utils.Vectors import combine_data_chunks, get_vectors
+from app.utils.Vectors import get_vectors, memory_data
 
 
 class TextAgent:
@@ -37,24 +41,17 @@ class TextAgent:
             )
 
             # Segment the text into chunks
-            chunks = use_jina.segment_data(self.text)
-
-            # Create metadata for each chunk
-            metadata = []
-            chunk_id = 0
-            for _ in chunks:
-                md_copy = self.md.model_copy()
-                md_v = NoteSpecificMd(
-                    chunk_id=f"{memId}_{chunk_id}",
-                )
-                md_copy.specific_desc = md_v
-                metadata.append(md_copy)
-                chunk_id += 1
+            chunks = await use_jina.segment_data(self.text)
 
             # If chunking resulted in no chunks, use the entire text as one chunk
             if not chunks:
                 chunks = [self.text]
 
+            # Create metadata for each chunk
+            metadata = ChunkMetadata(self.md, NoteSpecificMd)
+            for chunk_id in range(len(chunks)):
+                metadata.append(chunk_id=f"{memId}_{chunk_id}")
+
             TRACKER.update_status(
                 user_id=self.md.user_id,
                 document_id=memId,
@@ -64,29 +61,10 @@ class TextAgent:
 
             # Embed and store chunks
             try:
-                logger.debug(f"Embedding and storing chunks: {len(chunks)}")
-                preprocessed_chunks = await update_chunks(chunks=chunks, userId=self.md.user_id, memoryId=self.md.memId)
-                title = self.md.title
-                description = self.md.description
-                preprocessed_chunks = [
-                    title + " " + description + " " + chunk for chunk in preprocessed_chunks]
-                # for chunk in preprocessed_chunks:
-                #     print(chunk)
-                #     print("-"*20)
-                embeddings = voyage_client.get_embeddings(preprocessed_chunks)
-                logger.debug(f"Length after embedding: {len(embeddings)}")
-                logger.debug(f"Embedding dimensions: {len(embeddings[0])}")
-                vectors = get_vectors(metadata, embeddings)
-                batch_size = 100
-                pinecone_client = PineconeClient()
-                TRACKER.update_status(
-                    user_id=self.md.user_id,
-                    document_id=self.md.memId,
-                    status=ProcessingStatus.STORING_VECTORS,
-                    progress=85
-                )
-                res = pinecone_client.upsert(vectors, batch_size)
-                logger.debug(f"Upsert response: {res}")
+                if TWO_PHASE_INGESTION:
+                    await embed_raw_chunks(self.md, chunks, metadata)
+                else:
+                    await self.embed_contextualized_chunks(chunks, metadata)
             except Exception as e:
                 raise RuntimeError(
                     f"Error embedding and storing chunks: {str(e)}")
@@ -101,6 +79,9 @@ class TextAgent:
             # Store in database
             await self.store_memory_in_database(chunks, metadata, memId)
 
+            if TWO_PHASE_INGESTION:
+                schedule_enrichment(self.md.model_copy(), chunks, metadata)
+
             TRACKER.update_status(
                 user_id=self.md.user_id,
                 document_id=memId,
@@ -111,7 +92,7 @@ class TextAgent:
             response = AgentResponse(
                 transcript=self.text,
                 chunks=chunks,
-                metadata=metadata,
+                metadata=metadata.to_list(),
                 userId=self.md.user_id,
                 memoryId=memId
             )
@@ -127,24 +108,34 @@ class TextAgent:
             )
             raise RuntimeError(f"Error processing text: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], metadata: List[Metadata], memId: str) -> None:
+    async def embed_contextualized_chunks(self, chunks: List[str], metadata: List[Metadata]) -> None:
+        logger.debug(f"Embedding and storing chunks: {len(chunks)}")
+        preprocessed_chunks = await update_chunks(chunks=chunks, userId=self.md.user_id, memoryId=self.md.memId)
+        title = self.md.title
+        description = self.md.description
+        preprocessed_chunks = [
+            title + " " + description + " " + chunk for chunk in preprocessed_chunks]
+        # for chunk in preprocessed_chunks:
+        #     print(chunk)
+        #     print("-"*20)
+        embeddings = await voyage_client.embed(preprocessed_chunks)
+        logger.debug(f"Length after embedding: {len(embeddings)}")
+        logger.debug(f"Embedding dimensions: {len(embeddings[0])}")
+        vectors = get_vectors(metadata, embeddings)
+        batch_size = 100
+        pinecone_client = PineconeClient()
+        TRACKER.update_status(
+            user_id=self.md.user_id,
+            document_id=self.md.memId,
+            status=ProcessingStatus.STORING_VECTORS,
+            progress=85
+        )
+        res = pinecone_client.upsert(vectors, batch_size)
+        logger.debug(f"Upsert response: {res}")
+
+    async def store_memory_in_database(self, chunks: List[str], metadata: ChunkMetadata, memId: str) -> None:
         try:
-            memories = []
-            combined_memories = combine_data_chunks(chunks, metadata, memId)
-
-            for i, chunk in enumerate(combined_memories):
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f"{memId}_{i}",
-                    "title": self.md.title,
-                    "memData": chunk["memData"],
-                    "memType": 'note',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": chunk["metadata"],
-                }
-                memories.append(mem_data)
+            memories = metadata.rows('note', memory_data(chunks))
 
             # Insert memories in batches
             batch_size = 100
@@ -1,9 +1,9 @@
-import io
+import asyncio
+import os
 import uuid
 from typing import List
 
-from PIL import Image
-from PyPDF2 import PdfReader
+from cortex_shared import providers
 
 from app.core.agents.integrations.IntegrationAgent import IntegrationAgent
 from app.core.agents.MediaAgent import sanitize_input
@@ -14,71 +14,90 @@ from app.schemas.Metadata import GDriveFileType, GDriveSpecificMd
 from app.services.MemoryService import insert_many_memories_to_db
 from app.utils.AV import (extract_audio_from_video,
                           process_audio_for_transcription)
-from app.utils.drive_content_extractor import GDriveProcessor
-from app.utils.image import ImageDescriptionGenerator
+from app.utils.chunk_metadata import ChunkMetadata
+from app.utils.drive_content_extractor import GDriveProcessor, build_service
+from app.utils.image import ImageDescriptionGenerator, prepare_image
 from app.utils.status_tracking import TRACKER, ProcessingStatus
 
+PyPDF2 = providers.lazy_import("PyPDF2")
+
 
 class DriveAgent(IntegrationAgent[GDriveSpecificMd]):
+    def __init__(self, resource_link: str, access_token: str, md, refresh_token=None, service_factory=build_service) -> None:
+        super().__init__(resource_link, access_token, md, refresh_token=refresh_token)
+        self.service_factory = service_factory
+
     async def process_media(self) -> AgentResponse:
         try:
-            processor = GDriveProcessor(
-                self.resource_link, self.access_token, self.refresh_token)
-            file_type, file_metadata = processor.get_file_type()
             memId = str(uuid.uuid4())
             self.md.memId = memId
             TRACKER.create_status(self.md.user_id, memId, self.md.title)
+            # Google API clients are synchronous; keep them off the event loop
+            # so several Drive files can be processed concurrently
+            processor = await asyncio.to_thread(
+                GDriveProcessor, self.resource_link, self.access_token, self.refresh_token, self.service_factory)
+            file_type, file_metadata = await asyncio.to_thread(processor.get_file_type)
 
             print(f"Processing Drive file: {file_type}")
             content = ""
             chunks = []
             if file_type == GDriveFileType.GDOC:
-                content = processor.extract_doc_content()
+                content = await asyncio.to_thread(processor.extract_doc_content)
             elif file_type == GDriveFileType.GSHEET:
-                content = processor.extract_sheet_content()
+                content = await asyncio.to_thread(processor.extract_sheet_content)
             elif file_type == GDriveFileType.GSLIDE:
-                content = processor.extract_slide_content()
+                content = await asyncio.to_thread(processor.extract_slide_content)
             elif file_type == GDriveFileType.VIDEO:
-                file_bytes = processor.get_file_content()
-                TRACKER.update_status(
-                    user_id=self.md.user_id,
-                    document_id=memId,
-                    status=ProcessingStatus.PROCESSING,
-                    progress=15
-                )
-                # Extract audio from video
-                audio_content = await extract_audio_from_video(file_bytes)
+                # Media is downloaded to disk and decoded from there rather
+                # than held in memory as bytes
+                file_path = await asyncio.to_thread(processor.download_to_path)
+                try:
+                    TRACKER.update_status(
+                        user_id=self.md.user_id,
+                        document_id=memId,
+                        status=ProcessingStatus.PROCESSING,
+                        progress=15
+                    )
+                    # Extract audio from video
+                    audio_content = await extract_audio_from_video(file_path)
+                finally:
+                    os.unlink(file_path)
                 # Process audio for transcription
                 content, _ = await process_audio_for_transcription(
                     audio_content=audio_content,
                     language=self.md.language
                 )
             elif file_type == GDriveFileType.AUDIO:
-                file_bytes = processor.get_file_content()
-                TRACKER.update_status(
-                    user_id=self.md.user_id,
-                    document_id=memId,
-                    status=ProcessingStatus.PROCESSING,
-                    progress=15
-                )
-                # Process audio directly for transcription
-                content, _ = await process_audio_for_transcription(
-                    audio_content=file_bytes,
-                    language=self.md.language
-                )
+                file_path = await asyncio.to_thread(processor.download_to_path)
+                try:
+                    TRACKER.update_status(
+                        user_id=self.md.user_id,
+                        document_id=memId,
+                        status=ProcessingStatus.PROCESSING,
+                        progress=15
+                    )
+                    # Process audio directly for transcription
+                    content, _ = await process_audio_for_transcription(
+                        audio_content=file_path,
+                        language=self.md.language
+                    )
+                finally:
+                    os.unlink(file_path)
             elif file_type == GDriveFileType.IMAGE:
-                file_bytes = processor.get_file_content()
-                image = Image.open(io.BytesIO(file_bytes))
+                image_file = await asyncio.to_thread(processor.download_file)
+                with image_file:
+                    image = await asyncio.to_thread(prepare_image, image_file)
                 processor = ImageDescriptionGenerator()
-                result = processor.generate_description(
-                    file_bytes,
+                result = await processor.generate_description(
+                    image,
                     self.md.title,
-                    self.md.description
+                    self.md.description,
+                    self.md.user_id
                 )
                 content = result['vectorizable_description']
             elif file_type == GDriveFileType.PDF:
-                file_bytes = processor.get_file_content()
-                pdf_reader = PdfReader(io.BytesIO(file_bytes))
+                pdf_file = await asyncio.to_thread(processor.download_file)
+                pdf_reader = PyPDF2.PdfReader(pdf_file)
                 combine_pages = min(5, len(pdf_reader.pages))
                 text = []
                 chunking_data = []
@@ -89,57 +108,58 @@ class DriveAgent(IntegrationAgent[GDriveSpecificMd]):
                     chunking_data.append(page_text.replace('\n', ''))
 
                     if page_no % combine_pages == 0:
-                        chunk = use_jina.segment_data(''.join(chunking_data))
+                        chunk = await use_jina.segment_data(''.join(chunking_data))
                         if chunk:
                             chunks.extend(chunk)
                         chunking_data.clear()
 
                 if chunking_data:
-                    chunk = use_jina.segment_data(''.join(chunking_data))
+                    chunk = await use_jina.segment_data(''.join(chunking_data))
                     chunks.extend(chunk)
+                pdf_file.close()
             else:
                 raise ValueError(f"Unsupported file type: {file_type}")
 
             # For text-based content (docs, sheets, slides)
             if file_type == GDriveFileType.PDF or content:
                 if file_type != GDriveFileType.PDF:
-                    chunks = use_jina.segment_data(content)
+                    chunks = await use_jina.segment_data(content)
                 self.md.memId = memId
-                metadata = []
+                metadata = ChunkMetadata(self.md, GDriveSpecificMd)
 
-                for i, chunk in enumerate(chunks):
-                    chunk_metadata = GDriveSpecificMd(
+                for i in range(len(chunks)):
+                    metadata.append(
                         chunk_id=f"{memId}_{i}",
                         file_id=self.resource_link,
                         page_number=i,
                         sheet_name=None,
                     )
-                    md_copy = self.md.model_copy()
-                    md_copy.specific_desc = chunk_metadata
-                    metadata.append(md_copy)
 
                 processed_chunks = await self.embed_and_store_chunks(chunks, metadata)
 
                 TRACKER.update_status(
                     self.md.user_id, memId, status=ProcessingStatus.STORING_DOCUMENT, progress=85)
                 await self.store_memory_in_database(chunks=chunks, preprocessed_chunks=processed_chunks, meta_chunks=metadata, memId=memId)
+                self.start_enrichment(update_search=True)
 
-                await prisma.prisma.connectedgdrivefiles.update(
+                # Files ingested through a folder have no row of their own
+                await prisma.prisma.connectedgdrivefiles.update_many(
                     where={
-                        "userId_fileId": {
-                            "userId": self.md.user_id,
-                            "fileId": self.resource_link
-                        }
+                        "userId": self.md.user_id,
+                        "fileId": self.resource_link
                     },
                     data={
                         "state": "connected",
+                        "memId": memId,
+                        "modifiedTime": file_metadata.get("modifiedTime"),
+                        "md5Checksum": file_metadata.get("md5Checksum"),
                     }
                 )
                 TRACKER.update_status(
                     self.md.user_id, memId, status=ProcessingStatus.COMPLETED, progress=100)
                 return AgentResponse(
                     chunks=chunks,
-                    metadata=metadata,
+                    metadata=metadata.to_list(),
                     transcript=content,
                     userId=self.md.user_id,
                     memoryId=memId,
@@ -153,22 +173,9 @@ class DriveAgent(IntegrationAgent[GDriveSpecificMd]):
                 self.md.user_id, memId, status=ProcessingStatus.FAILED, progress=100)
             raise RuntimeError(f"Failed to process Drive file: {str(e)}")
 
-    async def store_memory_in_database(self, chunks: List[str], preprocessed_chunks: List[str], meta_chunks: List[GDriveSpecificMd], memId: str):
+    async def store_memory_in_database(self, chunks: List[str], preprocessed_chunks: List[str], meta_chunks: ChunkMetadata, memId: str):
         try:
-            memories = []
-            for i, (chunk, meta) in enumerate(zip(chunks, meta_chunks)):
-                mem_data = {
-                    "memId": memId,
-                    "userId": self.md.user_id,
-                    "chunkId": f"{memId}_{i}",
-                    "title": self.md.title,
-                    "memData": chunk,
-                    "memType": 'drive',
-                    "source": self.md.source,
-                    "tags": self.md.tags,
-                    "metadata": meta.json(),
-                }
-                memories.append(mem_data)
+            memories = meta_chunks.rows('drive', chunks)
 
             batch_size = 100
             for i in range(0, len(memories), batch_size):
@@ -8,6 +8,9 @@ from app.core.PineconeClient import PineconeClient
 from app.core.voyage import voyage_client
 from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import GitSpecificMd, Metadata, NotionSpecificMd
+from app.services.EnrichmentService import (TWO_PHASE_INGESTION,
+                                            embed_raw_chunks,
+                                            schedule_enrichment)
 from app.utils.app_logger_config import logger
 from app.utils.chunk_processing import update_chunks
 from app.utils.status_tracking import TRACKER, ProcessingStatus
@@ -49,6 +52,11 @@ class IntegrationAgent(ABC, Generic[T]):
         try:
             TRACKER.update_status(
                 self.md.user_id, self.md.memId, ProcessingStatus.CREATING_EMBEDDINGS, progress=25)
+            if TWO_PHASE_INGESTION:
+                self.pending_enrichment = (
+                    self.md.model_copy(), chunks, metadata, False)
+                return await embed_raw_chunks(self.md, chunks, metadata, False)
+
             preprocessed_chunks = await update_chunks(chunks=chunks, memoryId=self.md.memId, userId=self.md.user_id)
 
             title = self.md.title
@@ -56,7 +64,7 @@ class IntegrationAgent(ABC, Generic[T]):
             preprocessed_chunks = [
                 title + " " + description + " " + chunk for chunk in preprocessed_chunks]
 
-            embeddings = voyage_client.get_embeddings(preprocessed_chunks)
+            embeddings = await voyage_client.embed(preprocessed_chunks)
 
             vectors = get_vectors(metadata, embeddings)
 
@@ -67,3 +75,10 @@ class IntegrationAgent(ABC, Generic[T]):
             return preprocessed_chunks
         except Exception as e:
             raise RuntimeError(f"Error embedding and storing chunks: {str(e)}")
+
+    def start_enrichment(self, update_search: bool = False) -> None:
+        """Queue contextualization of the chunks stored by the fast phase."""
+        pending = getattr(self, "pending_enrichment", None)
+        self.pending_enrichment = None
+        if pending is not None:
+            schedule_enrichment(*pending, update_search=update_search)
@@ -1,31 +1,36 @@
+import asyncio
 import os
-import random
+import time
 
 import aiohttp
 import requests
+from cortex_shared import jina
+from cortex_shared.jina import (JINA_MAX_CONNECTIONS_PER_HOST,
+                                KEY_REJECTED_STATUSES, JinaKeyPool,
+                                load_api_keys)
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 from app.utils.proxy import get_random_proxy
 
 if os.path.exists('.env'):
     load_dotenv()
 
-total_keys = os.getenv("TOTAL_JINA_AI_API_KEYS")
-start = 1
+JINA_TIMEOUT = float(os.getenv("JINA_TIMEOUT", "90"))
 
-all_api_keys = []
+KEY_POOL = JinaKeyPool(load_api_keys())
 
-while start <= int(total_keys):
-    all_api_keys.append(os.getenv(f"JINA_API_KEY_{start}"))
-    start += 1
+# Keep-alive pool for the remaining synchronous callers
+_sync_session = requests.Session()
+_sync_session.mount("https://", HTTPAdapter(
+    pool_connections=10, pool_maxsize=JINA_MAX_CONNECTIONS_PER_HOST))
 
 
-def randomly_choose_one_key_with_equal_prob():
-    # print(all_api_keys)
-    key = random.choice(all_api_keys)
-    if key is None:
-        key = os.getenv("JINA_API_KEY_1")
-    return key
+def get_session() -> aiohttp.ClientSession:
+    return jina.get_session(JINA_TIMEOUT)
+
+
+close_session = jina.close_session
 
 
 class JinaAIClient():
@@ -34,8 +39,7 @@ class JinaAIClient():
         self.isReader = isReader
         self.retry = 0
 
-    def get_random_header(self):
-        key = randomly_choose_one_key_with_equal_prob()
+    def get_header(self, key: str):
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {key}"
@@ -49,37 +53,61 @@ class JinaAIClient():
             #     index=self.retry)
         return headers
 
-    async def get(self, endpoint=''):
-        headers = self.get_random_header()
-        async with aiohttp.ClientSession() as session:
+    async def request(self, method: str, endpoint='', data=None, proxy=None):
+        """
+        Send a request with the best available key, moving on to another key
+        when one is rate limited or out of quota.
+        """
+        for _ in range(len(KEY_POOL.keys) + 1):
+            state = KEY_POOL.acquire()
+            status = None
+            headers = {}
             try:
-                print("Headers: ", headers)
-                # if self.retry == 10:
-                #     headers.pop("X-Proxy-Url")
-                proxyIp = get_random_proxy(app='yt')
-                async with session.get(self.base_url + endpoint, headers=headers, proxy=proxyIp) as response:
-                    return await response.json()
+                await asyncio.sleep(KEY_POOL.wait_time(state))
+                async with get_session().request(method, self.base_url + endpoint, headers=self.get_header(state.key), json=data, proxy=proxy) as response:
+                    status = response.status
+                    headers = response.headers
+                    if status in KEY_REJECTED_STATUSES:
+                        continue
+                    return await response.json(content_type=None)
             except aiohttp.ClientError as e:
                 # Handle network-related errors
                 raise Exception(f"Network error occurred: {str(e)}")
             except ValueError as e:
                 # Handle JSON decode errors
                 raise Exception(f"JSON decode error: {str(e)}")
+            finally:
+                KEY_POOL.release(state, status, headers)
+        raise Exception("All Jina API keys are rate limited or exhausted")
+
+    async def get(self, endpoint=''):
+        proxyIp = get_random_proxy(app='yt')
+        return await self.request("GET", endpoint, proxy=proxyIp)
+
+    async def post(self, data, endpoint=''):
+        return await self.request("POST", endpoint, data=data)
+
+    def post_sync(self, data, endpoint=''):
+        """Blocking POST for callers that run outside the event loop."""
+        for _ in range(len(KEY_POOL.keys) + 1):
+            state = KEY_POOL.acquire()
+            status = None
+            headers = {}
+            try:
+                time.sleep(KEY_POOL.wait_time(state))
+                response = _sync_session.post(
+                    self.base_url + endpoint, headers=self.get_header(state.key), json=data, timeout=JINA_TIMEOUT)
+                status = response.status_code
+                headers = response.headers
+                if status in KEY_REJECTED_STATUSES:
+                    continue
+                return response.json()
+            finally:
+                KEY_POOL.release(state, status, headers)
+        raise Exception("All Jina API keys are rate limited or exhausted")
+
+    async def delete(self, endpoint=''):
+        return await self.request("DELETE", endpoint)
 
-    def post(self, data, endpoint=''):
-        headers = self.get_random_header()
-        # print(headers)
-        response = requests.post(
-            self.base_url + endpoint, headers=headers, json=data)
-        return response.json()
-
-    def delete(self, endpoint=''):
-        headers = self.get_random_header()
-        response = requests.delete(self.base_url + endpoint, headers=headers)
-        return response.json()
-
-    def put(self, data, endpoint=''):
-        headers = self.get_random_header()
-        response = requests.put(self.base_url + endpoint,
-                                headers=headers, json=data)
-        return response.json()
+    async def put(self, data, endpoint=''):
+        return await self.request("PUT", endpoint, data=data)
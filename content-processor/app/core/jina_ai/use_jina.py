@@ -1,4 +1,5 @@
 import asyncio
+import random
 from typing import Any, Dict, List, Optional, Union
 
 from app.core.jina_ai import Client
@@ -11,39 +12,55 @@ jina_seg_client = Client.JinaAIClient(JINA_AI_BASE_URL_SEGMENTATION)
 jina_embed_client = Client.JinaAIClient(JINA_AI_BASE_URL_EMBEDDING)
 
 
-def segment_data(data: str):
-
+def _segment_bodies(data: str):
     data = data.replace('\n', ' ')
 
-    body = {
-        'content': data,
-        "tokenizer": "o200k_base",
-        "max_chunk_length": "800",
-        "return_chunks": "true"
-    }
-
     MAX_CHAR_LENGTH = 30000
-    final_res = []
-
     for i in range(0, len(data), MAX_CHAR_LENGTH):
-        current_data = data[i:i + MAX_CHAR_LENGTH]
-        body['content'] = current_data
+        yield {
+            'content': data[i:i + MAX_CHAR_LENGTH],
+            "tokenizer": "o200k_base",
+            "max_chunk_length": "800",
+            "return_chunks": "true"
+        }
 
-        # Attempt to post data and handle potential errors
-        try:
-            res = jina_seg_client.post(data=body)
-            if res is not None and "chunks" in res.keys():
-                final_res.extend(res["chunks"])
-            else:
-                print(f'Error in response for input chunk: {current_data}')
-        except Exception as e:
+
+def _collect_chunks(responses, bodies) -> List[str]:
+    final_res = []
+    for res, body in zip(responses, bodies):
+        if isinstance(res, Exception):
             print(
-                f'Exception occurred while processing input chunk: {current_data}. Error: {e}')
+                f'Exception occurred while processing input chunk: {body["content"]}. Error: {res}')
             return []
+        if res is not None and "chunks" in res.keys():
+            final_res.extend(res["chunks"])
+        else:
+            print(f'Error in response for input chunk: {body["content"]}')
     return final_res
 
 
-def get_embedding(data: List[str], task: Union[str, None] = 'retrieval.passage', retry: int = 5) -> List:
+async def segment_data(data: str) -> List[str]:
+    """Segment text with Jina; 30k character windows are segmented concurrently."""
+    bodies = list(_segment_bodies(data))
+    responses = await asyncio.gather(
+        *[jina_seg_client.post(data=body) for body in bodies], return_exceptions=True)
+    return _collect_chunks(responses, bodies)
+
+
+def segment_data_sync(data: str) -> List[str]:
+    """Blocking variant of segment_data for code running in worker threads."""
+    bodies = list(_segment_bodies(data))
+    responses = []
+    for body in bodies:
+        try:
+            responses.append(jina_seg_client.post_sync(data=body))
+        except Exception as e:
+            responses.append(e)
+            break
+    return _collect_chunks(responses, bodies)
+
+
+async def get_embedding(data: List[str], task: Union[str, None] = 'retrieval.passage', retry: int = 5) -> List:
     body = {
         'model': 'jina-embeddings-v3',
         'task': task,
@@ -62,7 +79,7 @@ def get_embedding(data: List[str], task: Union[str, None] = 'retrieval.passage',
 
         # Attempt to post data and handle potential errors
         try:
-            res = jina_embed_client.post(data=body)
+            res = await jina_embed_client.post(data=body)
             print("Got once")
             if res is not None and "data" in res.keys():
                 print(res.keys())
@@ -73,12 +90,16 @@ def get_embedding(data: List[str], task: Union[str, None] = 'retrieval.passage',
             print(
                 f'Exception occurred while processing input chunk: {current_data}. Error: {e}')
             if retry > 0:
-                return get_embedding(data, task, retry - 1)
+                return await get_embedding(data, task, retry - 1)
 
     return final_res
 
 
-async def web_scraper(link: str, max_retries: int = 10, retry_delay: float = 1.0) -> Optional[Dict[Any, Any]]:
+async def web_scraper(link: str, max_retries: int = 10, retry_delay: float = 1.0, max_delay: float = 30.0) -> Optional[Dict[Any, Any]]:
+    """
+    Read a page through Jina Reader, retrying with exponential backoff and
+    full jitter so concurrent scrapes do not retry in lockstep.
+    """
     print("URL: ", JINA_AI_BASE_WEB_SCRAPER + link)
 
     jina_web_scraper_client = Client.JinaAIClient(
@@ -89,17 +110,17 @@ async def web_scraper(link: str, max_retries: int = 10, retry_delay: float = 1.0
             if response is not None and response.get("data") is not None:
                 # print(f"Web Scraper Response: {response}")
                 return response
-
-            # If we didn't get valid data, wait before retrying
-            # This allows other tasks to run during the wait
-            jina_web_scraper_client.retry += 1
-            print(
-                f"Attempt {retry + 1} failed, retrying after {retry_delay} seconds...")
-            await asyncio.sleep(retry_delay)
-
+            print(f"Attempt {retry + 1} returned no data")
         except Exception as e:
             print(f"Error during attempt {retry + 1}: {str(e)}")
-            await asyncio.sleep(retry_delay)
+
+        if retry == max_retries - 1:
+            break
+        # This allows other tasks to run during the wait
+        jina_web_scraper_client.retry += 1
+        delay = random.uniform(0, min(max_delay, retry_delay * 2 ** retry))
+        print(f"Retrying after {delay:.1f} seconds...")
+        await asyncio.sleep(delay)
 
     print(f"Failed to get valid response after {max_retries} attempts")
     return None
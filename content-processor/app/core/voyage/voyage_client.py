@@ -1,7 +1,9 @@
+import asyncio
 import os
 import time
+from typing import Dict, List, Optional, Set, Tuple
 
-import voyageai
+from cortex_shared import providers
 from dotenv import load_dotenv
 
 from app.utils.app_logger_config import logger
@@ -9,14 +11,33 @@ from app.utils.app_logger_config import logger
 if (os.path.exists('.env')):
     load_dotenv()
 
-vo = voyageai.Client()
+
+def _voyage_client():
+    import voyageai
+    return voyageai.Client()
+
+
+vo = providers.register("voyage", _voyage_client)
 
 batch_size = 128
 
+# Concurrent callers' texts are collected for this long before one request is sent
+EMBED_BATCH_WINDOW = float(os.getenv("EMBED_BATCH_WINDOW_MS", "10")) / 1000
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "60000"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+
+
+def get_model(is_code=False) -> str:
+    return "voyage-3" if not is_code else "voyage-code-3"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
 
 def get_embeddings(documents: list[str], is_code=False) -> list:
     try:
-        model = "voyage-3" if not is_code else "voyage-code-3"
+        model = get_model(is_code)
         embeddings = []
         for i in range(0, len(documents), batch_size):
             batch = documents[i:i + batch_size]
@@ -28,3 +49,98 @@ def get_embeddings(documents: list[str], is_code=False) -> list:
     except Exception as e:
         logger.error(f"Error getting embeddings: {e}")
         return []
+
+
+class EmbeddingBatcher:
+    """
+    Merges small embedding requests from concurrent jobs into one API call.
+
+    Texts are held for EMBED_BATCH_WINDOW, or until the batch would exceed
+    ``batch_size`` documents or EMBED_BATCH_MAX_TOKENS, then embedded
+    together and the vectors handed back to each caller in order. Requests
+    too large to share a batch go straight to ``get_embeddings``.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.loop = asyncio.get_running_loop()
+        self.pending: List[Tuple[List[str], asyncio.Future]] = []
+        self.pending_docs = 0
+        self.pending_tokens = 0
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.in_flight = asyncio.Semaphore(EMBED_MAX_IN_FLIGHT)
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, documents: List[str]) -> list:
+        if not documents:
+            return []
+        tokens = sum(estimate_tokens(doc) for doc in documents)
+        if len(documents) > batch_size or tokens > EMBED_BATCH_MAX_TOKENS:
+            async with self.in_flight:
+                return await asyncio.to_thread(get_embeddings, documents, self.model == get_model(True))
+
+        if self.pending_docs + len(documents) > batch_size or self.pending_tokens + tokens > EMBED_BATCH_MAX_TOKENS:
+            self.flush()
+
+        future = self.loop.create_future()
+        self.pending.append((documents, future))
+        self.pending_docs += len(documents)
+        self.pending_tokens += tokens
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(EMBED_BATCH_WINDOW, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self.pending_docs = 0
+        self.pending_tokens = 0
+        task = self.loop.create_task(self._send(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, batch: List[Tuple[List[str], asyncio.Future]]) -> None:
+        documents = [doc for docs, _ in batch for doc in docs]
+        try:
+            async with self.in_flight:
+                response = await asyncio.to_thread(vo.embed, documents, model=self.model)
+            embeddings = response.embeddings
+        except Exception as e:
+            logger.error(f"Error getting batched embeddings: {e}")
+            embeddings = []
+
+        if not embeddings and len(batch) > 1:
+            # One caller's bad input should not fail everyone merged with it
+            await asyncio.gather(*(self._send_alone(docs, future) for docs, future in batch))
+            return
+
+        offset = 0
+        for docs, future in batch:
+            # Callers that failed get [] like get_embeddings returns on errors
+            result = embeddings[offset:offset + len(docs)] if embeddings else []
+            offset += len(docs)
+            if not future.done():
+                future.set_result(result)
+
+    async def _send_alone(self, documents: List[str], future: asyncio.Future) -> None:
+        """Retry one caller's slice of a failed merged call on its own."""
+        async with self.in_flight:
+            result = await asyncio.to_thread(get_embeddings, documents, self.model == get_model(True))
+        if not future.done():
+            future.set_result(result)
+
+
+_batchers: Dict[str, EmbeddingBatcher] = {}
+
+
+async def embed(documents: List[str], is_code=False) -> list:
+    """Async embeddings, batched with other concurrent callers."""
+    model = get_model(is_code)
+    batcher = _batchers.get(model)
+    if batcher is None or batcher.loop is not asyncio.get_running_loop():
+        batcher = _batchers[model] = EmbeddingBatcher(model)
+    return await batcher.embed(documents)
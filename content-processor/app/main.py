@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -6,7 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from .api import router
+from .core.jina_ai import Client as jina_client
 from .prisma import prisma
+from .services.CheckpointService import run_checkpoint_cleanup
+from .services.MemoryService import check_search_vector_schema
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +18,11 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await prisma.prisma.connect()
+    await check_search_vector_schema()
+    cleanup_task = asyncio.create_task(run_checkpoint_cleanup())
     yield
+    cleanup_task.cancel()
+    await jina_client.close_session()
     await prisma.prisma.disconnect()
 
 app = FastAPI(lifespan=lifespan)
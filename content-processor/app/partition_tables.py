@@ -0,0 +1,142 @@
+"""
+Convert Memory and memory_search_vector to tables hash-partitioned by user.
+
+Every read filters by user, so with MEMORY_PARTITIONS partitions a query
+touches one partition and that partition's indexes (including the GIN index
+on search_vector) instead of the whole corpus. Primary keys gain the user
+column, since Postgres requires the partition key in unique constraints.
+
+Each table is converted in one transaction: writes are blocked while rows
+are copied into the new partitioned table, then the tables are swapped.
+Reads keep working until the swap. The old tables are kept as
+``*_unpartitioned``; drop them once the new ones are verified. Tables that
+are already partitioned are skipped, so the job can be re-run.
+
+Run app.backfill_chunk_index first, with ingestion stopped, and deploy the
+services that write ``userid`` to memory_search_vector together with it:
+
+    python -m app.partition_tables [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+from typing import List
+
+import asyncpg
+from dotenv import load_dotenv
+
+from .utils.app_logger_config import logger
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+MEMORY_PARTITIONS = int(os.getenv("MEMORY_PARTITIONS", "16"))
+
+# Indexes owned by each table, with the names Prisma and non_prsima.sql use
+MEMORY_INDEXES = {
+    "Memory_memType_idx": '("memType")',
+    "Memory_tags_idx": '("tags")',
+    "Memory_userId_memId_chunkIndex_idx": '("userId", "memId", "chunkIndex")',
+    "Memory_chunkId_idx": '("chunkId")',
+}
+SEARCH_VECTOR_INDEXES = {
+    "idx_memory_search_vector": 'USING GIN (search_vector)',
+}
+
+
+def partitions_sql(table: str, parent: str, partitions: int) -> List[str]:
+    return [
+        f'CREATE TABLE "{table}_p{i}" PARTITION OF "{parent}" '
+        f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})'
+        for i in range(partitions)
+    ]
+
+
+def swap_sql(table: str, primary_key: str, indexes: dict) -> List[str]:
+    """Move the old table and its index names aside, then put the new one in place."""
+    statements = [
+        f'ALTER TABLE "{table}" RENAME TO "{table}_unpartitioned"',
+    ]
+    statements += [
+        f'ALTER INDEX IF EXISTS "{name}" RENAME TO "{name}_unpartitioned"'
+        for name in [f"{table}_pkey", *indexes]]
+    statements += [
+        f'ALTER TABLE "{table}_partitioned" RENAME TO "{table}"',
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY {primary_key}',
+    ]
+    # Created on the parent, so every partition gets its own smaller index
+    statements += [
+        f'CREATE INDEX "{name}" ON "{table}" {definition}' for name, definition in indexes.items()]
+    return statements
+
+
+def memory_sql(partitions: int) -> List[str]:
+    return [
+        'LOCK TABLE "Memory" IN EXCLUSIVE MODE',
+        'CREATE TABLE "Memory_partitioned" (LIKE "Memory" INCLUDING DEFAULTS) '
+        'PARTITION BY HASH ("userId")',
+        *partitions_sql("Memory", "Memory_partitioned", partitions),
+        'INSERT INTO "Memory_partitioned" SELECT * FROM "Memory"',
+        *swap_sql("Memory", '("userId", "memId", "chunkId")', MEMORY_INDEXES),
+        # Foreign key names only need to be unique per table
+        'ALTER TABLE "Memory" ADD CONSTRAINT "Memory_userId_fkey" FOREIGN KEY ("userId") '
+        'REFERENCES "User"("id") ON DELETE RESTRICT ON UPDATE CASCADE',
+        'ALTER TABLE "Memory" ADD CONSTRAINT "Memory_mindMapId_fkey" FOREIGN KEY ("mindMapId") '
+        'REFERENCES "MindMap"("id") ON DELETE SET NULL ON UPDATE CASCADE',
+    ]
+
+
+def search_vector_sql(partitions: int) -> List[str]:
+    return [
+        'LOCK TABLE "memory_search_vector" IN EXCLUSIVE MODE',
+        'CREATE TABLE "memory_search_vector_partitioned" ('
+        'userid TEXT NOT NULL, memid TEXT NOT NULL, chunkid TEXT NOT NULL, search_vector tsvector'
+        ') PARTITION BY HASH (userid)',
+        *partitions_sql("memory_search_vector", "memory_search_vector_partitioned", partitions),
+        # The old table has no user column; vectors without a Memory row are dropped
+        'INSERT INTO "memory_search_vector_partitioned" (userid, memid, chunkid, search_vector) '
+        'SELECT m."userId", msv.memid, msv.chunkid, msv.search_vector '
+        'FROM "memory_search_vector" msv '
+        'JOIN "Memory" m ON m."memId" = msv.memid AND m."chunkId" = msv.chunkid',
+        *swap_sql("memory_search_vector", '(userid, memid, chunkid)', SEARCH_VECTOR_INDEXES),
+    ]
+
+
+async def is_partitioned(conn: asyncpg.Connection, table: str) -> bool:
+    return await conn.fetchval(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass($1))',
+        f'"{table}"')
+
+
+async def convert(conn: asyncpg.Connection, table: str, statements: List[str], dry_run: bool) -> None:
+    if await is_partitioned(conn, table):
+        logger.info(f"{table} is already partitioned, skipping")
+        return
+    if dry_run:
+        print(";\n".join(statements) + ";")
+        return
+    logger.info(f"Partitioning {table}")
+    async with conn.transaction():
+        for statement in statements:
+            await conn.execute(statement)
+    rows = await conn.fetchval(f'SELECT count(*) FROM "{table}"')
+    logger.info(f"{table} partitioned, {rows} rows copied; old table kept as {table}_unpartitioned")
+
+
+async def main(partitions: int, dry_run: bool):
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        # Memory first: the search vectors take their user from it
+        await convert(conn, "Memory", memory_sql(partitions), dry_run)
+        await convert(conn, "memory_search_vector", search_vector_sql(partitions), dry_run)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--partitions", type=int, default=MEMORY_PARTITIONS)
+    parser.add_argument("--dry-run", action="store_true", help="print the SQL instead of running it")
+    args = parser.parse_args()
+    asyncio.run(main(args.partitions, args.dry_run))
@@ -20,3 +20,27 @@ class AgentError(BaseModel):
 class AgentResponseWrapper(BaseModel):
     response: AgentResponse | None = None
     error: AgentError | None = None
+
+
+class AgentBatchResponseWrapper(BaseModel):
+    responses: List[AgentResponse] = []
+    errors: List[AgentError] = []
+
+
+class AgentSummary(BaseModel):
+    memoryId: str
+    userId: str
+    title: str = ""
+    chunk_count: int
+    transcript_length: int
+    elapsed_seconds: float | None = None
+
+
+class AgentSummaryWrapper(BaseModel):
+    response: AgentSummary | None = None
+    error: AgentError | None = None
+
+
+class AgentBatchSummaryWrapper(BaseModel):
+    responses: List[AgentSummary] = []
+    errors: List[AgentError] = []
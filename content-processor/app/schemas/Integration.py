@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -8,6 +8,9 @@ from app.schemas.Metadata import GDriveSpecificMd, Metadata, NotionSpecificMd
 class NotionRequest(BaseModel):
     page_id: str
     access_token: str
+    # Crawl the content of child pages and database rows, as the extractor
+    # always did for child pages; False renders them as their title only
+    crawl_child_pages: bool = True
     metadata: Metadata[NotionSpecificMd]
 
 
@@ -16,3 +19,55 @@ class GDriveRequest(BaseModel):
     access_token: str
     refresh_token: Optional[str] = ""
     metadata: Metadata[GDriveSpecificMd]
+
+
+class GDriveFolderRequest(BaseModel):
+    folder_id: Optional[str] = None
+    file_ids: List[str] = []
+    recursive: bool = True
+    access_token: str
+    refresh_token: Optional[str] = ""
+    metadata: Metadata[GDriveSpecificMd]
+
+
+class GDriveSyncRequest(BaseModel):
+    access_token: str
+    refresh_token: Optional[str] = ""
+    metadata: Metadata[GDriveSpecificMd]
+
+
+class GDriveSyncResult(BaseModel):
+    file_id: str
+    status: str  # unchanged | updated | reprocessed | removed | failed
+    memId: Optional[str] = None
+    unchanged_chunks: int = 0
+    reembedded_chunks: int = 0
+    deleted_chunks: int = 0
+    error: Optional[str] = None
+
+
+class GDriveSyncResponse(BaseModel):
+    results: List[GDriveSyncResult] = []
+    page_token: Optional[str] = None
+
+
+class NotionSyncRequest(BaseModel):
+    access_token: str
+    # Empty means every connected page of the user
+    page_ids: List[str] = []
+    crawl_child_pages: bool = True
+    metadata: Metadata[NotionSpecificMd]
+
+
+class NotionSyncResult(BaseModel):
+    page_id: str
+    status: str  # unchanged | updated | reprocessed | failed
+    memId: Optional[str] = None
+    unchanged_chunks: int = 0
+    reembedded_chunks: int = 0
+    deleted_chunks: int = 0
+    error: Optional[str] = None
+
+
+class NotionSyncResponse(BaseModel):
+    results: List[NotionSyncResult] = []
@@ -0,0 +1,24 @@
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    type: str
+    status: str = "queued"
+    # Poll this path for the result
+    status_url: str
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    type: str
+    user_id: str
+    status: str  # queued | running | completed | failed
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    # Times the job was started by a worker that then disappeared, plus one
+    attempts: int = 1
+    created_at: str
+    updated_at: str
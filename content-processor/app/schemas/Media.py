@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 
 from app.schemas.Metadata import ImageSpecificMd, MediaSpecificMd, Metadata
 
@@ -15,6 +17,10 @@ class ImageRequest(BaseModel):
     image_id: str
     metadata: Metadata[ImageSpecificMd]
 
+class ImageBatchRequest(BaseModel):
+    image_ids: List[str] = Field(min_length=1)
+    metadata: Metadata[ImageSpecificMd]
+
 class FileRequest(BaseModel):
     file_id: str
     metadata: Metadata[MediaSpecificMd]
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+from app.schemas.Metadata import Metadata, NoteSpecificMd
+
+
+class TextRequest(BaseModel):
+    text: str
+    metadata: Metadata[NoteSpecificMd]
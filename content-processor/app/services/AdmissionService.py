@@ -0,0 +1,216 @@
+"""
+Admission control for ingestion jobs.
+
+Every job gets a cost estimate up front (upload size, text length, chunk
+estimate) and is admitted to one of two lanes:
+
+- heavy (video, audio, pdf, git, Drive folders, syncs): few slots, so long
+  uploads cannot take over the event loop, CPU and provider quota;
+- light (notes, web pages, images, single integrations): many slots, so small
+  jobs start immediately even while the heavy lane is full.
+
+A lane admits jobs while both its slot count and its cost budget allow.
+Waiting jobs are served round-robin across users, and each user may hold a
+bounded number of slots per lane, so one user's lecture series queues
+behind itself rather than in front of everyone else. The oldest waiter
+that only lacks room holds the lane: nothing else starts until it fits, so
+a stream of small jobs cannot starve a large one.
+"""
+import asyncio
+import itertools
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
+from dotenv import load_dotenv
+
+from app.utils.app_logger_config import logger
+from app.utils.s3 import S3Operations
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+HEAVY_JOB_TYPES = {"video", "audio", "pdf", "git", "gdrive_folder", "sync"}
+
+# Rough cost, in units, of one byte / one character of input per job type
+BYTES_PER_UNIT = {
+    "video": 100 * 1024 * 1024,
+    "audio": 20 * 1024 * 1024,
+    "pdf": 5 * 1024 * 1024,
+    "image": 5 * 1024 * 1024,
+    "images": 5 * 1024 * 1024,
+}
+CHARS_PER_UNIT = 20000
+# Types whose size is not known before running them
+DEFAULT_UNITS = {"git": 4, "gdrive_folder": 4, "sync": 2, "youtube": 2, "gdrive": 2}
+
+s3Opr = S3Operations()
+
+
+@dataclass
+class JobCost:
+    lane: str
+    units: int
+    # What the estimate was based on, for logs
+    basis: str = ""
+
+
+_arrival = itertools.count()
+
+
+@dataclass
+class Waiter:
+    user_id: str
+    units: int
+    future: asyncio.Future
+    seq: int = field(default_factory=lambda: next(_arrival))
+
+
+@dataclass
+class Lane:
+    name: str
+    max_jobs: int
+    max_units: int
+    max_jobs_per_user: int
+    running_jobs: int = 0
+    running_units: int = 0
+    running_per_user: Dict[str, int] = field(default_factory=dict)
+    # Per-user FIFO of waiters, in round-robin order
+    waiting: "OrderedDict[str, Deque[Waiter]]" = field(default_factory=OrderedDict)
+
+
+def _s3_size(key: str) -> Optional[int]:
+    try:
+        return s3Opr.head_object(key)['ContentLength']
+    except Exception as e:
+        logger.warning(f"Could not size {key} for admission: {e}")
+        return None
+
+
+async def estimate_cost(job_type: str, request) -> JobCost:
+    """Estimate a job's cost from its request before any processing happens."""
+    lane = "heavy" if job_type in HEAVY_JOB_TYPES else "light"
+
+    if job_type in BYTES_PER_UNIT:
+        keys = getattr(request, "image_ids", None) or [
+            getattr(request, name) for name in ("file_id", "video_id", "audio_id", "image_id")
+            if getattr(request, name, None)
+        ]
+        sizes = await asyncio.gather(*[asyncio.to_thread(_s3_size, key) for key in keys])
+        if sizes and all(size is not None for size in sizes):
+            total = sum(sizes)
+            return JobCost(lane, max(1, -(-total // BYTES_PER_UNIT[job_type])), f"{total} bytes")
+        return JobCost(lane, DEFAULT_UNITS.get(job_type, 2), "unknown size")
+
+    text = getattr(request, "text", None)
+    if text is not None:
+        # About one chunk per 2k characters
+        return JobCost(lane, max(1, -(-len(text) // CHARS_PER_UNIT)), f"~{len(text) // 2000 + 1} chunks")
+
+    return JobCost(lane, DEFAULT_UNITS.get(job_type, 1), "type default")
+
+
+class AdmissionController:
+    def __init__(self):
+        self.lanes = {
+            "heavy": Lane(
+                "heavy",
+                max_jobs=int(os.getenv("HEAVY_JOB_SLOTS", "2")),
+                max_units=int(os.getenv("HEAVY_LANE_UNITS", "16")),
+                max_jobs_per_user=int(os.getenv("HEAVY_JOBS_PER_USER", "1")),
+            ),
+            "light": Lane(
+                "light",
+                max_jobs=int(os.getenv("LIGHT_JOB_SLOTS", "16")),
+                max_units=int(os.getenv("LIGHT_LANE_UNITS", "32")),
+                max_jobs_per_user=int(os.getenv("LIGHT_JOBS_PER_USER", "4")),
+            ),
+        }
+
+    def _under_user_cap(self, lane: Lane, waiter: Waiter) -> bool:
+        return lane.running_per_user.get(waiter.user_id, 0) < lane.max_jobs_per_user
+
+    def _has_room(self, lane: Lane, waiter: Waiter) -> bool:
+        if lane.running_jobs >= lane.max_jobs:
+            return False
+        # An idle lane always admits, so a job above the budget still runs alone
+        return lane.running_jobs == 0 or lane.running_units + waiter.units <= lane.max_units
+
+    def _head(self, lane: Lane) -> Optional[Waiter]:
+        """The oldest waiter held back only by the lane's room, not by its user's cap."""
+        eligible = [queue[0] for queue in lane.waiting.values()
+                    if queue and self._under_user_cap(lane, queue[0])]
+        return min(eligible, key=lambda waiter: waiter.seq, default=None)
+
+    def _fits(self, lane: Lane, waiter: Waiter, head: Optional[Waiter]) -> bool:
+        if not self._under_user_cap(lane, waiter) or not self._has_room(lane, waiter):
+            return False
+        # Running jobs drain until the head fits instead of newer jobs taking its room
+        return head is None or head is waiter or self._has_room(lane, head)
+
+    def _grant(self, lane: Lane, waiter: Waiter) -> None:
+        lane.running_jobs += 1
+        lane.running_units += waiter.units
+        lane.running_per_user[waiter.user_id] = lane.running_per_user.get(
+            waiter.user_id, 0) + 1
+        waiter.future.set_result(None)
+
+    def _dispatch(self, lane: Lane) -> None:
+        """Admit waiting jobs round-robin across users while the lane has room."""
+        progress = True
+        while progress and lane.waiting:
+            progress = False
+            for queue in lane.waiting.values():
+                while queue and queue[0].future.done():
+                    queue.popleft()
+            head = self._head(lane)
+            for user_id in list(lane.waiting):
+                queue = lane.waiting[user_id]
+                while queue and queue[0].future.done():
+                    queue.popleft()
+                if not queue:
+                    del lane.waiting[user_id]
+                    continue
+                if self._fits(lane, queue[0], head):
+                    self._grant(lane, queue.popleft())
+                    # This user goes to the back of the rotation
+                    lane.waiting.move_to_end(user_id)
+                    if not queue:
+                        del lane.waiting[user_id]
+                    progress = True
+                    break
+
+    def _release(self, lane: Lane, waiter: Waiter) -> None:
+        lane.running_jobs -= 1
+        lane.running_units -= waiter.units
+        lane.running_per_user[waiter.user_id] -= 1
+        if not lane.running_per_user[waiter.user_id]:
+            del lane.running_per_user[waiter.user_id]
+        self._dispatch(lane)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, cost: JobCost):
+        lane = self.lanes[cost.lane]
+        waiter = Waiter(user_id, max(1, cost.units),
+                        asyncio.get_running_loop().create_future())
+        lane.waiting.setdefault(user_id, deque()).append(waiter)
+        self._dispatch(lane)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller gave up
+                self._release(lane, waiter)
+            else:
+                self._dispatch(lane)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(lane, waiter)
+
+
+ADMISSION = AdmissionController()
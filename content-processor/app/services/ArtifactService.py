@@ -0,0 +1,136 @@
+"""
+Cross-user cache of processed public sources.
+
+Public YouTube videos, web pages and git repos are shared by many users.
+The expensive, user-independent part of ingesting them (fetching,
+segmentation, LLM contextualization and embedding) is stored once per
+canonical source identity in S3, so later ingestions of the same source
+only write the user's own Memory rows and vectors.
+"""
+import gzip
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cortex_shared import providers
+from dotenv import load_dotenv
+
+from app.utils.app_logger_config import logger
+from app.utils.s3 import S3Operations
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+ARTIFACT_CACHE_ENABLED = os.getenv(
+    "ARTIFACT_CACHE_ENABLED", "true").lower() == "true"
+ARTIFACT_CACHE_PREFIX = os.getenv("ARTIFACT_CACHE_PREFIX", "artifacts")
+# Bump when segmentation, contextualization or embedding models change
+ARTIFACT_VERSION = "v1"
+
+TRACKING_PARAM_PREFIXES = ("utm_",)
+# Matched exactly: prefixes would also drop "size", "sid", "reference"...
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "ref", "si"})
+
+s3Opr = S3Operations()
+# GitPython runs the git binary when imported
+git_cmd = providers.lazy_import("git.cmd")
+
+
+@dataclass
+class SourceArtifact:
+    key: str
+    chunks: List[str]
+    # LLM context for each chunk, without any user-specific prefix
+    contextualized: List[str]
+    embeddings: List[List[float]]
+    title: str = ""
+    description: str = ""
+    # Source-specific, user-independent per-chunk fields (timestamps, file names...)
+    chunk_details: List[Dict] = field(default_factory=list)
+    extra: Dict = field(default_factory=dict)
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL: lowercased host, no fragment, tracking params or trailing slash."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and not (scheme, parts.port) in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(k)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def youtube_artifact_key(video_id: str) -> str:
+    return f"youtube/{video_id}"
+
+
+def web_artifact_key(url: str, content: str) -> str:
+    return f"web/{_hash(normalize_url(url))}/{_hash(content)}"
+
+
+def git_artifact_key(repo_url: str, commit_sha: str) -> str:
+    return f"git/{_hash(normalize_url(repo_url.removesuffix('.git')))}/{commit_sha}"
+
+
+def get_remote_head_sha(repo_url: str) -> Optional[str]:
+    """Commit SHA of the remote HEAD, without cloning."""
+    try:
+        output = git_cmd.Git().ls_remote(repo_url, "HEAD")
+        return output.split()[0] if output else None
+    except Exception as e:
+        logger.error(f"Could not resolve HEAD of {repo_url}: {e}")
+        return None
+
+
+def _object_key(key: str) -> str:
+    return f"{ARTIFACT_CACHE_PREFIX}/{ARTIFACT_VERSION}/{key}.json.gz"
+
+
+def load_artifact(key: str) -> Optional[SourceArtifact]:
+    if not ARTIFACT_CACHE_ENABLED:
+        return None
+    try:
+        body = s3Opr.get_object(_object_key(key))['Body'].read()
+        return SourceArtifact(**json.loads(gzip.decompress(body)))
+    except ValueError:
+        # Not cached yet
+        return None
+    except Exception as e:
+        logger.error(f"Error loading artifact {key}: {e}")
+        return None
+
+
+def save_artifact(artifact: SourceArtifact) -> None:
+    if not ARTIFACT_CACHE_ENABLED:
+        return
+    # A partial artifact would poison every later ingestion of the source
+    if not artifact.chunks or not (len(artifact.chunks) == len(artifact.contextualized) == len(artifact.embeddings)):
+        logger.error(
+            f"Not caching artifact {artifact.key}: {len(artifact.chunks)} chunks, "
+            f"{len(artifact.contextualized)} contexts, {len(artifact.embeddings)} embeddings")
+        return
+    try:
+        body = gzip.compress(json.dumps(asdict(artifact)).encode("utf-8"))
+        s3Opr.put_object(_object_key(artifact.key), body,
+                         ContentType="application/json", ContentEncoding="gzip")
+    except Exception as e:
+        logger.error(f"Error saving artifact {artifact.key}: {e}")
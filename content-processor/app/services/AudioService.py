@@ -1,6 +1,8 @@
 from app.core.agents.MediaAgent import AudioAgent
+from app.schemas.Common import AgentResponse
+from app.schemas.Metadata import MediaSpecificMd, Metadata
 
 
-async def get_audio_transcript(s3_bucket_key):
-    audio_agent = AudioAgent(s3_media_key=s3_bucket_key)
-    return await audio_agent.process_media()
\ No newline at end of file
+async def get_audio_transcript(s3_bucket_key: str, md: Metadata[MediaSpecificMd]) -> AgentResponse:
+    audio_agent = AudioAgent(s3_media_key=s3_bucket_key, md=md)
+    return await audio_agent.process_media()
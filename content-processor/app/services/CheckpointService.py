@@ -0,0 +1,236 @@
+"""
+Resumable ingestion.
+
+A job that fails late (vector upsert, database insert) is retried by the
+consumer with the same payload. Stage results - the memory id, transcript,
+chunks, contextualized chunks and embeddings - are checkpointed under a job
+id derived from that payload, so the retry resumes after the last stage
+that completed instead of re-downloading, re-transcribing and
+re-contextualizing everything.
+"""
+import asyncio
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+from typing import Any, Awaitable, Callable, Optional, Union
+
+import redis
+from dotenv import load_dotenv
+
+from app.utils.app_logger_config import logger
+from app.utils.s3 import S3Operations
+from app.utils.status_tracking import REDIS_PASSWORD, REDIS_URL
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+# "redis" and "s3" share checkpoints between workers and Lambda invocations;
+# "local" keeps them on this machine's disk, which a retry elsewhere never sees
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "redis").lower()
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "/tmp/cortex-checkpoints")
+CHECKPOINT_PREFIX = os.getenv("CHECKPOINT_PREFIX", "checkpoints")
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(24 * 60 * 60)))
+CHECKPOINT_CLEANUP_INTERVAL = int(os.getenv("CHECKPOINT_CLEANUP_INTERVAL", "3600"))
+
+
+def make_job_id(*parts: Any) -> str:
+    """Stable id for a job: the same payload retried maps to the same id."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class LocalCheckpointStore:
+    def __init__(self, root: str = CHECKPOINT_DIR, ttl: int = CHECKPOINT_TTL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+
+    def _path(self, job_id: str, stage: str = "") -> str:
+        path = os.path.join(self.root, job_id)
+        return os.path.join(path, f"{stage}.json.gz") if stage else path
+
+    def load(self, job_id: str, stage: str) -> Optional[Any]:
+        path = self._path(job_id, stage)
+        if not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > self.ttl:
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, job_id: str, stage: str, value: Any) -> None:
+        os.makedirs(self._path(job_id), exist_ok=True)
+        path = self._path(job_id, stage)
+        # Write then rename so a crash never leaves a truncated stage behind
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+    def clear(self, job_id: str) -> None:
+        shutil.rmtree(self._path(job_id), ignore_errors=True)
+
+    def cleanup_expired(self) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for job_id in os.listdir(self.root):
+            path = self._path(job_id)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+class RedisCheckpointStore:
+    """
+    One hash per job, ``checkpoint:<job_id>``, with a gzipped JSON field per
+    stage. Redis expires the whole job, so there is nothing to clean up.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None, ttl: int = CHECKPOINT_TTL_SECONDS):
+        # Same Redis as the status tracker, but binary-safe for the gzipped stages
+        self.client = client or redis.Redis(
+            host=REDIS_URL, port=6379, password=REDIS_PASSWORD, ssl=True)
+        self.ttl = ttl
+
+    def _key(self, job_id: str) -> str:
+        return f"checkpoint:{job_id}"
+
+    def load(self, job_id: str, stage: str) -> Optional[Any]:
+        body = self.client.hget(self._key(job_id), stage)
+        if body is None:
+            return None
+        return json.loads(gzip.decompress(body))
+
+    def save(self, job_id: str, stage: str, value: Any) -> None:
+        key = self._key(job_id)
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, stage, gzip.compress(json.dumps(value).encode("utf-8")))
+            # Counted from the last completed stage, like the local store's mtime
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def clear(self, job_id: str) -> None:
+        self.client.delete(self._key(job_id))
+
+    def cleanup_expired(self) -> int:
+        return 0
+
+
+class S3CheckpointStore:
+    def __init__(self, prefix: str = CHECKPOINT_PREFIX, ttl: int = CHECKPOINT_TTL_SECONDS):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.s3 = S3Operations()
+
+    def _key(self, job_id: str, stage: str = "") -> str:
+        return f"{self.prefix}/{job_id}/{stage}.json.gz" if stage else f"{self.prefix}/{job_id}/"
+
+    def load(self, job_id: str, stage: str) -> Optional[Any]:
+        try:
+            body = self.s3.get_object(self._key(job_id, stage))['Body'].read()
+        except ValueError:
+            return None
+        payload = json.loads(gzip.decompress(body))
+        if payload["expires_at"] < time.time():
+            return None
+        return payload["value"]
+
+    def save(self, job_id: str, stage: str, value: Any) -> None:
+        payload = {"expires_at": time.time() + self.ttl, "value": value}
+        self.s3.put_object(self._key(job_id, stage), gzip.compress(json.dumps(payload).encode("utf-8")),
+                           ContentType="application/json", ContentEncoding="gzip")
+
+    def clear(self, job_id: str) -> None:
+        for obj in self.s3.list_objects(self._key(job_id)):
+            self.s3.delete_object(obj['Key'])
+
+    def cleanup_expired(self) -> int:
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for obj in self.s3.list_objects(f"{self.prefix}/"):
+            if obj['LastModified'].timestamp() < cutoff:
+                self.s3.delete_object(obj['Key'])
+                removed += 1
+        return removed
+
+
+def get_checkpoint_store():
+    if CHECKPOINT_BACKEND == "s3":
+        return S3CheckpointStore()
+    if CHECKPOINT_BACKEND == "local":
+        return LocalCheckpointStore()
+    return RedisCheckpointStore()
+
+
+CHECKPOINTS = get_checkpoint_store()
+
+
+class JobCheckpoint:
+    """
+    Stage runner for one job. A job without an id (``JobCheckpoint(None)``)
+    just runs every stage, so agents can use it unconditionally.
+    """
+
+    def __init__(self, job_id: Optional[str], store=None):
+        self.job_id = job_id
+        self.store = store or CHECKPOINTS
+
+    async def stage(self, name: str, compute: Callable[[], Union[Any, Awaitable[Any]]]) -> Any:
+        """Return the checkpointed result of ``name``, computing and saving it if missing."""
+        if self.job_id is None:
+            return await _resolve(compute())
+
+        try:
+            value = await asyncio.to_thread(self.store.load, self.job_id, name)
+        except Exception as e:
+            logger.error(f"Could not load checkpoint {self.job_id}/{name}: {e}")
+            value = None
+        if value is not None:
+            logger.info(f"Resuming job {self.job_id} from stage '{name}'")
+            return value
+
+        value = await _resolve(compute())
+        # Empty results usually mean an upstream call failed; recompute them on retry
+        if value:
+            try:
+                await asyncio.to_thread(self.store.save, self.job_id, name, value)
+            except Exception as e:
+                logger.error(f"Could not save checkpoint {self.job_id}/{name}: {e}")
+        return value
+
+    async def clear(self) -> None:
+        if self.job_id is None:
+            return
+        try:
+            await asyncio.to_thread(self.store.clear, self.job_id)
+        except Exception as e:
+            logger.error(f"Could not clear checkpoints of {self.job_id}: {e}")
+
+
+NO_CHECKPOINT = JobCheckpoint(None)
+
+
+async def _resolve(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+async def run_checkpoint_cleanup() -> None:
+    """Periodically drop checkpoints of jobs that never completed."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(CHECKPOINTS.cleanup_expired)
+            if removed:
+                logger.info(f"Removed {removed} expired checkpoints")
+        except Exception as e:
+            logger.error(f"Checkpoint cleanup failed: {e}")
+        await asyncio.sleep(CHECKPOINT_CLEANUP_INTERVAL)
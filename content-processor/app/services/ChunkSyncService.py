@@ -0,0 +1,233 @@
+import hashlib
+import json
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Type
+
+from pydantic import BaseModel
+
+from app.core.PineconeClient import PineconeClient
+from app.core.voyage import voyage_client
+from app.prisma.prisma import prisma
+from app.schemas.Metadata import Metadata
+from app.services.MemoryService import (delete_memory_chunks,
+                                        get_search_vectors,
+                                        insert_many_memories_to_db,
+                                        set_search_vectors)
+from app.utils.app_logger_config import logger
+from app.utils.chunk_metadata import ChunkMetadata
+from app.utils.chunk_processing import update_chunks
+from app.utils.Vectors import WINDOWED_MEM_TYPES, memory_data
+
+CENTRAL_PATTERN = re.compile(r'<central>(.*?)</central>', re.DOTALL)
+
+
+@dataclass
+class ChunkDiff:
+    """How a new chunk list relates to the chunks already stored for a memory."""
+    unchanged: List[int] = field(default_factory=list)
+    # new index -> old index holding identical text at a different position
+    moved: Dict[int, int] = field(default_factory=dict)
+    changed: List[int] = field(default_factory=list)
+    # old indices past the end of the new chunk list
+    stale: List[int] = field(default_factory=list)
+
+
+def hash_chunk(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_index(row) -> int:
+    if row.chunkIndex is not None:
+        return row.chunkIndex
+    # Rows not yet backfilled, see app.backfill_chunk_index
+    return int(row.chunkId.split('_')[-1])
+
+
+def stored_chunk_hash(row) -> str:
+    """Hash of the chunk a row holds, whatever MEMORY_STORAGE_MODE wrote it."""
+    metadata = json.loads(row.metadata) if isinstance(row.metadata, str) else row.metadata
+    if metadata and metadata.get("content_hash"):
+        return metadata["content_hash"]
+    # Windowed rows hold the chunk between its neighbours
+    central = CENTRAL_PATTERN.search(row.memData)
+    return hash_chunk(central.group(1) if central else row.memData)
+
+
+def diff_chunks(old_hashes: Dict[int, str], new_chunks: List[str]) -> ChunkDiff:
+    """
+    Compare stored chunk hashes (by index) against a freshly segmented chunk list.
+
+    Chunks keep their position-based ids, so only chunks whose text is new
+    need contextualizing and embedding; chunks whose text merely shifted
+    position can reuse their existing embedding.
+    """
+    diff = ChunkDiff()
+    new_hashes = [hash_chunk(chunk) for chunk in new_chunks]
+
+    available = defaultdict(list)
+    for index, chunk_hash in sorted(old_hashes.items()):
+        if new_hashes[index:index + 1] != [chunk_hash]:
+            available[chunk_hash].append(index)
+
+    for index, chunk_hash in enumerate(new_hashes):
+        if old_hashes.get(index) == chunk_hash:
+            diff.unchanged.append(index)
+        elif available[chunk_hash]:
+            diff.moved[index] = available[chunk_hash].pop(0)
+        else:
+            diff.changed.append(index)
+
+    diff.stale = sorted(
+        index for index in old_hashes if index >= len(new_chunks))
+    return diff
+
+
+async def delete_memory(user_id: str, mem_id: str, batch_size: int = 100) -> None:
+    """Remove every vector and row belonging to a memory."""
+    rows = await prisma.memory.find_many(where={"userId": user_id, "memId": mem_id})
+    if not rows:
+        return
+    chunk_ids = [row.chunkId for row in rows]
+    pinecone_client = PineconeClient()
+    for i in range(0, len(chunk_ids), batch_size):
+        batch = chunk_ids[i:i + batch_size]
+        pinecone_client.delete([f"{mem_id}_{chunk_id}" for chunk_id in batch])
+    await delete_memory_chunks(user_id, mem_id, chunk_ids, batch_size)
+
+
+async def sync_memory_chunks(
+    md: Metadata,
+    chunks: List[str],
+    specific_cls: Type[BaseModel],
+    build_specific_md: Callable[[int], Dict[str, Any]],
+    mem_type: str,
+    batch_size: int = 100
+) -> ChunkDiff:
+    """
+    Bring the stored chunks of ``md.memId`` in line with ``chunks``.
+
+    Only new or edited chunks are contextualized and embedded. Chunks that
+    moved reuse their stored embedding and search vector, and chunks past
+    the new end are deleted from Pinecone and Postgres in batches. Rows get
+    the memData the memory's agent writes (windowed under
+    MEMORY_STORAGE_MODE=windowed for WINDOWED_MEM_TYPES); the neighbours of
+    an edit then only get their memData refreshed.
+    """
+    mem_id = md.memId
+    rows = await prisma.memory.find_many(where={"userId": md.user_id, "memId": mem_id})
+    old_hashes = {chunk_index(row): stored_chunk_hash(row) for row in rows}
+    old_mem_data = {chunk_index(row): row.memData for row in rows}
+    diff = diff_chunks(old_hashes, chunks)
+
+    metadata = ChunkMetadata(md, specific_cls, base_columns=("content_hash",))
+    for i, chunk in enumerate(chunks):
+        metadata.append(base_fields={"content_hash": hash_chunk(chunk)}, **build_specific_md(i))
+
+    def vector_id(index: int) -> str:
+        return f"{mem_id}_{mem_id}_{index}"
+
+    pinecone_client = PineconeClient()
+    search_texts = {}
+
+    # Moved chunks: copy the stored embedding under the new position. Every
+    # source is fetched before anything is written, since a move target can
+    # be another move's source.
+    moved = list(diff.moved.items())
+    stored_values = {}
+    for i in range(0, len(moved), batch_size):
+        batch = moved[i:i + batch_size]
+        fetched = pinecone_client.fetch([vector_id(old) for _, old in batch])
+        for new, old in batch:
+            stored = fetched.vectors.get(vector_id(old))
+            if stored is None:
+                # Embedding went missing; treat the chunk as edited
+                diff.changed.append(new)
+            else:
+                stored_values[new] = stored.values
+
+    vectors = []
+    for new, values in stored_values.items():
+        vectors.append({
+            "id": vector_id(new),
+            "values": values,
+            "metadata": metadata.flatten(new),
+        })
+        search_texts[new] = chunks[new]
+    if vectors:
+        pinecone_client.upsert(vectors, batch_size)
+    # The stored search vectors hold the contextualized text; read them
+    # before their rows are rewritten, and put them back under the new ids
+    moved_search_vectors = await get_search_vectors(
+        md.user_id, mem_id, [f"{mem_id}_{diff.moved[new]}" for new in stored_values])
+
+    for new in diff.changed:
+        diff.moved.pop(new, None)
+    diff.changed.sort()
+
+    if diff.changed:
+        changed_chunks = [chunks[i] for i in diff.changed]
+        preprocessed_chunks = await update_chunks(
+            chunks=changed_chunks, userId=md.user_id, memoryId=mem_id)
+        preprocessed_chunks = [
+            md.title + " " + md.description + " " + chunk for chunk in preprocessed_chunks]
+        embeddings = await voyage_client.embed(preprocessed_chunks)
+        vectors = [{
+            "id": vector_id(index),
+            "values": values,
+            "metadata": metadata.flatten(index),
+        } for index, values in zip(diff.changed, embeddings)]
+        pinecone_client.upsert(vectors, batch_size)
+        for position, index in enumerate(diff.changed):
+            search_texts[index] = preprocessed_chunks[position] if position < len(
+                preprocessed_chunks) else chunks[index]
+
+    stale_ids = [vector_id(index) for index in diff.stale]
+    for i in range(0, len(stale_ids), batch_size):
+        pinecone_client.delete(stale_ids[i:i + batch_size])
+
+    rewritten = sorted(search_texts)
+    await delete_memory_chunks(
+        md.user_id, mem_id, [f"{mem_id}_{index}" for index in diff.stale + rewritten], batch_size)
+
+    # Same memData the memory's agent writes
+    stored_data = memory_data(chunks) if mem_type in WINDOWED_MEM_TYPES else list(chunks)
+    memories = [{
+        "memId": mem_id,
+        "userId": md.user_id,
+        "chunkId": f"{mem_id}_{index}",
+        "chunkIndex": index,
+        "title": md.title,
+        "memData": stored_data[index],
+        "memType": mem_type,
+        "source": md.source,
+        "tags": md.tags,
+        "metadata": metadata.to_json(index),
+    } for index in rewritten]
+    texts = [search_texts[index] for index in rewritten]
+    for i in range(0, len(memories), batch_size):
+        await insert_many_memories_to_db(
+            memories[i:i + batch_size], preprocessed_chunks=texts[i:i + batch_size])
+
+    carried = {}
+    for new in stored_values:
+        search_vector = moved_search_vectors.get(f"{mem_id}_{diff.moved[new]}")
+        if search_vector is not None:
+            carried[f"{mem_id}_{new}"] = search_vector
+    if carried:
+        await set_search_vectors(md.user_id, mem_id, carried)
+
+    # Unchanged chunks whose stored text still differs: windows around an
+    # edit, or rows written under another MEMORY_STORAGE_MODE
+    refreshed = [index for index in range(len(chunks))
+                 if index not in search_texts and old_mem_data.get(index) != stored_data[index]]
+    for index in refreshed:
+        await prisma.memory.update_many(
+            where={"userId": md.user_id, "memId": mem_id, "chunkId": f"{mem_id}_{index}"},
+            data={"memData": stored_data[index]})
+
+    logger.info(
+        f"Synced memory {mem_id}: {len(diff.unchanged)} unchanged, {len(diff.moved)} moved, "
+        f"{len(diff.changed)} re-embedded, {len(diff.stale)} deleted")
+    return diff
@@ -0,0 +1,146 @@
+"""
+Two-phase ingestion.
+
+LLM contextualization dominates ingestion time, so memories are first made
+searchable on embeddings of their raw chunks (fast phase). Contextualized
+embeddings are computed afterwards and overwrite the same vector ids in
+place (enrichment phase).
+
+Enrichment is not run in the request: the HTTP service may be frozen or
+recycled as soon as it responds. It is pushed to ``enrichment:queue`` on
+the queue Redis and run by the queue worker (``WORKER_MODE=queue``), which
+retries and dead-letters it like any other task. Two-phase ingestion is
+therefore off unless TWO_PHASE_INGESTION is set and a worker is running.
+
+Public sources (YouTube videos, web pages, Git repos at a known commit)
+that are not in the artifact cache yet go through the same two phases;
+their enrichment also saves the source artifact for later ingestions.
+Cached sources need neither phase.
+"""
+import asyncio
+import os
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from app.core.PineconeClient import PineconeClient
+from app.core.voyage import voyage_client
+from app.schemas.Metadata import Metadata
+from app.services.ArtifactService import SourceArtifact, save_artifact
+from app.services.CheckpointService import NO_CHECKPOINT, JobCheckpoint
+from app.services.MemoryService import update_search_vectors
+from app.utils.app_logger_config import logger
+from app.utils.chunk_processing import update_chunks
+from app.utils.queues import enqueue
+from app.utils.status_tracking import TRACKER, ProcessingStatus
+from app.utils.Vectors import chunk_ids, get_vectors, vector_stubs
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+TWO_PHASE_INGESTION = os.getenv(
+    "TWO_PHASE_INGESTION", "false").lower() == "true"
+# Workers consuming ENRICHMENT_QUEUE; background work yields to ingestion
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", "2"))
+
+ENRICHMENT_TASK = "enrich"
+# Only the Python worker reads this queue; the Go consumer has no handler for it
+ENRICHMENT_QUEUE = "enrichment:queue"
+
+
+def prefix_chunks(md: Metadata, chunks: List[str]) -> List[str]:
+    return [md.title + " " + md.description + " " + chunk for chunk in chunks]
+
+
+async def embed_raw_chunks(md: Metadata, chunks: List[str], metadata: List[Metadata], is_code=False, checkpoint: JobCheckpoint = NO_CHECKPOINT) -> List[str]:
+    """Fast phase: embed chunks with only the title/description prefix."""
+    texts = prefix_chunks(md, chunks)
+    embeddings = await checkpoint.stage(
+        "raw_embeddings", lambda: voyage_client.embed(texts, is_code))
+    vectors = get_vectors(metadata, embeddings)
+    TRACKER.update_status(
+        user_id=md.user_id, document_id=md.memId, status=ProcessingStatus.STORING_VECTORS, progress=85)
+    res = PineconeClient().upsert(vectors, 100)
+    logger.debug(f"Upsert response: {res}")
+    TRACKER.update_phase(md.user_id, md.memId,
+                         "fast", ProcessingStatus.SEARCHABLE)
+    return texts
+
+
+async def contextualize_and_overwrite(md: Metadata, chunks: List[str], vectors: List[dict], ids: List[str], is_code=False, update_search: bool = False, artifact: Optional[dict] = None) -> None:
+    """
+    Enrichment phase: contextualize, re-embed and overwrite vectors in place.
+    ``vectors`` are the fast phase's vectors without values (``vector_stubs``).
+
+    ``artifact`` holds the SourceArtifact fields of a public source other
+    than its chunks, contexts and embeddings. Chunks are then embedded with
+    the source's title and description, as LinkAgent.build_artifact does,
+    and the artifact is saved.
+    """
+    contextualized = await update_chunks(
+        chunks=chunks, userId=md.user_id, memoryId=md.memId, track_status=False)
+    if len(contextualized) != len(chunks):
+        raise RuntimeError(
+            f"Contextualized {len(contextualized)} of {len(chunks)} chunks")
+
+    if artifact is not None:
+        texts = [artifact["title"] + " " + artifact["description"] + " " + chunk
+                 for chunk in contextualized]
+    else:
+        texts = prefix_chunks(md, contextualized)
+    TRACKER.update_phase(md.user_id, md.memId, "enrichment",
+                         ProcessingStatus.CREATING_EMBEDDINGS, 85)
+    embeddings = await voyage_client.embed(texts, is_code)
+    PineconeClient().upsert([{**vector, "values": embedding}
+                             for vector, embedding in zip(vectors, embeddings)], 100)
+    if artifact is not None:
+        await asyncio.to_thread(save_artifact, SourceArtifact(
+            **artifact, chunks=chunks, contextualized=contextualized, embeddings=embeddings))
+
+    if update_search:
+        await update_search_vectors(
+            [md.user_id] * len(ids),
+            [md.memId] * len(ids),
+            ids,
+            texts,
+        )
+
+
+def schedule_enrichment(md: Metadata, chunks: List[str], metadata, is_code=False, update_search: bool = False, artifact: Optional[dict] = None) -> None:
+    """
+    Queue the enrichment of chunks already stored by the fast phase. The
+    message is in the Go consumer's format so QueueConsumer can run it.
+    See contextualize_and_overwrite for ``artifact``.
+    """
+    data = {
+        "metadata": md.model_dump(mode="json", exclude={"specific_desc"}),
+        "chunks": chunks,
+        "vectors": vector_stubs(metadata),
+        "chunk_ids": chunk_ids(metadata),
+        "is_code": is_code,
+        "update_search": update_search,
+    }
+    if artifact is not None:
+        data["artifact"] = artifact
+    enqueue(ENRICHMENT_QUEUE, ENRICHMENT_TASK, data)
+    TRACKER.update_phase(md.user_id, md.memId,
+                         "enrichment", ProcessingStatus.QUEUED)
+
+
+async def run_enrichment(data: dict) -> None:
+    """Handle one ``enrich`` task; raises so the consumer retries it."""
+    md = Metadata.model_validate({**data["metadata"], "specific_desc": None})
+    TRACKER.update_phase(md.user_id, md.memId, "enrichment",
+                         ProcessingStatus.CONTEXTUALIZING, 20)
+    try:
+        await contextualize_and_overwrite(md, data["chunks"], data["vectors"], data["chunk_ids"],
+                                          data.get("is_code", False), data.get("update_search", False),
+                                          data.get("artifact"))
+    except Exception as e:
+        # Raw-chunk vectors stay in place, so the memory remains searchable
+        logger.error(f"Enrichment failed for memory {md.memId}: {e}")
+        TRACKER.update_phase(md.user_id, md.memId, "enrichment",
+                             ProcessingStatus.FAILED, error=str(e))
+        raise
+    TRACKER.update_phase(md.user_id, md.memId, "enrichment",
+                         ProcessingStatus.COMPLETED, 100)
@@ -1,9 +1,87 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from aiolimiter import AsyncLimiter
+
 from app.core.agents.integrations.GDriveAgent import DriveAgent
-from app.schemas.Common import AgentResponse
+from app.schemas.Common import AgentBatchResponseWrapper, AgentError, AgentResponse
 from app.schemas.Metadata import GDriveSpecificMd, Metadata
+from app.utils.app_logger_config import logger
+from app.utils.drive_content_extractor import GDriveProcessor
+
+# Drive quotas are per user, so each user gets their own concurrency cap and
+# file-start rate no matter how many folder jobs they submit.
+DRIVE_FILE_CONCURRENCY = int(os.getenv("DRIVE_FILE_CONCURRENCY", "4"))
+DRIVE_FILES_PER_SECOND = float(os.getenv("DRIVE_FILES_PER_SECOND", "2"))
+
+
+
+class UserLimiter:
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(DRIVE_FILE_CONCURRENCY)
+        self.rate_limiter = AsyncLimiter(DRIVE_FILES_PER_SECOND, 1)
+        # Files of this user waiting for or holding a slot
+        self.users = 0
+
+
+# Only users with files in flight have an entry, so this stays small
+_user_limiters: Dict[str, UserLimiter] = {}
+
+
+@asynccontextmanager
+async def user_file_slot(user_id: str) -> AsyncIterator[None]:
+    """Hold one of ``user_id``'s Drive file slots for the duration of the block."""
+    limiter = _user_limiters.get(user_id)
+    if limiter is None:
+        limiter = _user_limiters[user_id] = UserLimiter()
+    limiter.users += 1
+    try:
+        async with limiter.semaphore:
+            await limiter.rate_limiter.acquire()
+            yield
+    finally:
+        limiter.users -= 1
+        if limiter.users == 0:
+            _user_limiters.pop(user_id, None)
 
 
 async def extract_text_from_drive_file(resource_link: str, access_token: str, metadata: Metadata[GDriveSpecificMd], refresh_token) -> AgentResponse:
     agent = DriveAgent(resource_link, access_token,
                        metadata, refresh_token=refresh_token)
     return await agent.process_media()
+
+
+async def extract_text_from_drive_files(access_token: str, metadata: Metadata[GDriveSpecificMd], refresh_token, folder_id: Optional[str] = None, file_ids: Optional[List[str]] = None, recursive: bool = True) -> AgentBatchResponseWrapper:
+    """
+    Process every file in a Drive folder (and/or an explicit list of files)
+    concurrently, each as its own memory.
+    """
+    files = [{"id": file_id, "name": ""} for file_id in file_ids or []]
+    if folder_id:
+        processor = await asyncio.to_thread(
+            GDriveProcessor, folder_id, access_token, refresh_token)
+        files.extend(await asyncio.to_thread(
+            processor.list_folder_files, folder_id, recursive))
+
+    async def process_file(file: dict) -> AgentResponse:
+        file_md = metadata.model_copy()
+        if file["name"]:
+            file_md.title = f"{metadata.title} - {file['name']}" if metadata.title else file["name"]
+        async with user_file_slot(metadata.user_id):
+            return await extract_text_from_drive_file(
+                file["id"], access_token, file_md, refresh_token)
+
+    results = await asyncio.gather(
+        *[process_file(file) for file in files], return_exceptions=True)
+
+    batch = AgentBatchResponseWrapper()
+    for file, result in zip(files, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to process Drive file {file['id']}: {result}")
+            batch.errors.append(AgentError(
+                error=f"{file['name'] or file['id']}: {str(result)}"))
+        else:
+            batch.responses.append(result)
+    return batch
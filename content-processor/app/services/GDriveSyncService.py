@@ -0,0 +1,186 @@
+import asyncio
+from typing import Callable, Optional
+
+from app.core.agents.integrations.GDriveAgent import DriveAgent
+from app.core.jina_ai import use_jina
+from app.prisma import prisma
+from app.schemas.Integration import GDriveSyncResponse, GDriveSyncResult
+from app.schemas.Metadata import GDriveFileType, GDriveSpecificMd, Metadata
+from app.services.ChunkSyncService import delete_memory, sync_memory_chunks
+from app.services.GDriveService import user_file_slot
+from app.utils.app_logger_config import logger
+from app.utils.drive_content_extractor import (GDriveProcessor, StalePageToken,
+                                               build_service)
+
+# Google-native files are re-extracted as text and diffed chunk by chunk;
+# binary files (pdf, media, images) are reprocessed whole when they change.
+TEXT_EXTRACTORS = {
+    GDriveFileType.GDOC: GDriveProcessor.extract_doc_content,
+    GDriveFileType.GSHEET: GDriveProcessor.extract_sheet_content,
+    GDriveFileType.GSLIDE: GDriveProcessor.extract_slide_content,
+}
+
+
+def is_unchanged(row, file_metadata: dict) -> bool:
+    if row.md5Checksum and file_metadata.get("md5Checksum"):
+        return row.md5Checksum == file_metadata["md5Checksum"]
+    return bool(row.modifiedTime) and row.modifiedTime == file_metadata.get("modifiedTime")
+
+
+async def find_legacy_memory(row) -> Optional[str]:
+    """
+    Memory already ingested for a connected file whose row predates the
+    memId column, matched on the file id stored in its chunk metadata.
+    """
+    found = await prisma.prisma.query_raw(
+        'SELECT "memId" FROM "Memory" WHERE "userId" = $1 AND "memType" = \'drive\' '
+        "AND metadata -> 'specific_desc' ->> 'file_id' = $2 LIMIT 1",
+        row.userId, row.fileId)
+    if not found:
+        return None
+    mem_id = found[0]["memId"]
+    await prisma.prisma.connectedgdrivefiles.update(
+        where={"userId_fileId": {"userId": row.userId, "fileId": row.fileId}},
+        data={"memId": mem_id}
+    )
+    return mem_id
+
+
+async def sync_drive_file(row, access_token: str, metadata: Metadata[GDriveSpecificMd], refresh_token, service_factory: Callable) -> GDriveSyncResult:
+    processor = await asyncio.to_thread(
+        GDriveProcessor, row.fileId, access_token, refresh_token, service_factory)
+    try:
+        file_type, file_metadata = await asyncio.to_thread(processor.get_file_type)
+    except Exception as e:
+        # Deleted for good; only seen when the change log could not be used
+        if getattr(getattr(e, "resp", None), "status", None) == 404:
+            return await remove_drive_file(row)
+        raise
+    if file_metadata.get("trashed"):
+        return await remove_drive_file(row)
+
+    mem_id = row.memId or await find_legacy_memory(row)
+    if mem_id and is_unchanged(row, file_metadata):
+        return GDriveSyncResult(file_id=row.fileId, status="unchanged", memId=mem_id)
+
+    file_md = metadata.model_copy()
+    file_md.title = row.name or metadata.title
+
+    if mem_id and file_type in TEXT_EXTRACTORS:
+        content = await asyncio.to_thread(TEXT_EXTRACTORS[file_type], processor)
+        chunks = await use_jina.segment_data(content) if content else []
+        file_md.memId = mem_id
+
+        def build_specific_md(i: int) -> dict:
+            return {
+                "chunk_id": f"{mem_id}_{i}",
+                "file_id": row.fileId,
+                "page_number": i,
+                "sheet_name": None,
+            }
+
+        diff = await sync_memory_chunks(file_md, chunks, GDriveSpecificMd, build_specific_md, 'drive')
+        await prisma.prisma.connectedgdrivefiles.update(
+            where={"userId_fileId": {"userId": row.userId, "fileId": row.fileId}},
+            data={
+                "modifiedTime": file_metadata.get("modifiedTime"),
+                "md5Checksum": file_metadata.get("md5Checksum"),
+            }
+        )
+        return GDriveSyncResult(
+            file_id=row.fileId,
+            status="updated",
+            memId=mem_id,
+            unchanged_chunks=len(diff.unchanged) + len(diff.moved),
+            reembedded_chunks=len(diff.changed),
+            deleted_chunks=len(diff.stale),
+        )
+
+    # DriveAgent records the new memId, modifiedTime and md5Checksum on the row
+    agent = DriveAgent(row.fileId, access_token, file_md,
+                       refresh_token=refresh_token, service_factory=service_factory)
+    response = await agent.process_media()
+    # The old memory is only dropped once its replacement is stored, so a
+    # failed download or embedding leaves the user's memory in place
+    if mem_id and mem_id != response.memoryId:
+        try:
+            await delete_memory(row.userId, mem_id)
+        except Exception as e:
+            logger.error(
+                f"Reprocessed Drive file {row.fileId} but could not delete old memory {mem_id}: {e}")
+    return GDriveSyncResult(
+        file_id=row.fileId,
+        status="reprocessed",
+        memId=response.memoryId,
+        reembedded_chunks=len(response.chunks),
+    )
+
+
+async def remove_drive_file(row) -> GDriveSyncResult:
+    if row.memId:
+        await delete_memory(row.userId, row.memId)
+    await prisma.prisma.connectedgdrivefiles.update(
+        where={"userId_fileId": {"userId": row.userId, "fileId": row.fileId}},
+        data={"state": "removed", "memId": None}
+    )
+    return GDriveSyncResult(file_id=row.fileId, status="removed")
+
+
+async def sync_user_drive_files(access_token: str, metadata: Metadata[GDriveSpecificMd], refresh_token=None, service_factory: Callable = build_service) -> GDriveSyncResponse:
+    """
+    Bring a user's connected Drive files up to date.
+
+    The first sync records a Drive changes page token. Later syncs read the
+    change log from that token, so files nobody touched are skipped without
+    any per-file API call; touched files are compared on modifiedTime /
+    md5Checksum before any content is downloaded. A token Drive no longer
+    accepts is replaced, and that sync compares every file.
+    """
+    user_id = metadata.user_id
+    rows = await prisma.prisma.connectedgdrivefiles.find_many(
+        where={"userId": user_id, "state": "connected"})
+    if not rows:
+        return GDriveSyncResponse()
+
+    drive = await asyncio.to_thread(
+        GDriveProcessor, rows[0].fileId, access_token, refresh_token, service_factory)
+    page_token: Optional[str] = next(
+        (row.changesPageToken for row in rows if row.changesPageToken), None)
+
+    changed, removed, new_token = None, set(), None
+    if page_token:
+        try:
+            changed, removed, new_token = await asyncio.to_thread(drive.list_changes, page_token)
+        except StalePageToken as e:
+            # Fall back to comparing every file, as on the first sync
+            logger.warning(f"Drive changes token for user {user_id} is stale, checking every file: {e}")
+    if new_token is None:
+        # Take the token before reading any file so edits made during this
+        # sync show up in the next one
+        new_token = await asyncio.to_thread(drive.get_start_page_token)
+
+    async def sync_row(row) -> GDriveSyncResult:
+        try:
+            if row.fileId in removed:
+                return await remove_drive_file(row)
+            if changed is not None and row.memId and row.fileId not in changed:
+                return GDriveSyncResult(file_id=row.fileId, status="unchanged", memId=row.memId)
+            async with user_file_slot(user_id):
+                return await sync_drive_file(row, access_token, metadata, refresh_token, service_factory)
+        except Exception as e:
+            logger.error(f"Failed to sync Drive file {row.fileId}: {e}")
+            return GDriveSyncResult(file_id=row.fileId, status="failed", memId=row.memId, error=str(e))
+
+    results = await asyncio.gather(*[sync_row(row) for row in rows])
+
+    # Only advance the token when every file made it; failed files are then
+    # retried from the same point next time
+    if all(result.status != "failed" for result in results):
+        await prisma.prisma.connectedgdrivefiles.update_many(
+            where={"userId": user_id},
+            data={"changesPageToken": new_token}
+        )
+    else:
+        new_token = page_token
+
+    return GDriveSyncResponse(results=list(results), page_token=new_token)
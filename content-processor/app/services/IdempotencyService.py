@@ -0,0 +1,174 @@
+"""
+Idempotent ingestion requests.
+
+The consumer retries a task when its HTTP call times out, and every agent
+mints a fresh memId, so without this a retry ingests the same upload a
+second time. Requests carrying an ``Idempotency-Key`` header reserve that
+key atomically in Redis (SET NX) before running:
+
+- the first request runs the pipeline and stores its response under the key;
+- a retry of a completed request gets the stored response back;
+- a retry of a request still in flight waits for it and returns its result;
+- if the original request fails the key is released and the retry runs it.
+
+The reservation is renewed while the pipeline runs, so a long job keeps it
+and a crashed worker's reservation lapses after IDEMPOTENCY_LOCK_TTL_SECONDS.
+Ingestion results are stored slimmed to the memory they created: a replay
+returns the ids and the first chunk's metadata, not the transcript and
+chunks, which are already in the database.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from typing import Awaitable, Callable, Optional, Type, TypeVar
+
+from dotenv import load_dotenv
+from fastapi import Header, HTTPException
+from pydantic import BaseModel
+
+from app.schemas.Common import AgentBatchResponseWrapper, AgentResponse
+from app.utils.app_logger_config import logger
+from app.utils.status_tracking import TRACKER
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+# Responses of completed requests are replayed for this long
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+# A reservation whose worker died is released after this long; live ones are
+# renewed every third of it
+IDEMPOTENCY_LOCK_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_TTL_SECONDS", "300"))
+# How long a duplicate waits for the request in flight before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "900"))
+IDEMPOTENCY_POLL_INTERVAL = 2.0
+
+IDEMPOTENCY_HEADER = Header(default=None, alias="Idempotency-Key")
+
+# Only the owner of a reservation may complete or release it
+_RELEASE_SCRIPT = TRACKER.redis_client.register_script("""
+local current = redis.call('GET', KEYS[1])
+if not current then return 0 end
+if cjson.decode(current)['owner'] ~= ARGV[1] then return 0 end
+if ARGV[2] == '' then
+    return redis.call('DEL', KEYS[1])
+end
+return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3]) and 1 or 0
+""")
+
+_RENEW_SCRIPT = TRACKER.redis_client.register_script("""
+local current = redis.call('GET', KEYS[1])
+if not current then return 0 end
+local record = cjson.decode(current)
+if record['owner'] ~= ARGV[1] or record['state'] ~= 'in_progress' then return 0 end
+return redis.call('EXPIRE', KEYS[1], ARGV[2])
+""")
+
+R = TypeVar('R', bound=BaseModel)
+
+
+def _key(scope: str, user_id: str, idempotency_key: str) -> str:
+    return f"idempotency:{scope}:{user_id}:{idempotency_key}"
+
+
+def fingerprint(request: BaseModel) -> str:
+    return hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def reserve(key: str, owner: str, request_hash: str) -> bool:
+    record = {"state": "in_progress", "owner": owner, "fingerprint": request_hash}
+    return bool(TRACKER.redis_client.set(
+        key, json.dumps(record), nx=True, ex=IDEMPOTENCY_LOCK_TTL_SECONDS))
+
+
+def _slim(response: BaseModel) -> BaseModel:
+    """What a replay needs of ``response``: the memories created, not their content."""
+    if isinstance(response, AgentResponse):
+        return AgentResponse(transcript="", chunks=[], metadata=response.metadata[:1],
+                             userId=response.userId, memoryId=response.memoryId)
+    if isinstance(response, AgentBatchResponseWrapper):
+        return AgentBatchResponseWrapper(
+            responses=[_slim(r) for r in response.responses], errors=response.errors)
+    return response
+
+
+def complete(key: str, owner: str, request_hash: str, response: BaseModel) -> None:
+    record = {
+        "state": "completed",
+        "owner": owner,
+        "fingerprint": request_hash,
+        "response": _slim(response).model_dump_json(),
+    }
+    _RELEASE_SCRIPT(keys=[key], args=[owner, json.dumps(record), IDEMPOTENCY_TTL_SECONDS])
+
+
+def release(key: str, owner: str) -> None:
+    _RELEASE_SCRIPT(keys=[key], args=[owner, "", 0])
+
+
+async def _keep_reserved(key: str, owner: str) -> None:
+    """Extend the reservation while its request runs."""
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_LOCK_TTL_SECONDS / 3)
+        try:
+            renewed = await asyncio.to_thread(
+                _RENEW_SCRIPT, keys=[key], args=[owner, IDEMPOTENCY_LOCK_TTL_SECONDS])
+        except Exception as e:
+            logger.warning(f"Could not renew idempotency reservation {key}: {e}")
+            continue
+        if not renewed:
+            logger.warning(f"Lost idempotency reservation {key}")
+            return
+
+
+async def run_idempotent(
+    idempotency_key: Optional[str],
+    scope: str,
+    request: BaseModel,
+    user_id: str,
+    response_model: Type[R],
+    compute: Callable[[], Awaitable[R]],
+) -> R:
+    """Run ``compute`` at most once per (scope, user, idempotency key)."""
+    if not idempotency_key:
+        return await compute()
+
+    key = _key(scope, user_id, idempotency_key)
+    request_hash = fingerprint(request)
+    owner = str(uuid.uuid4())
+    waited = 0.0
+
+    while not reserve(key, owner, request_hash):
+        data = TRACKER.redis_client.get(key)
+        if data is None:
+            # Released or expired between SET NX and GET; try again
+            continue
+        record = json.loads(data)
+        if record["fingerprint"] != request_hash:
+            raise HTTPException(
+                status_code=422, detail="Idempotency-Key was already used with a different request")
+        if record["state"] == "completed":
+            logger.info(f"Replaying response for idempotency key {idempotency_key}")
+            return response_model.model_validate_json(record["response"])
+        if waited >= IDEMPOTENCY_WAIT_SECONDS:
+            raise HTTPException(
+                status_code=409, detail="A request with this Idempotency-Key is still being processed")
+        await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+        waited += IDEMPOTENCY_POLL_INTERVAL
+
+    heartbeat = asyncio.create_task(_keep_reserved(key, owner))
+    try:
+        response = await compute()
+    except BaseException:
+        release(key, owner)
+        raise
+    finally:
+        heartbeat.cancel()
+
+    # Empty results and error wrappers are not cached so a retry gets another chance
+    if response is not None and getattr(response, "error", None) is None:
+        await asyncio.to_thread(complete, key, owner, request_hash, response)
+    else:
+        release(key, owner)
+    return response
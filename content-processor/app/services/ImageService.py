@@ -1,7 +1,15 @@
-from app.core.agents.MediaAgent import ImageAgent
+from typing import List
+
+from app.core.agents.MediaAgent import ImageAgent, ImageBatchAgent
+from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import ImageSpecificMd, Metadata
 
 
 async def get_image_transcript(s3_bucket_key, metadata: Metadata[ImageSpecificMd]) -> dict:
     image_agent = ImageAgent(s3_media_key=s3_bucket_key, md=metadata)
     return await image_agent.process_media()
+
+
+async def get_batch_image_transcript(s3_bucket_keys: List[str], metadata: Metadata[ImageSpecificMd]) -> AgentResponse:
+    image_agent = ImageBatchAgent(s3_media_keys=s3_bucket_keys, md=metadata)
+    return await image_agent.process_media()
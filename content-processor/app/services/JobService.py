@@ -0,0 +1,211 @@
+"""
+Submit-and-poll ingestion.
+
+Routes called with ``Prefer: respond-async`` enqueue the pipeline instead of
+running it inside the request, answer ``202 Accepted`` with a job id, and
+the result is read later from ``GET /api/v1/jobs/{job_id}?userId=...``.
+
+Jobs are pushed to ``jobs:queue`` on the queue Redis and run by the queue
+worker (``WORKER_MODE=queue``), never by the API process, which on Lambda is
+frozen as soon as it has answered. Admission control still decides when a
+job starts. Job records live in Redis so any API instance can answer the
+poll.
+
+The worker beats on a job while it runs. A job whose worker stopped beating
+for JOB_STALE_SECONDS is put back on the queue, at most JOB_MAX_ATTEMPTS
+times, and then failed. A job's id is its idempotency key, so a job that
+did complete before its worker died is not ingested twice.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, Type
+
+from dotenv import load_dotenv
+from fastapi import Header, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.schemas.Jobs import JobAccepted, JobStatus
+from app.services.AdmissionService import ADMISSION, estimate_cost
+from app.services.IdempotencyService import run_idempotent
+from app.services.ResponseService import slim_result
+from app.utils.app_logger_config import logger
+from app.utils.queues import get_queue_client, task_message
+from app.utils.status_tracking import TRACKER
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 60 * 60)))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "180"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Only the Python worker reads this queue; tasks are keyed by route scope
+JOBS_QUEUE = "jobs:queue"
+# job id -> time of the last heartbeat, for jobs being run
+RUNNING_JOBS = "jobs:running"
+
+PREFER_HEADER = Header(default=None, alias="Prefer")
+USER_ID_QUERY = Query(alias="userId")
+
+
+def prefers_async(prefer: Optional[str]) -> bool:
+    return bool(prefer) and "respond-async" in prefer.lower()
+
+
+@dataclass
+class IngestionJob:
+    type: str
+    # Idempotency scope of the route that submitted the job
+    scope: str
+    request: BaseModel
+    user_id: str
+    compute: Callable[[], Awaitable[Optional[BaseModel]]]
+    job_id: str = ""
+    # Form of the result kept on the job record, see ResponseService
+    response_mode: str = "full"
+
+    async def execute(self) -> Optional[BaseModel]:
+        """Run the pipeline once admission control lets it in."""
+        cost = await estimate_cost(self.type, self.request)
+        logger.info(
+            f"Job {self.job_id or self.scope} for {self.user_id}: {cost.lane} lane, {cost.units} units ({cost.basis})")
+        async with ADMISSION.admit(self.user_id, cost):
+            return await self.compute()
+
+
+def _key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _message_key(job_id: str) -> str:
+    # Kept apart from the record: it holds the request, access tokens included
+    return f"job:{job_id}:message"
+
+
+def save_job_status(status: JobStatus) -> None:
+    TRACKER.redis_client.set(_key(status.job_id), status.model_dump_json(), ex=JOB_TTL_SECONDS)
+
+
+def get_job_status(job_id: str) -> Optional[JobStatus]:
+    data = TRACKER.redis_client.get(_key(job_id))
+    return JobStatus.model_validate_json(data) if data else None
+
+
+def update_job_status(job_id: str, status: str, result: Optional[BaseModel] = None, error: Optional[str] = None, attempts: Optional[int] = None) -> Optional[JobStatus]:
+    current = get_job_status(job_id)
+    if current is None:
+        return None
+    updated = current.model_copy(update={
+        "status": status,
+        "result": json.loads(result.model_dump_json()) if result is not None else None,
+        "error": error,
+        "attempts": attempts if attempts is not None else current.attempts,
+        "updated_at": datetime.utcnow().isoformat(),
+    })
+    save_job_status(updated)
+    return updated
+
+
+def queue_job(job: IngestionJob) -> None:
+    now = datetime.utcnow().isoformat()
+    save_job_status(JobStatus(job_id=job.job_id, type=job.type, user_id=job.user_id,
+                              status="queued", created_at=now, updated_at=now))
+    message = task_message(job.scope, job.request.model_dump(mode="json"),
+                           job_id=job.job_id, response_mode=job.response_mode)
+    TRACKER.redis_client.set(_message_key(job.job_id), message, ex=JOB_TTL_SECONDS)
+    get_queue_client().lpush(JOBS_QUEUE, message)
+
+
+def finish_job(job_id: str, status: str, result: Optional[BaseModel] = None, error: Optional[str] = None) -> None:
+    """Record a final state; the job is no longer watched for staleness."""
+    update_job_status(job_id, status, result=result, error=error)
+    TRACKER.redis_client.zrem(RUNNING_JOBS, job_id)
+    TRACKER.redis_client.delete(_message_key(job_id))
+
+
+def retry_job(job_id: str, error: str) -> None:
+    """Back to queued while the consumer retries the message itself."""
+    update_job_status(job_id, "queued", error=error)
+    TRACKER.redis_client.zrem(RUNNING_JOBS, job_id)
+
+
+async def _heartbeat(job_id: str) -> None:
+    while True:
+        TRACKER.redis_client.zadd(RUNNING_JOBS, {job_id: time.time()})
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
+
+async def run_job(job: IngestionJob, response_model: Type[BaseModel]) -> Optional[BaseModel]:
+    """
+    Run a queued job on the worker. Failures are left to the consumer, which
+    retries the message and calls ``finish_job`` once it gives up.
+    """
+    update_job_status(job.job_id, "running")
+    heartbeat = asyncio.create_task(_heartbeat(job.job_id))
+    try:
+        result = await run_idempotent(
+            job.job_id, f"{job.scope}:job", job.request, job.user_id, response_model, job.execute)
+    finally:
+        heartbeat.cancel()
+    if result is None:
+        raise RuntimeError("Pipeline returned no result")
+    finish_job(job.job_id, "completed", result=slim_result(result, job.response_mode))
+    return result
+
+
+def recover_stale_jobs() -> int:
+    """Requeue jobs whose worker stopped beating, failing those out of attempts."""
+    recovered = 0
+    stale = TRACKER.redis_client.zrangebyscore(
+        RUNNING_JOBS, 0, time.time() - JOB_STALE_SECONDS)
+    for job_id in stale:
+        # Only the worker that removes the entry recovers the job
+        if not TRACKER.redis_client.zrem(RUNNING_JOBS, job_id):
+            continue
+        status = get_job_status(job_id)
+        message = TRACKER.redis_client.get(_message_key(job_id))
+        if status is None or message is None:
+            continue
+        if status.attempts >= JOB_MAX_ATTEMPTS:
+            logger.error(f"Job {job_id} lost its worker {status.attempts} times, failing it")
+            finish_job(job_id, "failed", error="Worker stopped responding")
+            continue
+        logger.warning(f"Job {job_id} lost its worker, requeueing it")
+        update_job_status(job_id, "queued", attempts=status.attempts + 1)
+        get_queue_client().lpush(JOBS_QUEUE, message)
+        recovered += 1
+    return recovered
+
+
+async def run_job_recovery() -> None:
+    """Periodically requeue jobs abandoned by a worker that died."""
+    while True:
+        try:
+            recovered = await asyncio.to_thread(recover_stale_jobs)
+            if recovered:
+                logger.info(f"Requeued {recovered} stale jobs")
+        except Exception as e:
+            logger.error(f"Stale job recovery failed: {e}")
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
+
+async def submit_job(job: IngestionJob, idempotency_key: Optional[str] = None, response_mode: str = "full") -> JSONResponse:
+    """Enqueue ``job`` and answer 202; a repeated idempotency key returns the original job."""
+    job.response_mode = response_mode
+
+    async def enqueue() -> JobAccepted:
+        job.job_id = str(uuid.uuid4())
+        await asyncio.to_thread(queue_job, job)
+        return JobAccepted(job_id=job.job_id, type=job.type,
+                           status_url=f"/api/v1/jobs/{job.job_id}?userId={job.user_id}")
+
+    accepted = await run_idempotent(
+        idempotency_key, f"{job.scope}:async", job.request, job.user_id, JobAccepted, enqueue)
+    return JSONResponse(status_code=202, content=accepted.model_dump(), headers={"Location": accepted.status_url})
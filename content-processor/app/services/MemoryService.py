@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List
 
 import asyncpg
 from dotenv import load_dotenv
@@ -23,7 +24,9 @@ async def insert_memory_to_db(memory_data: dict):
 async def insert_many_memories_to_db(memory_data: list, isCode=False, preprocessed_chunks=[]):
     # memory_data = [sanitize_input(memory) for memory in memory_data]
     try:
-        memories = await prisma.memory.create_many(data=memory_data)
+        # Retried jobs re-insert the batches that already made it
+        memories = await prisma.memory.create_many(data=memory_data, skip_duplicates=True)
+        user_ids = []
         memory_ids = []
         chunk_ids = []
         filtered_meta_data = []
@@ -40,50 +43,132 @@ async def insert_many_memories_to_db(memory_data: list, isCode=False, preprocess
         for i in range(len(memory_data)):
             if (i < len(preprocessed_chunks)):
                 data.append({
+                    "userId": memory_data[i]["userId"],
                     "memId": memory_data[i]["memId"],
                     "chunkId": memory_data[i]["chunkId"],
                     "memData": preprocessed_chunks[i]
                 })
             else:
                 data.append({
+                    "userId": memory_data[i]["userId"],
                     "memId": memory_data[i]["memId"],
                     "chunkId": memory_data[i]["chunkId"],
                     "memData": memory_data[i]["memData"]
                 })
 
         for memory in data:
+            user_ids.append(memory["userId"])
             memory_ids.append(memory["memId"])
             chunk_ids.append(memory["chunkId"])
             filteredMemory = memory["memData"].replace(
                 CENTRAL_OPENER, "").replace(CENTRAL_CLOSER, "").replace(JOINER, "")
             filtered_meta_data.append(filteredMemory)
 
-        await update_search_vectors(memory_ids, chunk_ids, filtered_meta_data)
+        await update_search_vectors(user_ids, memory_ids, chunk_ids, filtered_meta_data)
         return memories
     except Exception as e:
-        print(f"Error inserting many memories: {e}")
-        return -1
+        # Callers must not mark the job complete, or clear its checkpoints, on a failed insert
+        raise RuntimeError(f"Error inserting many memories: {e}") from e
 
 if os.path.exists('.env'):
     load_dotenv()
 DATABASE_URL = os.getenv('DATABASE_URL')
 
 
-async def update_search_vectors(mem_ids, chunk_ids, mem_data):
+# The upsert below needs the user column and a (userid, memid, chunkid) key;
+# both come from app.partition_tables
+SEARCH_VECTOR_SCHEMA_QUERY = '''
+    SELECT
+        EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'memory_search_vector' AND column_name = 'userid'
+        ) AS has_userid,
+        EXISTS (
+            SELECT 1 FROM pg_constraint c
+            WHERE c.conrelid = to_regclass('memory_search_vector')
+              AND c.contype IN ('p', 'u')
+              AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+                   FROM pg_attribute a
+                   WHERE a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey))
+                  = ARRAY['chunkid', 'memid', 'userid']
+        ) AS has_key
+'''
+
+
+async def check_search_vector_schema():
+    """Refuse to start against a memory_search_vector that predates partitioning."""
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        row = await conn.fetchrow(SEARCH_VECTOR_SCHEMA_QUERY)
+    finally:
+        await conn.close()
+    if not row["has_userid"]:
+        raise RuntimeError(
+            "memory_search_vector has no userid column; run python -m app.partition_tables")
+    if not row["has_key"]:
+        raise RuntimeError(
+            "memory_search_vector has no (userid, memid, chunkid) key; run python -m app.partition_tables")
+
+
+async def update_search_vectors(user_ids, mem_ids, chunk_ids, mem_data):
+    # Errors propagate: a memory without search vectors is missing from full-text search
+    conn = await asyncpg.connect(DATABASE_URL)
     try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        # Prepare the data for bulk insert
-        values = list(zip(mem_ids, chunk_ids, mem_data))
-        print(f"Inserting {len(values)} search vectors in connection {conn}")
+        # Prepare the data for bulk insert; userid routes each row to its hash partition
+        values = list(zip(user_ids, mem_ids, chunk_ids, mem_data))
         # Perform bulk upsert
         await conn.executemany('''
-            INSERT INTO memory_search_vector (memId, chunkId, search_vector)
-            VALUES ($1, $2, to_tsvector('english', $3))
-            ON CONFLICT (memId, chunkId) DO UPDATE
-            SET search_vector = to_tsvector('english', $3)
+            INSERT INTO memory_search_vector (userId, memId, chunkId, search_vector)
+            VALUES ($1, $2, $3, to_tsvector('english', $4))
+            ON CONFLICT (userId, memId, chunkId) DO UPDATE
+            SET search_vector = to_tsvector('english', $4)
         ''', values)
+    finally:
+        await conn.close()
 
-    except Exception as e:
-        print(f"Error updating search vectors: {e}")
+
+async def get_search_vectors(user_id: str, mem_id: str, chunk_ids: List[str]) -> Dict[str, str]:
+    """Stored tsvectors (as text) by chunk id, for carrying them over to another chunk id."""
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        rows = await conn.fetch('''
+            SELECT chunkId, search_vector::text AS search_vector FROM memory_search_vector
+            WHERE userId = $1 AND memId = $2 AND chunkId = ANY($3::text[])
+        ''', user_id, mem_id, chunk_ids)
     finally:
         await conn.close()
+    return {row["chunkid"]: row["search_vector"] for row in rows}
+
+
+async def set_search_vectors(user_id: str, mem_id: str, search_vectors: Dict[str, str]):
+    """Overwrite the tsvectors of existing chunks with ones from get_search_vectors."""
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        await conn.executemany('''
+            UPDATE memory_search_vector SET search_vector = $4::tsvector
+            WHERE userId = $1 AND memId = $2 AND chunkId = $3
+        ''', [(user_id, mem_id, chunk_id, vector) for chunk_id, vector in search_vectors.items()])
+    finally:
+        await conn.close()
+
+
+async def delete_search_vectors(user_id: str, mem_id: str, chunk_ids: List[str]):
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        await conn.execute('''
+            DELETE FROM memory_search_vector
+            WHERE userId = $1 AND memId = $2 AND chunkId = ANY($3::text[])
+        ''', user_id, mem_id, chunk_ids)
+    finally:
+        await conn.close()
+
+
+async def delete_memory_chunks(user_id: str, mem_id: str, chunk_ids: List[str], batch_size: int = 100):
+    """Delete Memory rows and their search vectors for the given chunk ids."""
+    if not chunk_ids:
+        return
+    for i in range(0, len(chunk_ids), batch_size):
+        batch = chunk_ids[i:i + batch_size]
+        await prisma.memory.delete_many(
+            where={"userId": user_id, "memId": mem_id, "chunkId": {"in": batch}})
+    await delete_search_vectors(user_id, mem_id, chunk_ids)
@@ -1,39 +1,240 @@
+import asyncio
+import copy
+import hashlib
+import os
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional
 
-import requests
+import aiohttp
+from aiolimiter import AsyncLimiter
+from dotenv import load_dotenv
+
+from app.utils.app_logger_config import logger
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+# Notion allows an average of ~3 requests/s per integration token
+NOTION_REQUESTS_PER_SECOND = float(os.getenv("NOTION_REQUESTS_PER_SECOND", "3"))
+NOTION_MAX_CONCURRENCY = int(os.getenv("NOTION_MAX_CONCURRENCY", "3"))
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+NOTION_TIMEOUT = aiohttp.ClientTimeout(total=30)
+# Limiters of the most recently used tokens that are kept around
+NOTION_MAX_LIMITERS = int(os.getenv("NOTION_MAX_LIMITERS", "1024"))
+
+# Keyed by a hash so integration tokens are not kept in memory
+_token_limiters: "OrderedDict[str, AsyncLimiter]" = OrderedDict()
+
+
+def get_token_limiter(access_token: str) -> AsyncLimiter:
+    """One rate limiter per integration token, shared by every crawl using it."""
+    key = hashlib.sha256(access_token.encode()).hexdigest()
+    limiter = _token_limiters.get(key)
+    if limiter is None:
+        limiter = _token_limiters[key] = AsyncLimiter(
+            NOTION_REQUESTS_PER_SECOND, 1)
+        if len(_token_limiters) > NOTION_MAX_LIMITERS:
+            # Crawls already running keep their own reference
+            _token_limiters.popitem(last=False)
+    else:
+        _token_limiters.move_to_end(key)
+    return limiter
+
+
+def page_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The fields of a page's own blocks that rendering needs. The content of
+    subpages is left out; each page's blocks are stored under its own id.
+    """
+    kept = []
+    for block in blocks:
+        block_type = block.get("type", "")
+        kept_block = {
+            "id": block["id"],
+            "type": block_type,
+            block_type: block.get(block_type, {}),
+            "has_children": block.get("has_children", False),
+        }
+        if block.get("children") and block_type != "child_page":
+            kept_block["children"] = page_blocks(block["children"])
+        kept.append(kept_block)
+    return kept
 
 
 class NotionTextExtractor:
-    def __init__(self, page_id: str, access_token: str):
+    """
+    Crawls a Notion page's block tree and flattens it to text.
+
+    Children of sibling blocks are fetched concurrently over one HTTP
+    session, bounded by a per-token rate limiter; the tree is rendered only
+    once fully fetched, so the text keeps document order.
+
+    ``page_trees`` are the blocks of the page and of each subpage from a
+    previous crawl, keyed by page id, as left in ``self.page_trees``. A page
+    whose ``last_edited_time`` is unchanged reuses its stored blocks instead
+    of re-listing them, and only its subpages and databases are checked.
+    """
+
+    def __init__(self, page_id: str, access_token: str, crawl_child_pages: bool = True, page_trees: Optional[Dict[str, Dict[str, Any]]] = None):
         self.page_id = page_id
         self.access_token = access_token
+        self.crawl_child_pages = crawl_child_pages
+        self.known_trees = page_trees or {}
+        self.page_trees: Dict[str, Dict[str, Any]] = {}
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Notion-Version": "2022-06-28",
             "Content-Type": "application/json"
         }
         self.base_url = "https://api.notion.com/v1"
+        self.rate_limiter = get_token_limiter(access_token)
+        self.semaphore = asyncio.Semaphore(NOTION_MAX_CONCURRENCY)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.visited_pages = {page_id}
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Rate-limited Notion API call, retrying 429s and 5xx with backoff."""
+        for attempt in range(NOTION_MAX_RETRIES + 1):
+            async with self.semaphore:
+                await self.rate_limiter.acquire()
+                async with self.session.request(method, f"{self.base_url}{path}", params=params, json=json) as response:
+                    if response.status == 429 or response.status >= 500:
+                        if attempt == NOTION_MAX_RETRIES:
+                            response.raise_for_status()
+                        delay = float(response.headers.get(
+                            "Retry-After", 2 ** attempt))
+                    else:
+                        response.raise_for_status()
+                        return await response.json()
+            await asyncio.sleep(delay)
 
-    def get_block_children(self, block_id: str, start_cursor: Optional[str] = None) -> Dict[str, Any]:
+    async def get_block_children(self, block_id: str, start_cursor: Optional[str] = None) -> Dict[str, Any]:
         """Fetch children blocks of a given block."""
-        url = f"{self.base_url}/blocks/{block_id}/children"
         params = {"page_size": 100}
         if start_cursor:
             params["start_cursor"] = start_cursor
+        return await self.request("GET", f"/blocks/{block_id}/children", params=params)
 
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
-
-    def get_page_properties(self) -> Dict[str, Any]:
+    async def get_page_properties(self) -> Dict[str, Any]:
         """Fetch page properties for additional context."""
-        url = f"{self.base_url}/pages/{self.page_id}"
-        response = requests.get(url, headers=self.headers)
-        # response.raise_for_status()
-        print(response.json())
+        return await self.request("GET", f"/pages/{self.page_id}")
 
-        response.raise_for_status()
-        return response.json()
+    async def list_block_children(self, block_id: str) -> List[Dict[str, Any]]:
+        """All children of a block; pages of one parent are fetched in order."""
+        blocks = []
+        start_cursor = None
+        while True:
+            try:
+                response = await self.get_block_children(block_id, start_cursor)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # One unreachable block should not lose the rest of the page
+                logger.error(f"Error fetching children of block {block_id}: {e!r}")
+                break
+            blocks.extend(response.get("results", []))
+            if not response.get("has_more", False):
+                break
+            start_cursor = response.get("next_cursor")
+        return blocks
+
+    async def list_database_rows(self, database_id: str) -> List[Dict[str, Any]]:
+        """Database rows as child_page-like blocks so they render as subpages."""
+        rows = []
+        body = {"page_size": 100}
+        while True:
+            try:
+                response = await self.request("POST", f"/databases/{database_id}/query", json=body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Error querying database {database_id}: {e!r}")
+                break
+            for page in response.get("results", []):
+                rows.append({
+                    "id": page["id"],
+                    "type": "child_page",
+                    "child_page": {"title": self.get_title(page)},
+                    "has_children": True,
+                    # Saves a request per row when checking it for edits
+                    "page_last_edited_time": page.get("last_edited_time"),
+                })
+            if not response.get("has_more", False):
+                break
+            body["start_cursor"] = response.get("next_cursor")
+        return rows
+
+    def should_descend(self, block: Dict[str, Any]) -> bool:
+        block_type = block.get("type", "")
+        if block_type in ("child_page", "child_database"):
+            # Linked pages can reference each other; crawl each one once
+            if not self.crawl_child_pages or block["id"] in self.visited_pages:
+                return False
+            self.visited_pages.add(block["id"])
+            return True
+        return block.get("has_children", False)
+
+    async def fetch_children(self, block: Dict[str, Any]) -> None:
+        if block.get("type") == "child_page":
+            block["children"] = await self.fetch_subpage(block)
+            return
+        if block.get("type") == "child_database":
+            block["children"] = await self.list_database_rows(block["id"])
+        else:
+            block["children"] = await self.list_block_children(block["id"])
+        await self.fetch_subtrees(block["children"])
+
+    async def fetch_subpage(self, block: Dict[str, Any]) -> List[Dict[str, Any]]:
+        edit_time = block.get("page_last_edited_time")
+        if edit_time is None:
+            try:
+                page = await self.request("GET", f"/pages/{block['id']}")
+                edit_time = page.get("last_edited_time")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Error fetching page {block['id']}: {e!r}")
+        return await self.fetch_page(block["id"], edit_time)
+
+    async def fetch_page(self, page_id: str, edit_time: Optional[str]) -> List[Dict[str, Any]]:
+        """A page's block tree, reusing its stored blocks if it was not edited since."""
+        known = self.known_trees.get(page_id)
+        if edit_time and known and known["last_edited_time"] == edit_time:
+            blocks = copy.deepcopy(known["blocks"])
+            # Edits inside subpages and new database rows leave the page as is
+            await self.fetch_subpages(blocks)
+        else:
+            blocks = await self.fetch_block_tree(page_id)
+        self.page_trees[page_id] = {
+            "last_edited_time": edit_time,
+            "blocks": page_blocks(blocks),
+        }
+        return blocks
+
+    async def fetch_subpages(self, blocks: List[Dict[str, Any]]) -> None:
+        """Attach the subpages and database rows found in stored blocks."""
+        tasks = []
+        for block in blocks:
+            if block.get("type") in ("child_page", "child_database"):
+                if self.should_descend(block):
+                    tasks.append(self.fetch_children(block))
+            elif block.get("children"):
+                tasks.append(self.fetch_subpages(block["children"]))
+        await asyncio.gather(*tasks)
+
+    async def fetch_subtrees(self, blocks: List[Dict[str, Any]]) -> None:
+        """Attach ``children`` to every block in place, siblings concurrently."""
+        await asyncio.gather(*[self.fetch_children(block)
+                               for block in blocks
+                               if self.should_descend(block)])
+
+    async def fetch_block_tree(self, block_id: str) -> List[Dict[str, Any]]:
+        """Children of ``block_id`` with their descendants nested under ``children``."""
+        blocks = await self.list_block_children(block_id)
+        await self.fetch_subtrees(blocks)
+        return blocks
+
+    def get_title(self, page: Dict[str, Any]) -> str:
+        for prop in page.get("properties", {}).values():
+            if prop.get("type") == "title":
+                title_text = prop.get("title", [])
+                if title_text:
+                    return self.extract_text_from_rich_text(title_text)
+        return "Untitled"
 
     def extract_text_from_rich_text(self, rich_text: List[Dict[str, Any]]) -> str:
         """Extract plain text from rich text array, preserving important formatting."""
@@ -165,84 +366,92 @@ class NotionTextExtractor:
 
         return text.strip()
 
-    def process_blocks_recursively(self, block_id: str, indent_level: int = 0) -> str:
-        """Recursively process blocks and their children, maintaining semantic context."""
+    def render_blocks(self, blocks: List[Dict[str, Any]], indent_level: int = 0) -> str:
+        """Render a fetched block tree, maintaining semantic context."""
         all_text = []
-        has_more = True
-        start_cursor = None
         current_list_type = None
 
-        while has_more:
-            try:
-                response = self.get_block_children(block_id, start_cursor)
-                blocks = response.get("results", [])
-
-                for block in blocks:
-                    block_type = block.get("type", "")
-                    block_text = self.process_block_content(block)
-
-                    # Handle list continuity for better semantic chunking
-                    if block_type in ["numbered_list_item", "bulleted_list_item"]:
-                        if current_list_type != block_type:
-                            current_list_type = block_type
-                            # Add spacing between different lists
-                            all_text.append("")
+        for block in blocks:
+            block_type = block.get("type", "")
+            block_text = self.process_block_content(block)
+
+            # Handle list continuity for better semantic chunking
+            if block_type in ["numbered_list_item", "bulleted_list_item"]:
+                if current_list_type != block_type:
+                    current_list_type = block_type
+                    # Add spacing between different lists
+                    all_text.append("")
+            else:
+                current_list_type = None
+
+            # Add processed text with proper indentation
+            if block_text:
+                indented_text = "  " * indent_level + block_text
+                all_text.append(indented_text)
+
+            # Children fetched by fetch_block_tree
+            if block.get("children"):
+                child_text = self.render_blocks(
+                    block["children"],
+                    indent_level + 1
+                )
+                if child_text:
+                    # For certain block types, we want to keep children closer
+                    if block_type in ["toggle", "quote", "callout"]:
+                        all_text.append(
+                            "  " * indent_level + child_text)
                     else:
-                        current_list_type = None
-
-                    # Add processed text with proper indentation
-                    if block_text:
-                        indented_text = "  " * indent_level + block_text
-                        all_text.append(indented_text)
-
-                    # Process children recursively
-                    if block.get("has_children", False):
-                        child_text = self.process_blocks_recursively(
-                            block["id"],
-                            indent_level + 1
-                        )
-                        if child_text:
-                            # For certain block types, we want to keep children closer
-                            if block_type in ["toggle", "quote", "callout"]:
-                                all_text.append(
-                                    "  " * indent_level + child_text)
-                            else:
-                                all_text.append(child_text)
-
-                has_more = response.get("has_more", False)
-                start_cursor = response.get("next_cursor")
-
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching blocks: {e}")
-                break
+                        all_text.append(child_text)
 
         return "\n".join(text for text in all_text if text.strip())
 
-    def get_page_content(self) -> str:
+    def render_page(self, title: str, blocks: List[Dict[str, Any]]) -> str:
+        # Combine page title with content
+        header = f"[Page Title] {title}\n\n"
+        return header + self.render_blocks(blocks)
+
+    async def crawl_page(self, known_edit_time: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Fetch the page title, its ``last_edited_time`` and block tree.
+
+        ``blocks`` is None if nothing changed since the crawl that left
+        ``page_trees``. Notion bumps a page's ``last_edited_time`` for any
+        edit to its blocks but not for edits in its subpages, so an
+        unchanged page and subpage each cost one request, and only edited
+        pages are listed again. Databases are always queried again.
+
+        Without stored trees, ``known_edit_time`` still skips a page that
+        is crawled without its child pages.
+        """
+        async with aiohttp.ClientSession(headers=self.headers, timeout=NOTION_TIMEOUT) as session:
+            self.session = session
+            try:
+                page_properties = await self.get_page_properties()
+                edit_time = page_properties.get("last_edited_time")
+                if not self.crawl_child_pages and known_edit_time and edit_time == known_edit_time:
+                    blocks = None
+                else:
+                    blocks = await self.fetch_page(self.page_id, edit_time)
+                    if self.page_trees == self.known_trees:
+                        blocks = None
+            finally:
+                self.session = None
+
+        return {
+            "title": self.get_title(page_properties),
+            "last_edited_time": page_properties.get("last_edited_time"),
+            "blocks": blocks,
+            "page_trees": self.page_trees,
+        }
+
+    async def get_page_content(self) -> str:
         """
         Main method to process the page and extract all text content,
         optimized for semantic chunking and vector search.
         """
         try:
-            # Get page properties for context
-            page_properties = self.get_page_properties()
-
-            # Extract page title and create a header
-            title = "Untitled"
-            if "properties" in page_properties:
-                for prop in page_properties["properties"].values():
-                    if prop.get("type") == "title":
-                        title_text = prop.get("title", [])
-                        if title_text:
-                            title = self.extract_text_from_rich_text(
-                                title_text)
-                            break
-
-            # Combine page title with content
-            header = f"[Page Title] {title}\n\n"
-            content = self.process_blocks_recursively(self.page_id)
-
-            return header + content
+            page = await self.crawl_page()
+            return self.render_page(page["title"], page["blocks"])
 
         except Exception as e:
             print(f"Error processing page: {e}")
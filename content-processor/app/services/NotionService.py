@@ -3,6 +3,7 @@ from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import Metadata, NotionSpecificMd
 
 
-async def extract_text_from_notion_page(resource_link: str, access_token: str, metadata: Metadata[NotionSpecificMd]) -> AgentResponse:
-    agent = NotionAgent(resource_link, access_token, metadata)
+async def extract_text_from_notion_page(resource_link: str, access_token: str, metadata: Metadata[NotionSpecificMd], crawl_child_pages: bool = True) -> AgentResponse:
+    agent = NotionAgent(resource_link, access_token, metadata,
+                        crawl_child_pages=crawl_child_pages)
     return await agent.process_media()
@@ -0,0 +1,108 @@
+import asyncio
+from typing import List, Optional
+
+from prisma.fields import Json
+
+from app.core.agents.integrations.NotionAgent import NotionAgent
+from app.core.jina_ai import use_jina
+from app.prisma import prisma
+from app.schemas.Integration import NotionSyncResponse, NotionSyncResult
+from app.schemas.Metadata import Metadata, NotionSpecificMd
+from app.services.ChunkSyncService import sync_memory_chunks
+from app.services.NotionPageExtractor import NotionTextExtractor
+from app.utils.app_logger_config import logger
+
+
+async def find_legacy_memory(row) -> Optional[str]:
+    """
+    Memory already ingested for a connected page whose row predates the
+    memId column, matched on the page id stored in its chunk metadata.
+    """
+    found = await prisma.prisma.query_raw(
+        'SELECT "memId" FROM "Memory" WHERE "userId" = $1 AND "memType" = \'notion\' '
+        "AND metadata -> 'specific_desc' ->> 'page_id' = $2 LIMIT 1",
+        row.userId, row.pageId)
+    if not found:
+        return None
+    mem_id = found[0]["memId"]
+    await prisma.prisma.connectednotionpages.update(
+        where={"userId_pageId": {"userId": row.userId, "pageId": row.pageId}},
+        data={"memId": mem_id}
+    )
+    return mem_id
+
+
+async def sync_notion_page(row, access_token: str, metadata: Metadata[NotionSpecificMd], crawl_child_pages: bool = True) -> NotionSyncResult:
+    page_md = metadata.model_copy()
+    page_md.title = row.title or metadata.title
+
+    mem_id = row.memId or await find_legacy_memory(row)
+    if not mem_id:
+        # Never ingested; NotionAgent records the memId on the row
+        response = await NotionAgent(row.pageId, access_token, page_md,
+                                     crawl_child_pages=crawl_child_pages).process_media()
+        return NotionSyncResult(
+            page_id=row.pageId,
+            status="reprocessed",
+            memId=response.memoryId,
+            reembedded_chunks=len(response.chunks),
+        )
+
+    extractor = NotionTextExtractor(
+        row.pageId, access_token, crawl_child_pages=crawl_child_pages, page_trees=row.pageTrees)
+    page = await extractor.crawl_page(known_edit_time=row.lastEditedTime)
+    if page["blocks"] is None:
+        return NotionSyncResult(page_id=row.pageId, status="unchanged", memId=mem_id)
+
+    content = extractor.render_page(page["title"], page["blocks"])
+    chunks = await use_jina.segment_data(content)
+    page_md.memId = mem_id
+
+    def build_specific_md(i: int) -> dict:
+        return {"chunk_id": f"{mem_id}_{i}", "page_id": row.pageId}
+
+    diff = await sync_memory_chunks(page_md, chunks, NotionSpecificMd, build_specific_md, 'notion')
+    await prisma.prisma.connectednotionpages.update(
+        where={"userId_pageId": {"userId": row.userId, "pageId": row.pageId}},
+        data={
+            "lastEditedTime": page["last_edited_time"],
+            "pageTrees": Json(page["page_trees"]),
+        }
+    )
+    return NotionSyncResult(
+        page_id=row.pageId,
+        status="updated",
+        memId=mem_id,
+        unchanged_chunks=len(diff.unchanged) + len(diff.moved),
+        reembedded_chunks=len(diff.changed),
+        deleted_chunks=len(diff.stale),
+    )
+
+
+async def sync_user_notion_pages(access_token: str, metadata: Metadata[NotionSpecificMd], page_ids: Optional[List[str]] = None, crawl_child_pages: bool = True) -> NotionSyncResponse:
+    """
+    Bring a user's connected Notion pages up to date.
+
+    The blocks of each page and subpage are stored on the row, so a page or
+    subpage whose last_edited_time is unchanged costs a single request and
+    only edited ones are crawled again; the price is a copy of the block
+    trees in the database. Only chunks whose text changed are
+    re-contextualized and re-embedded. Pages
+    ingested before rows recorded their memId are matched to their existing
+    memory rather than ingested again. Requests for the same token share
+    one rate limiter, so pages are synced concurrently.
+    """
+    where = {"userId": metadata.user_id, "state": "connected"}
+    if page_ids:
+        where["pageId"] = {"in": page_ids}
+    rows = await prisma.prisma.connectednotionpages.find_many(where=where)
+
+    async def sync_row(row) -> NotionSyncResult:
+        try:
+            return await sync_notion_page(row, access_token, metadata, crawl_child_pages)
+        except Exception as e:
+            logger.error(f"Failed to sync Notion page {row.pageId}: {e}")
+            return NotionSyncResult(page_id=row.pageId, status="failed", memId=row.memId, error=str(e))
+
+    results = await asyncio.gather(*[sync_row(row) for row in rows])
+    return NotionSyncResponse(results=list(results))
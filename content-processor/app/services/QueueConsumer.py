@@ -0,0 +1,426 @@
+"""
+Native Redis queue consumer.
+
+Reads the same ``high:priority:queue`` / ``low:priority:queue`` lists as
+the Go consumer and runs the agents in-process, skipping the HTTP hop.
+Messages keep the Go format: ``{"task": {"type", "data", "retries"}, "api_key"}``.
+
+Delivery is at-least-once. Each message is moved atomically (LMOVE) into
+a per-consumer processing list and removed from it only once handled.
+Live consumers keep a heartbeat key; any consumer puts the messages of a
+processing list whose owner stopped beating back on the queue, so nothing
+is stranded when a worker comes back under another QUEUE_CONSUMER_ID (the
+hostname by default). Failed tasks are retried with backoff and
+dead-lettered to ``failed:queue`` after QUEUE_MAX_RETRIES. The idempotency
+key is the one the Go consumer sends, so a task redelivered to either
+consumer returns the earlier result instead of ingesting twice.
+
+The worker also runs a consumer per internal queue: ``jobs:queue`` carries
+async jobs accepted by the API (tasks typed by route scope, with a
+``job_id`` whose record is kept up to date), and ``enrichment:queue`` the
+``enrich`` tasks of two-phase ingestion, which simply overwrite the same
+vectors when redelivered.
+
+Heavy tasks (see AdmissionService) can wait a long time for admission, and
+would hold a consumer slot all the while. Consumers created with
+``divert_heavy`` therefore move them, unstarted, to ``<queue>:heavy``,
+which a consumer of its own works through, so a user's batch of videos
+cannot take the slots that notes and web pages need.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import socket
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+import redis.asyncio as aioredis
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from app.core.agents.TextAgent import TextAgent
+from app.services.AdmissionService import HEAVY_JOB_TYPES
+from app.schemas.Common import AgentBatchResponseWrapper, AgentResponse
+from app.schemas.Integration import (GDriveFolderRequest, GDriveRequest,
+                                     GDriveSyncRequest, GDriveSyncResponse,
+                                     NotionRequest, NotionSyncRequest,
+                                     NotionSyncResponse)
+from app.schemas.Link import GitLinkRequest, WebLinkRequest, YoutubeLinkRequest
+from app.schemas.Media import (AudioRequest, FileRequest, ImageBatchRequest,
+                               ImageRequest, VideoRequest)
+from app.schemas.Text import TextRequest
+from app.services import (AudioService, FileService, GDriveService,
+                          GDriveSyncService, ImageService, LinkService,
+                          NotionService, NotionSyncService, VideoService)
+from app.services.EnrichmentService import ENRICHMENT_TASK, run_enrichment
+from app.services.IdempotencyService import run_idempotent
+from app.services.JobService import (IngestionJob, finish_job, retry_job,
+                                     run_job)
+from app.utils.app_logger_config import logger
+from app.utils.queues import QUEUE_REDIS_URL
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+HIGH_PRIORITY_QUEUE = "high:priority:queue"
+LOW_PRIORITY_QUEUE = "low:priority:queue"
+FAILED_QUEUE = "failed:queue"
+
+QUEUE_BATCH_SIZE = int(os.getenv("QUEUE_BATCH_SIZE", "8"))
+QUEUE_CONCURRENCY = int(os.getenv("QUEUE_CONCURRENCY", "8"))
+QUEUE_MAX_RETRIES = int(os.getenv("QUEUE_MAX_RETRIES", "3"))
+QUEUE_BLOCK_TIMEOUT = float(os.getenv("QUEUE_BLOCK_TIMEOUT", "1"))
+QUEUE_CONSUMER_ID = os.getenv("QUEUE_CONSUMER_ID", socket.gethostname())
+# A consumer silent for this long is presumed dead and its messages requeued
+QUEUE_CONSUMER_TTL = int(os.getenv("QUEUE_CONSUMER_TTL", "60"))
+
+
+@dataclass
+class TaskHandler:
+    job_type: str
+    scope: str
+    request_model: Type[BaseModel]
+    run: Callable[[BaseModel], Awaitable[Optional[BaseModel]]]
+    response_model: Type[BaseModel] = AgentResponse
+
+
+# Async jobs (see JobService) are keyed by the scope of the route that accepted them
+JOB_HANDLERS: Dict[str, TaskHandler] = {handler.scope: handler for handler in [
+    TaskHandler(job_type="git", scope="link:git", request_model=GitLinkRequest,
+                run=lambda r: LinkService.get_code_from_git_repo(r.repo_url, r.metadata)),
+    TaskHandler(job_type="youtube", scope="link:youtube", request_model=YoutubeLinkRequest,
+                run=lambda r: LinkService.get_youtube_video_transcript(r.video_url, r.metadata)),
+    TaskHandler(job_type="web", scope="link:web", request_model=WebLinkRequest,
+                run=lambda r: LinkService.get_web_scraped_data(r.url, r.metadata)),
+    TaskHandler(job_type="pdf", scope="file:pdf", request_model=FileRequest,
+                run=lambda r: FileService.extract_text_from_pdf(r.file_id, r.metadata)),
+    TaskHandler(job_type="audio", scope="file:audio", request_model=AudioRequest,
+                run=lambda r: AudioService.get_audio_transcript(r.audio_id, r.metadata)),
+    TaskHandler(job_type="video", scope="file:video", request_model=VideoRequest,
+                run=lambda r: VideoService.get_video_transcript(r.video_id, r.metadata)),
+    TaskHandler(job_type="image", scope="file:image", request_model=ImageRequest,
+                run=lambda r: ImageService.get_image_transcript(r.image_id, r.metadata)),
+    TaskHandler(job_type="images", scope="file:images", request_model=ImageBatchRequest,
+                run=lambda r: ImageService.get_batch_image_transcript(r.image_ids, r.metadata)),
+    TaskHandler(job_type="note", scope="text:note", request_model=TextRequest,
+                run=lambda r: TextAgent(text=r.text, md=r.metadata).process_media()),
+    TaskHandler(job_type="notion", scope="integration:notion", request_model=NotionRequest,
+                run=lambda r: NotionService.extract_text_from_notion_page(
+                    access_token=r.access_token, resource_link=r.page_id, metadata=r.metadata,
+                    crawl_child_pages=r.crawl_child_pages)),
+    TaskHandler(job_type="gdrive", scope="integration:gdrive", request_model=GDriveRequest,
+                run=lambda r: GDriveService.extract_text_from_drive_file(
+                    access_token=r.access_token, resource_link=r.file_id, metadata=r.metadata,
+                    refresh_token=r.refresh_token)),
+    TaskHandler(job_type="gdrive_folder", scope="integration:gdrive:folder", request_model=GDriveFolderRequest,
+                response_model=AgentBatchResponseWrapper,
+                run=lambda r: GDriveService.extract_text_from_drive_files(
+                    access_token=r.access_token, metadata=r.metadata, refresh_token=r.refresh_token,
+                    folder_id=r.folder_id, file_ids=r.file_ids, recursive=r.recursive)),
+    TaskHandler(job_type="sync", scope="integration:sync:gdrive", request_model=GDriveSyncRequest,
+                response_model=GDriveSyncResponse,
+                run=lambda r: GDriveSyncService.sync_user_drive_files(
+                    access_token=r.access_token, metadata=r.metadata, refresh_token=r.refresh_token)),
+    TaskHandler(job_type="sync", scope="integration:sync:notion", request_model=NotionSyncRequest,
+                response_model=NotionSyncResponse,
+                run=lambda r: NotionSyncService.sync_user_notion_pages(
+                    access_token=r.access_token, metadata=r.metadata,
+                    page_ids=r.page_ids, crawl_child_pages=r.crawl_child_pages)),
+]}
+
+# Task types as produced for the Go consumer's ENDPOINT_MAP
+TASK_HANDLERS: Dict[str, TaskHandler] = {
+    "git": JOB_HANDLERS["link:git"],
+    "youtube": JOB_HANDLERS["link:youtube"],
+    "web": JOB_HANDLERS["link:web"],
+    "file": JOB_HANDLERS["file:pdf"],
+    "audio": JOB_HANDLERS["file:audio"],
+    "video": JOB_HANDLERS["file:video"],
+    "image": JOB_HANDLERS["file:image"],
+    "images": JOB_HANDLERS["file:images"],
+    "note": JOB_HANDLERS["text:note"],
+}
+
+
+class PermanentTaskError(Exception):
+    """A message that can never succeed, e.g. malformed or of an unknown type."""
+
+
+# The Go consumer's ENDPOINT_MAP; its idempotency keys hash the endpoint
+GO_ENDPOINTS: Dict[str, str] = {
+    "git": "/api/v1/link/process/git",
+    "youtube": "/api/v1/link/process/youtube",
+    "web": "/api/v1/link/process/web",
+    "file": "/api/v1/file/process/pdf",
+    "audio": "/api/v1/file/process/audio",
+    "video": "/api/v1/file/process/video",
+    "image": "/api/v1/file/process/image",
+    "images": "/api/v1/file/process/images",
+    "note": "/api/v1/text/process/note",
+}
+
+
+def _go_float(value: float) -> str:
+    if value.is_integer() and abs(value) < 1e21:
+        return str(int(value))
+    text = repr(value)
+    if "e" in text and 1e-6 <= abs(value) < 1e21:
+        return format(Decimal(text), "f")
+    # Go writes e-7 where Python writes e-07
+    return re.sub(r"e([+-])0(\d)$", r"e\1\2", text)
+
+
+def go_json(value: Any) -> str:
+    """``value`` encoded as Go's json.Marshal encodes it after decoding into interface{}."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return _go_float(value)
+    if isinstance(value, str):
+        text = json.dumps(value, ensure_ascii=False)
+        for char, escaped in (("<", "\\u003c"), (">", "\\u003e"), ("&", "\\u0026"),
+                              ("\u2028", "\\u2028"), ("\u2029", "\\u2029")):
+            text = text.replace(char, escaped)
+        return text
+    if isinstance(value, list):
+        return "[" + ",".join(go_json(item) for item in value) + "]"
+    return "{" + ",".join(f"{go_json(str(key))}:{go_json(value[key])}" for key in sorted(value)) + "}"
+
+
+def heavy_queue(queue: str) -> str:
+    """Where consumers diverting heavy tasks put those read from ``queue``."""
+    return f"{queue}:heavy"
+
+
+def task_idempotency_key(task_type: str, data: Any) -> str:
+    """The Idempotency-Key the Go consumer sends for the same task."""
+    payload = GO_ENDPOINTS.get(task_type, task_type) + "\n" + go_json(data)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QueueConsumer:
+    def __init__(
+        self,
+        client: Optional[aioredis.Redis] = None,
+        queues: Tuple[str, ...] = (HIGH_PRIORITY_QUEUE, LOW_PRIORITY_QUEUE),
+        batch_size: int = QUEUE_BATCH_SIZE,
+        concurrency: int = QUEUE_CONCURRENCY,
+        consumer_id: str = QUEUE_CONSUMER_ID,
+        handlers: Dict[str, TaskHandler] = TASK_HANDLERS,
+        divert_heavy: bool = False,
+    ):
+        # Any client speaking the Redis protocol works, including a local stand-in
+        self.client = client or aioredis.Redis.from_url(
+            QUEUE_REDIS_URL, decode_responses=True)
+        self.queues = queues
+        self.consumer_id = consumer_id
+        self.processing = {
+            queue: f"{queue}:processing:{consumer_id}" for queue in queues}
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.handlers = handlers
+        self.divert_heavy = divert_heavy
+        self.tasks: set[asyncio.Task] = set()
+        self.stopping = asyncio.Event()
+
+    async def _return_all(self, processing: str, queue: str) -> int:
+        returned = 0
+        # Consumers pop from the right, so returned messages go first
+        while await self.client.lmove(processing, queue, "LEFT", "RIGHT") is not None:
+            returned += 1
+        return returned
+
+    async def recover(self) -> int:
+        """Return messages left in this consumer's processing lists to their queues."""
+        recovered = 0
+        for queue, processing in self.processing.items():
+            recovered += await self._return_all(processing, queue)
+        if recovered:
+            logger.info(f"Recovered {recovered} unacknowledged messages")
+        return recovered
+
+    def _heartbeat_key(self, consumer_id: str) -> str:
+        return f"queue:consumer:{consumer_id}"
+
+    async def beat(self) -> None:
+        await self.client.set(self._heartbeat_key(self.consumer_id), "1", ex=QUEUE_CONSUMER_TTL)
+
+    async def reap(self) -> int:
+        """Requeue the messages of consumers whose heartbeat has expired."""
+        reaped = 0
+        for queue in self.queues:
+            prefix = f"{queue}:processing:"
+            async for processing in self.client.scan_iter(match=f"{prefix}*"):
+                consumer_id = processing[len(prefix):]
+                if consumer_id == self.consumer_id:
+                    continue
+                if await self.client.exists(self._heartbeat_key(consumer_id)):
+                    continue
+                reaped += await self._return_all(processing, queue)
+        if reaped:
+            logger.warning(f"Requeued {reaped} messages of stopped consumers")
+        return reaped
+
+    async def keep_alive(self) -> None:
+        while True:
+            try:
+                await self.beat()
+                await self.reap()
+            except Exception as e:
+                logger.error(f"Queue consumer heartbeat failed: {e}")
+            await asyncio.sleep(QUEUE_CONSUMER_TTL / 3)
+
+    async def pull_batch(self, limit: int) -> List[Tuple[str, str]]:
+        """Claim up to ``limit`` messages, high priority first."""
+        batch = []
+        for queue in self.queues:
+            while len(batch) < limit:
+                raw = await self.client.lmove(queue, self.processing[queue], "RIGHT", "LEFT")
+                if raw is None:
+                    break
+                batch.append((queue, raw))
+        if batch:
+            return batch
+
+        # Nothing queued: block briefly on each queue in priority order
+        for queue in self.queues:
+            raw = await self.client.blmove(
+                queue, self.processing[queue], QUEUE_BLOCK_TIMEOUT, "RIGHT", "LEFT")
+            if raw is not None:
+                return [(queue, raw)]
+        return []
+
+    async def ack(self, queue: str, raw: str) -> None:
+        await self.client.lrem(self.processing[queue], 1, raw)
+
+    async def requeue(self, queue: str, raw: str, message: dict) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lpush(queue, json.dumps(message))
+            pipe.lrem(self.processing[queue], 1, raw)
+            await pipe.execute()
+
+    async def dead_letter(self, queue: str, raw: str) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lpush(FAILED_QUEUE, raw)
+            pipe.lrem(self.processing[queue], 1, raw)
+            await pipe.execute()
+
+    def is_heavy(self, raw: str) -> bool:
+        try:
+            task = json.loads(raw).get("task") or {}
+            handler = self.handlers.get(task.get("type"))
+        except (ValueError, AttributeError, TypeError):
+            # Malformed; handled, and dead-lettered, here
+            return False
+        return handler is not None and handler.job_type in HEAVY_JOB_TYPES
+
+    async def divert(self, queue: str, raw: str) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lpush(heavy_queue(queue), raw)
+            pipe.lrem(self.processing[queue], 1, raw)
+            await pipe.execute()
+
+    async def process(self, message: dict) -> Optional[BaseModel]:
+        task = message.get("task") or {}
+        if task.get("type") == ENRICHMENT_TASK:
+            if not isinstance(task.get("data"), dict):
+                raise PermanentTaskError("Invalid enrichment task data")
+            await run_enrichment(task["data"])
+            return None
+
+        handler = self.handlers.get(task.get("type"))
+        if handler is None:
+            raise PermanentTaskError(f"No handler for task type: {task.get('type')}")
+        try:
+            request = handler.request_model.model_validate(task.get("data"))
+        except Exception as e:
+            raise PermanentTaskError(f"Invalid task data: {e}")
+
+        job = IngestionJob(handler.job_type, handler.scope, request,
+                           request.metadata.user_id, lambda: handler.run(request),
+                           job_id=message.get("job_id") or "",
+                           response_mode=message.get("response_mode", "full"))
+        if job.job_id:
+            return await run_job(job, handler.response_model)
+        result = await run_idempotent(
+            task_idempotency_key(task["type"], task["data"]), handler.scope, request, job.user_id, handler.response_model, job.execute)
+        if result is None:
+            raise RuntimeError("Pipeline returned no result")
+        return result
+
+    async def handle(self, queue: str, raw: str) -> None:
+        message = None
+        try:
+            message = json.loads(raw)
+            result = await self.process(message)
+            await self.ack(queue, raw)
+            memory_id = getattr(result, "memoryId", None)
+            target = f" into memory {memory_id}" if memory_id else ""
+            logger.info(f"Processed {message['task']['type']} task{target}")
+        except Exception as e:
+            permanent = isinstance(e, PermanentTaskError) or not isinstance(message, dict)
+            retries = 0 if permanent else message["task"].get("retries", 0) + 1
+            job_id = message.get("job_id") if isinstance(message, dict) else None
+            if permanent or retries > QUEUE_MAX_RETRIES:
+                logger.error(f"Dead-lettering task from {queue}: {e}")
+                if job_id:
+                    finish_job(job_id, "failed", error=str(e))
+                await self.dead_letter(queue, raw)
+                return
+            logger.warning(f"Task from {queue} failed (attempt {retries}): {e}")
+            if job_id:
+                retry_job(job_id, str(e))
+            # Same backoff as the Go consumer; the message stays claimed meanwhile
+            await asyncio.sleep(min(2 ** retries, 60))
+            message["task"]["retries"] = retries
+            await self.requeue(queue, raw, message)
+
+    def _spawn(self, queue: str, raw: str) -> None:
+        task = asyncio.create_task(self.handle(queue, raw))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def start(self, queue: str, raw: str) -> None:
+        """Start handling a claimed message, unless it goes to the heavy queue."""
+        if self.divert_heavy and self.is_heavy(raw):
+            try:
+                await self.divert(queue, raw)
+                return
+            except Exception as e:
+                logger.error(f"Could not divert heavy task from {queue}: {e}")
+        self._spawn(queue, raw)
+
+    async def run(self) -> None:
+        await self.beat()
+        await self.recover()
+        keep_alive = asyncio.create_task(self.keep_alive())
+        logger.info(
+            f"Queue consumer started on {', '.join(self.queues)} (concurrency {self.concurrency})")
+        while not self.stopping.is_set():
+            free = self.concurrency - len(self.tasks)
+            if free <= 0:
+                await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            try:
+                batch = await self.pull_batch(min(free, self.batch_size))
+            except Exception as e:
+                logger.error(f"Error reading from queues: {e}")
+                await asyncio.sleep(1)
+                continue
+            for queue, raw in batch:
+                await self.start(queue, raw)
+
+        # Let claimed messages finish; anything interrupted is recovered on restart
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        keep_alive.cancel()
+
+    def stop(self) -> None:
+        self.stopping.set()
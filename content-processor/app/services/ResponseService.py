@@ -0,0 +1,102 @@
+"""
+Response modes for ingestion endpoints, selected with ``?response_mode=``.
+
+- ``full`` (default): the whole AgentResponse, transcript and per-chunk
+  metadata included, as before;
+- ``summary``: ids, counts and timings only, which is all the queue
+  consumer reads;
+- ``ndjson``: the same result framed as one JSON line per chunk, so it is
+  never serialized as a single document and can be read line by line.
+
+ndjson is a framed bulk response, not a stream of progress: agents return
+their chunks only once the pipeline has finished, so the first line is
+sent after the whole result exists.
+"""
+import json
+import time
+from typing import Iterator, List, Optional
+
+from fastapi import Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.schemas.Common import (AgentBatchResponseWrapper,
+                                AgentBatchSummaryWrapper, AgentError,
+                                AgentResponse, AgentResponseWrapper,
+                                AgentSummary, AgentSummaryWrapper)
+
+RESPONSE_MODE_QUERY = Query(
+    default="full", alias="response_mode", pattern="^(full|summary|ndjson)$",
+    description="full: the whole result; summary: ids, counts and timings; "
+                "ndjson: the whole result as one JSON line per chunk, sent once processing has finished")
+
+
+def summarize(response: AgentResponse, elapsed: Optional[float] = None) -> AgentSummary:
+    return AgentSummary(
+        memoryId=response.memoryId,
+        userId=response.userId,
+        title=response.metadata[0].title if response.metadata else "",
+        chunk_count=len(response.chunks),
+        transcript_length=len(response.transcript),
+        elapsed_seconds=round(elapsed, 3) if elapsed is not None else None,
+    )
+
+
+def slim_result(result: Optional[BaseModel], mode: str) -> Optional[BaseModel]:
+    """The form of a job result to keep for ``mode``; used for async job records."""
+    if mode != "summary":
+        return result
+    if isinstance(result, AgentResponse):
+        return summarize(result)
+    if isinstance(result, AgentBatchResponseWrapper):
+        return AgentBatchSummaryWrapper(
+            responses=[summarize(response) for response in result.responses], errors=result.errors)
+    return result
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record) + "\n"
+
+
+def _ndjson_lines(responses: List[AgentResponse], errors: List[AgentError], elapsed: float) -> Iterator[str]:
+    for response in responses:
+        summary = summarize(response, elapsed)
+        yield _line({"type": "memory", "memoryId": summary.memoryId, "userId": summary.userId, "title": summary.title})
+        for index, (chunk, md) in enumerate(zip(response.chunks, response.metadata)):
+            yield _line({
+                "type": "chunk",
+                "memoryId": response.memoryId,
+                "index": index,
+                "chunk": chunk,
+                "metadata": md.model_dump(mode="json"),
+            })
+        yield _line({"type": "summary", **summary.model_dump()})
+    for error in errors:
+        yield _line({"type": "error", "error": error.error})
+
+
+def _framed(responses: List[AgentResponse], errors: List[AgentError], started_at: float) -> StreamingResponse:
+    # A plain generator is iterated in the threadpool, keeping serialization off the event loop
+    return StreamingResponse(
+        _ndjson_lines(responses, errors, time.time() - started_at), media_type="application/x-ndjson")
+
+
+def render_response(response: Optional[AgentResponse], mode: str, started_at: float):
+    if mode == "summary":
+        summary = summarize(response, time.time() - started_at) if response else None
+        return JSONResponse(content=AgentSummaryWrapper(response=summary).model_dump())
+    if mode == "ndjson":
+        return _framed([response] if response else [], [], started_at)
+    return AgentResponseWrapper(response=response)
+
+
+def render_batch_response(batch: AgentBatchResponseWrapper, mode: str, started_at: float):
+    if mode == "summary":
+        elapsed = time.time() - started_at
+        return JSONResponse(content=AgentBatchSummaryWrapper(
+            responses=[summarize(response, elapsed) for response in batch.responses],
+            errors=batch.errors,
+        ).model_dump())
+    if mode == "ndjson":
+        return _framed(batch.responses, batch.errors, started_at)
+    return batch
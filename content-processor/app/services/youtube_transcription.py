@@ -1,12 +1,109 @@
-from typing import Dict, List, Tuple
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 import requests
 import tiktoken
-from youtube_transcript_api import YouTubeTranscriptApi
-
-from app.utils.google_translator import translate_text
+from requests.adapters import HTTPAdapter
+from tenacity import (AsyncRetrying, retry_if_not_exception_type,
+                      stop_after_attempt, wait_random_exponential)
+from youtube_transcript_api import (InvalidVideoId, NoTranscriptFound,
+                                    TranscriptsDisabled, VideoUnavailable)
+from youtube_transcript_api._transcripts import TranscriptListFetcher
+
+from app.utils.app_logger_config import logger
+from app.utils.google_translator import translate_texts
 from app.utils.proxy import get_random_proxy
 
+YOUTUBE_TIMEOUT = float(os.getenv("YOUTUBE_TIMEOUT", "20"))
+YOUTUBE_MAX_ATTEMPTS = int(os.getenv("YOUTUBE_MAX_ATTEMPTS", "4"))
+# Retrying cannot fix these
+PERMANENT_TRANSCRIPT_ERRORS = (
+    InvalidVideoId, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable)
+
+_sessions = threading.local()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """Applies a default timeout to every request, including library-made ones."""
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = YOUTUBE_TIMEOUT
+        return super().send(request, **kwargs)
+
+
+def get_session(proxied: bool) -> requests.Session:
+    """
+    Per-thread session, reused across videos so connections stay warm.
+    requests sessions are not safe to share between threads. The proxied
+    session gets its proxy per call, see fetch_transcript.
+    """
+    name = "proxied" if proxied else "direct"
+    session = getattr(_sessions, name, None)
+    if session is None:
+        session = requests.Session()
+        adapter = TimeoutHTTPAdapter(pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        setattr(_sessions, name, session)
+    return session
+
+
+async def run_with_retries(fn, *args, rotate_proxy: bool = False):
+    """
+    Run a blocking call in a worker thread, retrying with jittered backoff.
+    With rotate_proxy, ``fn`` also gets a proxy, a different one on every
+    attempt, since retrying through a blocked proxy fails the same way.
+    """
+    async for attempt in AsyncRetrying(
+        stop=stop_after_attempt(YOUTUBE_MAX_ATTEMPTS),
+        wait=wait_random_exponential(multiplier=0.5, max=8),
+        retry=retry_if_not_exception_type(PERMANENT_TRANSCRIPT_ERRORS),
+        reraise=True,
+    ):
+        with attempt:
+            if rotate_proxy:
+                proxy = get_random_proxy(
+                    app='yt', index=attempt.retry_state.attempt_number - 1)
+                return await asyncio.to_thread(fn, *args, proxy)
+            return await asyncio.to_thread(fn, *args)
+
+
+def fetch_video_metadata(api_url: str, video_url: str) -> Optional[Dict]:
+    response = get_session(proxied=False).get(f"{api_url}{video_url}")
+    if response.status_code >= 500 or response.status_code == 429:
+        response.raise_for_status()
+    if response.status_code == 200:
+        return response.json()
+    return None
+
+
+def fetch_transcript(video_id: str, proxy: str) -> Tuple[List[Dict], str, str]:
+    """
+    Fetch the first available transcript through ``proxy``.
+
+    Returns: (transcript entries, language, language code)
+    """
+    session = get_session(proxied=True)
+    # The library makes its own requests on the session, so the proxy is
+    # set on it; the session belongs to this thread alone
+    session.proxies = {"https": proxy, "http": proxy}
+    transcript_list = TranscriptListFetcher(session).fetch(video_id)
+    # Fetching from the listed transcript reuses the listing's session
+    # instead of listing a second time as get_transcript does
+    for transcript in transcript_list:
+        return transcript.fetch(), transcript.language, transcript.language_code
+    raise NoTranscriptFound(video_id, [], transcript_list)
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model: str) -> tiktoken.Encoding:
+    """Encoders are costly to build and safe to share, so keep one per model."""
+    return tiktoken.encoding_for_model(model)
+
 
 class TranscriptChunker:
     def __init__(
@@ -19,7 +116,7 @@ class TranscriptChunker:
         self.max_tokens = max_tokens
         self.min_tokens = min_tokens
         self.overlap_tokens = overlap_tokens
-        self.tokenizer = tiktoken.encoding_for_model(model)
+        self.tokenizer = get_tokenizer(model)
 
     def extract_video_id(self, video_url: str) -> str:
         """Extract video ID from various YouTube URL formats"""
@@ -32,9 +129,21 @@ class TranscriptChunker:
     def count_tokens(self, text: str) -> int:
         return len(self.tokenizer.encode(text))
 
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        return [len(tokens) for tokens in self.tokenizer.encode_ordinary_batch(texts)]
+
     def create_chunks_from_transcript(self, transcript: List[Dict]) -> List[Dict]:
-        """Create chunks from transcript while maintaining token limits"""
+        """
+        Create chunks from transcript while maintaining token limits.
+
+        Every entry is tokenized once, up front; chunk sizes are running sums
+        of those counts rather than re-encodings of the growing chunk text.
+        """
+        texts = [entry['text'].strip() for entry in transcript]
+        entry_tokens = self.count_tokens_batch(texts)
+
         chunks = []
+        current_parts = []
         current_chunk = {
             'text': '',
             'start_time': transcript[0]['start'],
@@ -42,40 +151,36 @@ class TranscriptChunker:
             'token_count': 0
         }
 
+        # Indices of the most recent entries, carried into the next chunk
         overlap_buffer = []
-        overlap_token_count = 0
 
-        for entry in transcript:
-            text = entry['text'].strip()
-            entry_tokens = self.count_tokens(text)
+        for i, entry in enumerate(transcript):
+            text = texts[i]
 
-            if current_chunk['token_count'] + entry_tokens > self.max_tokens and current_chunk['token_count'] >= self.min_tokens:
+            if current_chunk['token_count'] + entry_tokens[i] > self.max_tokens and current_chunk['token_count'] >= self.min_tokens:
+                current_chunk['text'] = ' '.join(current_parts)
                 chunks.append(current_chunk)
 
-                overlap_text = ' '.join([e['text'].strip()
-                                        for e in overlap_buffer])
+                current_parts = [texts[j] for j in overlap_buffer if texts[j]]
                 current_chunk = {
-                    'text': overlap_text,
-                    'start_time': overlap_buffer[0]['start'] if overlap_buffer else entry['start'],
+                    'text': '',
+                    'start_time': transcript[overlap_buffer[0]]['start'] if overlap_buffer else entry['start'],
                     'end_time': entry['start'] + entry['duration'],
-                    'token_count': overlap_token_count
+                    'token_count': sum(entry_tokens[j] for j in overlap_buffer)
                 }
 
-                overlap_buffer = overlap_buffer[-3:] if overlap_buffer else []
-                overlap_token_count = sum(self.count_tokens(
-                    e['text'].strip()) for e in overlap_buffer)
+                overlap_buffer = overlap_buffer[-3:]
 
-            current_chunk['text'] += f" {text}" if current_chunk['text'] else text
+            if text:
+                current_parts.append(text)
             current_chunk['end_time'] = entry['start'] + entry['duration']
-            current_chunk['token_count'] = self.count_tokens(
-                current_chunk['text'])
+            current_chunk['token_count'] += entry_tokens[i]
 
-            overlap_buffer.append(entry)
+            overlap_buffer.append(i)
             if len(overlap_buffer) > 5:
-                removed_entry = overlap_buffer.pop(0)
-                overlap_token_count -= self.count_tokens(
-                    removed_entry['text'].strip())
+                overlap_buffer.pop(0)
 
+        current_chunk['text'] = ' '.join(current_parts)
         if current_chunk['text'] and current_chunk['token_count'] >= self.min_tokens:
             chunks.append(current_chunk)
 
@@ -88,48 +193,39 @@ class TranscriptChunker:
         """
         try:
             video_id = self.extract_video_id(video_url)
-            # Get video metadata
-            response = requests.get(f"{api_url}{video_url}")
+            # Metadata and transcript are independent; fetch them together
+            metadata_result, transcript_result = await asyncio.gather(
+                run_with_retries(fetch_video_metadata, api_url, video_url),
+                run_with_retries(fetch_transcript, video_id, rotate_proxy=True),
+                return_exceptions=True,
+            )
+            if isinstance(transcript_result, Exception):
+                raise transcript_result
+            transcript, _, language_code = transcript_result
+
             video_title = "Untitled"
             video_desc = ""
             author = "Unknown"
             channel_name = "Unknown"
-            if response.status_code == 200:
-                data = response.json()
+            if isinstance(metadata_result, Exception):
+                logger.error(
+                    f"Failed to fetch metadata for {video_url}: {metadata_result}")
+            elif metadata_result:
+                data = metadata_result
                 video_title = data.get("title", "Untitled")
                 video_desc = data.get("description", "")
                 author = data.get("author_name", "Unknown")
                 channel_name = data.get("author_url", "Unknown").split('/')[-1]
 
-            # Get transcript
-            proxyIp = get_random_proxy(app='yt')
-            language_of_available_transcript = {
-                "language": "",
-                "code": ""
-            }
-
-            for transcript in YouTubeTranscriptApi.list_transcripts(video_id, proxies={
-                "https": proxyIp,
-                "http": proxyIp
-            }):
-                language_of_available_transcript["language"] = transcript.language
-                language_of_available_transcript["code"] = transcript.language_code
-                break
-
-            transcript = YouTubeTranscriptApi.get_transcript(
-                video_id, proxies={
-                    "https": proxyIp,
-                    "http": proxyIp
-                },
-                languages=[language_of_available_transcript["code"]]
-            )
-
             # Create chunks
-            chunks = self.create_chunks_from_transcript(transcript)
-
-            if language_of_available_transcript["code"] != "en":
-                for chunk in chunks:
-                    chunk["text"] = await translate_text(chunk["text"])
+            # Tokenizing a long transcript is CPU bound; keep it off the event loop
+            chunks = await asyncio.to_thread(
+                self.create_chunks_from_transcript, transcript)
+
+            if language_code != "en":
+                translations = await translate_texts([chunk["text"] for chunk in chunks])
+                for chunk, translation in zip(chunks, translations):
+                    chunk["text"] = translation
 
             return chunks, video_title, video_desc, author, channel_name
 
@@ -1,16 +1,23 @@
 import asyncio
 import io
 import os
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Tuple, Union
 
-import numpy as np
-import openai
+from cortex_shared import providers
 from dotenv import load_dotenv
-from pydub import AudioSegment
 
 from app.utils.language_codes import TO_LANGUAGE_CODE
 
-client = openai.AsyncOpenAI()
+np = providers.lazy_import("numpy")
+pydub = providers.lazy_import("pydub")
+
+
+def _openai_audio_client():
+    import openai
+    return openai.AsyncOpenAI()
+
+
+client = providers.register("openai_audio", _openai_audio_client)
 
 if os.path.exists('.env'):
     load_dotenv()
@@ -21,8 +28,17 @@ print(f"temporary folder path = {TEMP_FOLDER_PATH}")
 os.makedirs(TEMP_FOLDER_PATH, exist_ok=True)
 
 
-async def extract_audio_from_video(video_bytes: bytes) -> bytes:
-    """Extract audio from video bytes and return audio content."""
+async def extract_audio_from_video(video: Union[bytes, str]) -> bytes:
+    """
+    Extract audio from a video and return it as wav bytes. ``video`` is
+    either the video bytes or the path of a video file already on disk.
+    """
+    if isinstance(video, str):
+        audio = pydub.AudioSegment.from_file(video)
+        audio_content = io.BytesIO()
+        audio.export(audio_content, format="wav")
+        return audio_content.getvalue()
+
     temp_video_path = os.path.join(
         TEMP_FOLDER_PATH, f"temp_video_{os.urandom(4).hex()}.mp4")
 
@@ -32,10 +48,10 @@ async def extract_audio_from_video(video_bytes: bytes) -> bytes:
 
         # Write video bytes to temporary file
         with open(temp_video_path, "wb") as temp_video:
-            temp_video.write(video_bytes)
+            temp_video.write(video)
 
         # Extract audio
-        video = AudioSegment.from_file(temp_video_path, format="mp4")
+        video = pydub.AudioSegment.from_file(temp_video_path, format="mp4")
         audio_content = io.BytesIO()
         video.export(audio_content, format="wav")
         audio_content.seek(0)
@@ -53,7 +69,7 @@ def safe_float_conversion(value: Any) -> float:
 
 
 async def transcribe_audio_chunk(
-    chunk: AudioSegment,
+    chunk: "pydub.AudioSegment",
     chunk_index: int,
     lang: str = "en"
 ) -> Tuple[str, List[Tuple[float, float, str]]]:
@@ -101,13 +117,20 @@ async def transcribe_audio_chunk(
 
 
 async def process_audio_for_transcription(
-    audio_content: bytes,
+    audio_content: Union[bytes, str],
     max_concurrent: int = 4,
     language: str = "english"
 ) -> Tuple[str, List[Dict[str, Any]]]:
-    """Process audio for transcription, dynamically splitting into chunks."""
+    """
+    Process audio for transcription, dynamically splitting into chunks.
+    ``audio_content`` is wav bytes or the path of an audio file in any
+    format ffmpeg reads.
+    """
     try:
-        sound = AudioSegment.from_wav(io.BytesIO(audio_content))
+        if isinstance(audio_content, str):
+            sound = pydub.AudioSegment.from_file(audio_content)
+        else:
+            sound = pydub.AudioSegment.from_wav(io.BytesIO(audio_content))
         total_duration_ms = len(sound)
 
         # Dynamically calculate chunk size
@@ -1,11 +1,15 @@
 import os
+from dataclasses import dataclass
+from typing import List
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from cortex_shared import providers
 
 from app.core.jina_ai import use_jina
 from app.schemas import Metadata
-from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import GitSpecificMd, Metadata
+from app.utils.chunk_metadata import ChunkMetadata
+
+text_splitters = providers.lazy_import("langchain_text_splitters")
 
 # List of directories to exclude
 EXCLUDED_DIRS = {
@@ -83,7 +87,15 @@ def read_file(path: str) -> str:
         return f"Error reading {path}: {str(e)}"
 
 
-def get_every_file_content_in_folder(folder_path: str, is_code: bool, repo_link: str, md: Metadata[GitSpecificMd], mem_id) -> AgentResponse:
+@dataclass
+class RepoContent:
+    transcript: str
+    chunks: List[str]
+    # Column-wise, as the agent stores it
+    metadata: ChunkMetadata
+
+
+def get_every_file_content_in_folder(folder_path: str, is_code: bool, repo_link: str, md: Metadata[GitSpecificMd], mem_id) -> RepoContent:
     """
     Get the content of every file in a folder and its subfolders, with chunks and metadata.
 
@@ -93,10 +105,8 @@ def get_every_file_content_in_folder(folder_path: str, is_code: bool, repo_link:
         repo_link (str): The link to the repository.
 
     Returns:
-        AgentResponse: A dictionary containing:
-            - 'content': The concatenated content of all files.
-            - 'chunks': List of content chunks.
-            - 'metadata': List of metadata for each chunk.
+        RepoContent: The concatenated content of all files, its chunks and
+        their metadata.
     """
     if not os.path.exists(folder_path):
         raise ValueError(f"Folder '{folder_path}' does not exist.")
@@ -106,7 +116,7 @@ def get_every_file_content_in_folder(folder_path: str, is_code: bool, repo_link:
     repo_name = repo_link.split("/")[-1]
     repo_creator_name = repo_link.split("/")[3]
     chunk_id = 0
-    metadata = []
+    metadata = ChunkMetadata(md, GitSpecificMd)
     for root, dirs, files in os.walk(folder_path):
         # Remove excluded directories
         dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
@@ -119,14 +129,13 @@ def get_every_file_content_in_folder(folder_path: str, is_code: bool, repo_link:
                 file_content += f"Location: {file_path}\n{file_content}\n\n"
                 file_content += file_end_delimiter
                 all_contents += file_content
-                current_md = md.copy()
                 if is_code:
                     ext = file_extension[1:]
                     if ext in INCLUDED_LANGUAGE_WITH_EXTENSION:
                         code_chunks = chunk_code(file_content, ext, 1000)
                         chunks.extend(code_chunks)
                         for i in range(len(code_chunks)):
-                            current_md.specific_desc = GitSpecificMd(
+                            metadata.append(
                                 repo_name=repo_name,
                                 repo_creator_name=repo_creator_name,
                                 file_name=file_path,
@@ -134,21 +143,19 @@ def get_every_file_content_in_folder(folder_path: str, is_code: bool, repo_link:
                                 chunk_type="code",
                                 chunk_id=f"{mem_id}_{chunk_id}"
                             )
-                            metadata.append(current_md)
                             chunk_id += 1
                     elif ext in OTHER_ALLOWED_CONFIG_EXT:
                         code_chunks = chunk_text(file_content, 500)
                         chunks.extend(code_chunks)
                         for i in range(len(code_chunks)):
-                            current_md.specific_desc = GitSpecificMd(
+                            metadata.append(
                                 repo_name=repo_name,
                                 repo_creator_name=repo_creator_name,
                                 file_name=file_path,
                                 programming_language=ext,
                                 chunk_type="code",
-                                chunk_id=f"{chunk_id}"
+                                chunk_id=f"{mem_id}_{chunk_id}"
                             )
-                            metadata.append(current_md)
                             chunk_id += 1
 
                     # chunk_id += 1
@@ -156,13 +163,7 @@ def get_every_file_content_in_folder(folder_path: str, is_code: bool, repo_link:
     print(len(chunks))
     print(len(metadata))
     print("done here")
-    return AgentResponse(
-        transcript=all_contents,
-        chunks=chunks,
-        metadata=metadata,
-        userId=md.user_id,
-        memoryId=md.memId
-    )
+    return RepoContent(transcript=all_contents, chunks=chunks, metadata=metadata)
 
 
 def write_file(data: str) -> None:
@@ -195,7 +196,7 @@ def chunk_code(content: str, ext: str, context_size: int) -> list:
         ext = 'cpp'
     if ext == 'cs':
         ext = 'csharp'
-    splitter = RecursiveCharacterTextSplitter.from_language(
+    splitter = text_splitters.RecursiveCharacterTextSplitter.from_language(
         language=ext,
         chunk_size=context_size,
         chunk_overlap=0
@@ -215,5 +216,5 @@ def chunk_text(content: str, context_size: int) -> list:
     Returns:
         list: A list of text chunks, or an empty list if chunking fails.
     """
-    chunks = use_jina.segment_data(content)
+    chunks = use_jina.segment_data_sync(content)
     return chunks
@@ -3,21 +3,23 @@ import os
 from typing import Union
 
 import requests
+from cortex_shared import providers
 from dotenv import load_dotenv
-from git import Repo
 from pytube import YouTube
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import JSONFormatter
 
-from app.schemas.Common import AgentResponse
 from app.schemas.Metadata import GitSpecificMd, Metadata
 from app.utils.AV import (extract_audio_from_video,
                           process_audio_for_transcription)
-from app.utils.File import get_every_file_content_in_folder
+from app.utils.chunk_metadata import ChunkMetadata
+from app.utils.File import RepoContent, get_every_file_content_in_folder
 
 if os.path.exists('.env'):
     load_dotenv()
 
+# GitPython runs the git binary when imported
+git = providers.lazy_import("git")
 
 TEMP_PATH = os.getenv("TEMP_FOLDER_PATH", "/tmp")
 
@@ -39,13 +41,13 @@ def clone_git_repo(repo_url: str) -> Union[bool, str]:
         if os.path.exists(path):
             os.system(f"rm -rf {path}")
         os.makedirs(path, exist_ok=True)
-        Repo.clone_from(repo_url, path)
+        git.Repo.clone_from(repo_url, path)
         return True, path
     except Exception as e:
         return False, f"Error cloning {repo_url}: {str(e)}"
 
 
-def extract_code_from_repo(repo_url: str, metadata: Metadata[GitSpecificMd], mem_id: str) -> AgentResponse:
+def extract_code_from_repo(repo_url: str, metadata: Metadata[GitSpecificMd], mem_id: str) -> RepoContent:
     """
     Extract code from a git repository.
 
@@ -58,13 +60,7 @@ def extract_code_from_repo(repo_url: str, metadata: Metadata[GitSpecificMd], mem
     try:
         success, path = clone_git_repo(repo_url)
         if not success:
-            return AgentResponse(
-                transcript="",
-                chunks=[],
-                metadata=[],
-                userId=metadata.user_id,
-                memoryId=metadata.memId
-            )
+            return RepoContent(transcript="", chunks=[], metadata=ChunkMetadata(metadata, GitSpecificMd))
         content = get_every_file_content_in_folder(
             path, is_code=True, repo_link=repo_url, md=metadata, mem_id=mem_id)
         print("Now here")
@@ -73,13 +69,7 @@ def extract_code_from_repo(repo_url: str, metadata: Metadata[GitSpecificMd], mem
         return content
     except Exception as e:
         print(e)
-        return AgentResponse(
-            transcript="",
-            chunks=[],
-            metadata=[],
-            userId=metadata.user_id,
-            memoryId=metadata.memId
-        )
+        return RepoContent(transcript="", chunks=[], metadata=ChunkMetadata(metadata, GitSpecificMd))
 
 
 def extract_youtube_transcript(video_id: str) -> str:
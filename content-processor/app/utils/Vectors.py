@@ -1,9 +1,28 @@
+import os
 from typing import List
 
+from dotenv import load_dotenv
+
 from app.schemas.Metadata import Metadata
+from app.utils.chunk_metadata import ChunkMetadata
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+# central: each Memory row holds only its own chunk and inference builds the
+# neighbour window from adjacent chunkIndex rows when reading.
+# windowed: the previous/next chunks are written into every row (legacy).
+MEMORY_STORAGE_MODE = os.getenv("MEMORY_STORAGE_MODE", "central")
 
 
 def get_vectors(metadata, embeddings):
+    if isinstance(metadata, ChunkMetadata):
+        return [{
+            "id": metadata.vector_id(i),
+            "values": e,
+            "metadata": metadata.flatten(i),
+        } for i, e in zip(range(len(metadata)), embeddings)]
+
     vectors = []
     for m, e in zip(metadata, embeddings):
         vector_id = f"{m.memId}_{m.specific_desc.chunk_id}"
@@ -34,7 +53,23 @@ def flatten_metadata(metadata: Metadata):
     return flattened
 
 
-def combine_data_chunks(chunks: str, meta_chunks: List[Metadata], memId: str, diff=1):
+def vector_stubs(metadata) -> List[dict]:
+    """Vector ids and metadata without values, as plain JSON-able dicts."""
+    if isinstance(metadata, ChunkMetadata):
+        return [{"id": metadata.vector_id(i), "metadata": metadata.flatten(i)}
+                for i in range(len(metadata))]
+    return [{"id": f"{m.memId}_{m.specific_desc.chunk_id}", "metadata": flatten_metadata(m)}
+            for m in metadata]
+
+
+def chunk_ids(metadata) -> List[str]:
+    if isinstance(metadata, ChunkMetadata):
+        return metadata.chunk_ids()
+    return [m.specific_desc.chunk_id for m in metadata]
+
+
+def combine_chunk_windows(chunks: List[str], diff=1) -> List[str]:
+    """Each chunk wrapped in <central> tags between its ``diff`` neighbours."""
     JOINER = '<joiner>'
     CENTRAL_OPENER = '<central>'
     CENTRAL_CLOSER = '</central>'
@@ -60,12 +95,29 @@ def combine_data_chunks(chunks: str, meta_chunks: List[Metadata], memId: str, di
             parts.extend([f"{JOINER} {chunks[j]}" for j in range(i + 1, next)])
 
         # Join all parts
-        current_chunk = ' '.join(parts)
+        combined_chunks.append(' '.join(parts))
 
+    return combined_chunks
+
+
+# memTypes whose agents store memory_data(); the rest always store the bare chunk
+WINDOWED_MEM_TYPES = frozenset({'note', 'video', 'image', 'pdf'})
+
+
+def memory_data(chunks: List[str]) -> List[str]:
+    """Text stored in Memory.memData for each chunk under MEMORY_STORAGE_MODE."""
+    if MEMORY_STORAGE_MODE == "windowed":
+        return combine_chunk_windows(chunks)
+    return list(chunks)
+
+
+def combine_data_chunks(chunks: str, meta_chunks: List[Metadata], memId: str, diff=1):
+    combined_chunks = []
+    for i, current_chunk in enumerate(combine_chunk_windows(chunks, diff)):
         combined_chunks.append({
             "memData": current_chunk,
             "chunkId": f"{memId}_{i}",
-            "metadata": meta_chunks[i].json(),
+            "metadata": meta_chunks.to_json(i) if isinstance(meta_chunks, ChunkMetadata) else meta_chunks[i].json(),
         })
 
     return combined_chunks
@@ -0,0 +1,128 @@
+"""
+Column-wise metadata for the chunks of one memory.
+
+Agents used to copy the memory's Metadata once per chunk, validate a new
+*SpecificMd for it, and then dump every copy again: ``.json()`` for the
+Postgres row and ``flatten_metadata`` for the Pinecone vector. On repos with
+thousands of chunks that pydantic work dominates the profile.
+
+ChunkMetadata keeps the shared base Metadata once, serialized once, and only
+the per-chunk specific fields in plain lists. Rows, vector metadata and JSON
+are then produced with dict and string work, using orjson for the per-chunk
+part. Indexing still returns regular Metadata objects for code that needs
+them, such as the AgentResponse.
+"""
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import orjson
+from pydantic import BaseModel
+
+from app.schemas.Metadata import Metadata
+
+
+def _flatten_value(value: Any) -> str:
+    return ','.join(map(str, value)) if isinstance(value, list) else str(value)
+
+
+class ChunkMetadata(Sequence):
+    def __init__(self, base: Metadata, specific_cls: Type[BaseModel], base_columns: Iterable[str] = ()):
+        """
+        ``base_columns`` names base Metadata fields that differ per chunk
+        (e.g. ``content_hash``); they are stored as columns like the
+        specific fields.
+        """
+        # One copy instead of one per chunk; later changes to the agent's md do not leak in
+        self.base = base.model_copy()
+        self.specific_cls = specific_cls
+        self.specific_fields = specific_cls.model_fields
+        self.base_columns: Dict[str, list] = {name: [] for name in base_columns}
+        self.columns: Dict[str, list] = {name: [] for name in self.specific_fields}
+        self.count = 0
+
+        shared = self.base.model_dump(exclude={"specific_desc", *self.base_columns})
+        self.base_flat = {key: _flatten_value(value) for key, value in shared.items()}
+        # '{"user_id":...' without the closing brace; each chunk appends its own fields
+        self.json_prefix = orjson.dumps(self.base.model_dump(
+            mode="json", exclude={"specific_desc", *self.base_columns})).decode()[:-1]
+
+    def append(self, *, base_fields: Optional[Dict[str, Any]] = None, **specific: Any) -> None:
+        """
+        Add one chunk. Specific fields left out take their model defaults;
+        names the models do not have raise instead of being dropped.
+        """
+        unknown = specific.keys() - self.specific_fields.keys()
+        if unknown:
+            raise ValueError(
+                f"Unknown {self.specific_cls.__name__} fields: {', '.join(sorted(unknown))}")
+        unknown = (base_fields or {}).keys() - self.base_columns.keys()
+        if unknown:
+            raise ValueError(f"Not per-chunk Metadata columns: {', '.join(sorted(unknown))}")
+        for name, field in self.specific_fields.items():
+            if name in specific:
+                self.columns[name].append(specific[name])
+            elif field.is_required():
+                raise ValueError(
+                    f"Missing {self.specific_cls.__name__}.{name} for chunk {self.count}")
+            else:
+                self.columns[name].append(field.get_default(call_default_factory=True))
+        for name, column in self.base_columns.items():
+            column.append((base_fields or {}).get(name, getattr(self.base, name)))
+        self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("chunk index out of range")
+        update = {name: column[index] for name, column in self.base_columns.items()}
+        update["specific_desc"] = self.specific_cls(**self.specific(index))
+        return self.base.model_copy(update=update)
+
+    def to_list(self) -> List[Metadata]:
+        return [self[i] for i in range(self.count)]
+
+    def specific(self, index: int) -> Dict[str, Any]:
+        return {name: column[index] for name, column in self.columns.items()}
+
+    def chunk_ids(self) -> List[str]:
+        return list(self.columns["chunk_id"])
+
+    def to_json(self, index: int) -> str:
+        """Same document as ``self[index].json()``."""
+        own = {name: column[index] for name, column in self.base_columns.items()}
+        own["specific_desc"] = self.specific(index)
+        return self.json_prefix + "," + orjson.dumps(own).decode()[1:]
+
+    def flatten(self, index: int) -> Dict[str, str]:
+        """Same dict as ``flatten_metadata(self[index])``."""
+        flattened = dict(self.base_flat)
+        for name, column in self.base_columns.items():
+            flattened[name] = _flatten_value(column[index])
+        for name, column in self.columns.items():
+            flattened[f"specific_desc_{name}"] = str(column[index])
+        return flattened
+
+    def vector_id(self, index: int) -> str:
+        return f"{self.base.memId}_{self.columns['chunk_id'][index]}"
+
+    def rows(self, mem_type: str, mem_data: List[str]) -> List[dict]:
+        """Memory table rows, one per chunk, holding ``mem_data[i]``."""
+        base = self.base
+        return [{
+            "memId": base.memId,
+            "userId": base.user_id,
+            "chunkId": f"{base.memId}_{i}",
+            "chunkIndex": i,
+            "title": base.title,
+            "memData": data,
+            "memType": mem_type,
+            "source": base.source,
+            "tags": base.tags,
+            "metadata": self.to_json(i),
+        } for i, data in zip(range(self.count), mem_data)]
@@ -6,10 +6,8 @@ import time
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 
-from anthropic import AsyncAnthropic
+from cortex_shared import providers
 from dotenv import load_dotenv
-from fireworks.client import AsyncFireworks
-from openai import AsyncOpenAI
 from pydantic import BaseModel
 
 from app.utils.app_logger_config import logger
@@ -21,25 +19,44 @@ if os.path.exists('.env'):
 MAX_CHUNK_SIZE = 20
 CONTEXT_WINDOW_SIZE = 40
 
-fireworks_client = AsyncFireworks(
-    api_key=os.getenv("FIREWORKS_API_KEY"),
-)
 
-anthropic_client = AsyncAnthropic(
-    api_key=os.getenv("ANTHROPIC_API_KEY"),
-    max_retries=3
-)
+def _fireworks_client():
+    from fireworks.client import AsyncFireworks
+    return AsyncFireworks(
+        api_key=os.getenv("FIREWORKS_API_KEY"),
+    )
 
-openai_client = AsyncOpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    max_retries=3,
-)
 
-deepseek_client = AsyncOpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    max_retries=3,
-    base_url="https://api.deepseek.com",
-)
+def _anthropic_client():
+    from anthropic import AsyncAnthropic
+    return AsyncAnthropic(
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        max_retries=3
+    )
+
+
+def _openai_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=3,
+    )
+
+
+def _deepseek_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=os.getenv("DEEPSEEK_API_KEY"),
+        max_retries=3,
+        base_url="https://api.deepseek.com",
+    )
+
+
+# Built on first use, see cortex_shared.providers
+fireworks_client = providers.register("fireworks", _fireworks_client)
+anthropic_client = providers.register("anthropic", _anthropic_client)
+openai_client = providers.register("openai", _openai_client)
+deepseek_client = providers.register("deepseek", _deepseek_client)
 
 BULK_CONTEXT_PROMPT = """
 You are an expert in contextual analysis and semantic search optimization. Your task is to generate precise, search-optimized descriptions for text chunks that will enhance retrieval in a RAG system.
@@ -344,7 +361,21 @@ def wait_for_n_seconds(n: int = 5) -> None:
     return None
 
 
-async def update_chunks(chunks: List[str], userId, memoryId) -> List[str]:
+async def update_chunks(chunks: List[str], userId, memoryId, track_status: bool = True) -> List[str]:
+    """
+    Prefix every chunk with an LLM-written description of its context.
+
+    ``track_status=False`` reports progress on the "enrichment" phase instead
+    of the document status, for contextualization running in the background.
+    """
+    def report_progress(progress: float) -> None:
+        if track_status:
+            TRACKER.update_status(
+                userId, memoryId, ProcessingStatus.CONTEXTUALIZING, progress)
+        else:
+            TRACKER.update_phase(
+                userId, memoryId, "enrichment", ProcessingStatus.CONTEXTUALIZING, progress)
+
     try:
         updated_chunks = []
         PREVIOUS = 30
@@ -356,8 +387,7 @@ async def update_chunks(chunks: List[str], userId, memoryId) -> List[str]:
         openai_batches = []
         claude_batches = []
 
-        TRACKER.update_status(
-            userId, memoryId, ProcessingStatus.CONTEXTUALIZING, 20)
+        report_progress(20)
 
         total_chunks = len(chunks)
         max_percentage = 80
@@ -411,12 +441,12 @@ async def update_chunks(chunks: List[str], userId, memoryId) -> List[str]:
                 output = output.model_dump()
                 for j in range(len(sentences)):
                     desc = output[f"sentence{j+1}"]
-                    batch_results.append(f"{desc}. {sentences[j]}")
+                    batch_results.append(
+                        (batch['current_start'] + j, f"{desc}. {sentences[j]}"))
 
                 percentage = min(
                     percentage + percentage_update_per_step, max_percentage)
-                TRACKER.update_status(
-                    userId, memoryId, ProcessingStatus.CONTEXTUALIZING, percentage)
+                report_progress(percentage)
                 await asyncio.sleep(5)  # Non-blocking sleep
             return batch_results
 
@@ -430,9 +460,11 @@ async def update_chunks(chunks: List[str], userId, memoryId) -> List[str]:
         # Wait for all tasks to complete and gather results
         results = await asyncio.gather(*tasks)
 
-        # Combine results from all tasks
+        # Combine results from all tasks; each model handled interleaved
+        # batches, so restore document order to line up with the metadata
         for batch_result in results:
             updated_chunks.extend(batch_result)
+        updated_chunks = [text for _, text in sorted(updated_chunks)]
 
         print(f"Updated chunks length - {len(updated_chunks)}")
         return updated_chunks
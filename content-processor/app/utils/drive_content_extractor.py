@@ -1,13 +1,21 @@
-import io
+import json
 import os
-from typing import Optional, Tuple
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Optional, Set, Tuple
 
+from cortex_shared import providers
 from dotenv import load_dotenv
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 
 from app.schemas.Metadata import GDriveFileType
+from app.utils.app_logger_config import logger
+
+auth_requests = providers.lazy_import("google.auth.transport.requests")
+oauth2_credentials = providers.lazy_import("google.oauth2.credentials")
+discovery = providers.lazy_import("googleapiclient.discovery")
+discovery_cache = providers.lazy_import("googleapiclient.discovery_cache")
 
 if os.path.exists('.env'):
     load_dotenv()
@@ -15,27 +23,71 @@ if os.path.exists('.env'):
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+# execute() retries 429s and rateLimitExceeded 403s with exponential backoff
+DRIVE_NUM_RETRIES = int(os.getenv("DRIVE_NUM_RETRIES", "5"))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DRIVE_DOWNLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "4"))
+# Downloads below this size stay in memory, larger ones spill to disk
+SPOOL_MAX_SIZE = 32 * 1024 * 1024
+TEMP_FOLDER_PATH = os.getenv("TEMP_FOLDER_PATH", "/tmp")
+
+
+class StalePageToken(Exception):
+    """Drive no longer accepts a stored changes page token."""
+
+
+class RangeNotHonoured(Exception):
+    """The server answered a ranged request with something other than that range."""
+
+
+@lru_cache(maxsize=None)
+def get_discovery_document(service_name: str, version: str) -> dict:
+    """Load and parse the bundled discovery document once per process."""
+    doc = discovery_cache.get_static_doc(service_name, version)
+    if doc is None:
+        raise ValueError(
+            f"No discovery document for {service_name} {version}")
+    return json.loads(doc)
+
+
+def build_service(service_name: str, version: str, credentials: "oauth2_credentials.Credentials"):
+    """Build an API client from the cached discovery document."""
+    return discovery.build_from_document(
+        get_discovery_document(service_name, version), credentials=credentials)
+
+
+def quote_sheet_name(sheet_name: str) -> str:
+    """Quote a sheet title for use as an A1 range."""
+    return "'" + sheet_name.replace("'", "''") + "'"
+
 
 class GDriveProcessor:
-    def __init__(self, file_id: str, access_token: str, refresh_token: Optional[str] = None):
+    def __init__(self, file_id: str, access_token: str, refresh_token: Optional[str] = None, service_factory: Callable = build_service):
         self.file_id = file_id
-        self.credentials = Credentials(
+        self.service_factory = service_factory
+        self.credentials = oauth2_credentials.Credentials(
             token=access_token,
             refresh_token=refresh_token,
             client_id=GOOGLE_CLIENT_ID,
             client_secret=GOOGLE_CLIENT_SECRET,
             token_uri="https://oauth2.googleapis.com/token",
         )
-        self.service = build('drive', 'v3', credentials=self.credentials)
+        self.service = service_factory('drive', 'v3', self.credentials)
+        self.file_size = None
 
     def get_file_type(self) -> Tuple[GDriveFileType, dict]:
         """Get file type and metadata from Drive API"""
         file = self.service.files().get(
             fileId=self.file_id,
-            fields='mimeType,name'
-        ).execute()
+            fields='mimeType,name,size,modifiedTime,md5Checksum,trashed'
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
 
         mime_type = file['mimeType']
+        if file.get('size') is not None:
+            self.file_size = int(file['size'])
 
         if mime_type == GDriveFileType.GDOC.value:
             return GDriveFileType.GDOC, file
@@ -54,10 +106,79 @@ class GDriveProcessor:
         else:
             return GDriveFileType.UNKNOWN, file
 
+    def get_start_page_token(self) -> str:
+        """Token marking "now" in the user's Drive change log."""
+        response = self.service.changes().getStartPageToken().execute(
+            num_retries=DRIVE_NUM_RETRIES)
+        return response['startPageToken']
+
+    def list_changes(self, page_token: str) -> Tuple[Set[str], Set[str], str]:
+        """
+        Read the Drive change log from ``page_token``.
+
+        Returns:
+            (changed file ids, removed or trashed file ids, token to resume from next time)
+        """
+        changed = set()
+        removed = set()
+        while True:
+            try:
+                response = self.service.changes().list(
+                    pageToken=page_token,
+                    fields="nextPageToken, newStartPageToken, changes(fileId, removed, file(trashed))",
+                    pageSize=1000,
+                ).execute(num_retries=DRIVE_NUM_RETRIES)
+            except Exception as e:
+                # HttpError; Drive rejects expired or unknown tokens with 400/404/410
+                status = getattr(getattr(e, "resp", None), "status", None)
+                if status in (400, 404, 410):
+                    raise StalePageToken(f"Page token {page_token} rejected: {e}") from e
+                raise
+
+            for change in response.get('changes', []):
+                if change.get('removed') or change.get('file', {}).get('trashed'):
+                    removed.add(change['fileId'])
+                else:
+                    changed.add(change['fileId'])
+
+            if 'newStartPageToken' in response:
+                return changed, removed, response['newStartPageToken']
+            page_token = response['nextPageToken']
+
+    def list_folder_files(self, folder_id: str, recursive: bool = True) -> List[dict]:
+        """List the non-folder files under a Drive folder."""
+        files = []
+        pending_folders = [folder_id]
+
+        while pending_folders:
+            current_folder = pending_folders.pop()
+            page_token = None
+            while True:
+                response = self.service.files().list(
+                    q=f"'{current_folder}' in parents and trashed = false",
+                    fields="nextPageToken, files(id, name, mimeType)",
+                    pageSize=1000,
+                    pageToken=page_token,
+                ).execute(num_retries=DRIVE_NUM_RETRIES)
+
+                for file in response.get('files', []):
+                    if file['mimeType'] == FOLDER_MIME_TYPE:
+                        if recursive:
+                            pending_folders.append(file['id'])
+                    else:
+                        files.append(file)
+
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+
+        return files
+
     def extract_doc_content(self) -> str:
         """Extract content from Google Doc"""
-        docs_service = build('docs', 'v1', credentials=self.credentials)
-        document = docs_service.documents().get(documentId=self.file_id).execute()
+        docs_service = self.service_factory('docs', 'v1', self.credentials)
+        document = docs_service.documents().get(
+            documentId=self.file_id).execute(num_retries=DRIVE_NUM_RETRIES)
         content = []
 
         for elem in document.get('body').get('content'):
@@ -69,22 +190,27 @@ class GDriveProcessor:
         return '\n'.join(content)
 
     def extract_sheet_content(self) -> str:
-        """Extract content from Google Sheet"""
-        sheets_service = build('sheets', 'v4', credentials=self.credentials)
+        """Extract content from Google Sheet, reading every sheet in one batchGet"""
+        sheets_service = self.service_factory('sheets', 'v4', self.credentials)
         spreadsheet = sheets_service.spreadsheets().get(
-            spreadsheetId=self.file_id
-        ).execute()
+            spreadsheetId=self.file_id,
+            fields='sheets.properties.title'
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
 
-        content = []
+        sheet_names = [sheet['properties']['title']
+                       for sheet in spreadsheet.get('sheets', [])]
+        if not sheet_names:
+            return ""
 
-        for sheet in spreadsheet['sheets']:
-            sheet_name = sheet['properties']['title']
-            result = sheets_service.spreadsheets().values().get(
-                spreadsheetId=self.file_id,
-                range=sheet_name
-            ).execute()
+        result = sheets_service.spreadsheets().values().batchGet(
+            spreadsheetId=self.file_id,
+            ranges=[quote_sheet_name(name) for name in sheet_names]
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
 
-            rows = result.get('values', [])
+        content = []
+        # valueRanges are returned in the order the ranges were requested
+        for sheet_name, value_range in zip(sheet_names, result.get('valueRanges', [])):
+            rows = value_range.get('values', [])
             sheet_content = []
             for row in rows:
                 sheet_content.append(' | '.join(str(cell) for cell in row))
@@ -95,10 +221,10 @@ class GDriveProcessor:
 
     def extract_slide_content(self) -> str:
         """Extract content from Google Slides"""
-        slides_service = build('slides', 'v1', credentials=self.credentials)
+        slides_service = self.service_factory('slides', 'v1', self.credentials)
         presentation = slides_service.presentations().get(
             presentationId=self.file_id
-        ).execute()
+        ).execute(num_retries=DRIVE_NUM_RETRIES)
 
         content = []
         slide_number = 1
@@ -119,14 +245,90 @@ class GDriveProcessor:
 
         return '\n\n'.join(content)
 
-    def get_file_content(self) -> bytes:
-        """Download file content from Google Drive"""
-        request = self.service.files().get_media(fileId=self.file_id)
-        file_content = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_content, request)
+    def download_file(self) -> tempfile.SpooledTemporaryFile:
+        """
+        Download file content from Google Drive into a spooled temp file.
+
+        Small files stay in memory and larger ones spill to disk. The
+        returned file is positioned at the start.
+        """
+        output = tempfile.SpooledTemporaryFile(
+            max_size=SPOOL_MAX_SIZE, dir=TEMP_FOLDER_PATH)
+        try:
+            self._download_into(output)
+        except Exception:
+            output.close()
+            raise
+        output.seek(0)
+        return output
+
+    def download_to_path(self, suffix: str = "") -> str:
+        """
+        Download file content to a temp file on disk and return its path, for
+        media that decoders read from disk. The caller deletes the file.
+        """
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=TEMP_FOLDER_PATH)
+        try:
+            with os.fdopen(fd, "w+b") as output:
+                self._download_into(output)
+        except Exception:
+            os.unlink(path)
+            raise
+        return path
+
+    def _download_into(self, output) -> None:
+        """
+        Large files are fetched as parallel ranged requests and written at
+        their offsets, so the whole file is never buffered in memory.
+        """
+        if self.file_size is None:
+            self.get_file_type()
+
+        url = f"{DRIVE_FILES_URL}/{self.file_id}?alt=media"
+        size = self.file_size or 0
+
+        if size <= DOWNLOAD_CHUNK_SIZE:
+            self._download_sequential(url, output)
+            return
+
+        write_lock = threading.Lock()
+        local = threading.local()
+        stop = threading.Event()
+
+        def fetch_range(start: int) -> None:
+            if stop.is_set():
+                return
+            end = min(start + DOWNLOAD_CHUNK_SIZE, size) - 1
+            # requests sessions are not safe to share between threads
+            if not hasattr(local, "session"):
+                local.session = auth_requests.AuthorizedSession(self.credentials)
+            response = local.session.get(
+                url, headers={"Range": f"bytes={start}-{end}"}, timeout=300)
+            response.raise_for_status()
+            # A server or proxy that ignores Range answers 200 with the whole body
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code != 206 or not content_range.startswith(f"bytes {start}-{end}/"):
+                stop.set()
+                raise RangeNotHonoured(
+                    f"asked for bytes {start}-{end}, got {response.status_code} {content_range!r}")
+            with write_lock:
+                output.seek(start)
+                output.write(response.content)
 
-        done = False
-        while done is False:
-            _, done = downloader.next_chunk()
+        try:
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+                # list() surfaces the first failed range as an exception
+                list(pool.map(fetch_range, range(0, size, DOWNLOAD_CHUNK_SIZE)))
+        except RangeNotHonoured as e:
+            logger.warning(
+                f"Ranged download of {self.file_id} not honoured ({e}), downloading sequentially")
+            output.seek(0)
+            output.truncate()
+            self._download_sequential(url, output)
 
-        return file_content.getvalue()
+    def _download_sequential(self, url: str, output) -> None:
+        session = auth_requests.AuthorizedSession(self.credentials)
+        with session.get(url, stream=True, timeout=300) as response:
+            response.raise_for_status()
+            for block in response.iter_content(chunk_size=1024 * 1024):
+                output.write(block)
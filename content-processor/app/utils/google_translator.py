@@ -1,8 +1,11 @@
 import asyncio
-
-from deep_translator import GoogleTranslator
+import hashlib
+import os
+import threading
+from typing import List, Optional
 
 from app.utils.proxy import get_random_proxy
+from app.utils.status_tracking import TRACKER
 
 proxyIp = get_random_proxy(app='yt')
 
@@ -11,18 +14,134 @@ proxy = {
     'https': proxyIp
 }
 
+# Google's web endpoint rejects requests over 5000 characters
+TRANSLATE_BATCH_CHARS = int(os.getenv("TRANSLATE_BATCH_CHARS", "4500"))
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "4"))
+TRANSLATION_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days
+# Chunks are packed one per paragraph; the translator keeps paragraph breaks
+BATCH_SEPARATOR = "\n\n"
+
+TRANSLATE_LIMITER = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+
+# deep_translator keeps per-call state (_url_params, payload) on the
+# instance, so translators are never shared between executor threads
+_translators = threading.local()
+
 
-client = GoogleTranslator(source='auto', target='en', proxies=proxy)
+def get_translator(target: str) -> "GoogleTranslator":
+    """This thread's translator for ``target``."""
+    translators = getattr(_translators, "by_target", None)
+    if translators is None:
+        translators = _translators.by_target = {}
+    if target not in translators:
+        # Imported here so loading this module stays cheap
+        from deep_translator import GoogleTranslator
+        translators[target] = GoogleTranslator(
+            source='auto', target=target, proxies=proxy)
+    return translators[target]
 
 
-async def translate_text(text: str) -> str:
+async def translate_text(text: str, target: str = 'en') -> str:
     try:
         response = await asyncio.get_event_loop().run_in_executor(
             None,
-            lambda: client.translate(text=text)
+            lambda: get_translator(target).translate(text=text)
         )
         # print(response)
         return response
     except Exception as e:
         print(e)
         return ""
+
+
+def _cache_key(text: str, target: str) -> str:
+    return f"translation:{target}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+def get_cached_translations(texts: List[str], target: str) -> List[Optional[str]]:
+    try:
+        cached = TRACKER.redis_client.mget(
+            [_cache_key(text, target) for text in texts])
+        return [value.decode('utf-8') if isinstance(value, bytes) else value for value in cached]
+    except Exception as e:
+        print(f"Error reading translation cache: {e}")
+        return [None] * len(texts)
+
+
+def set_cached_translations(texts: List[str], translations: List[str], target: str) -> None:
+    try:
+        pipe = TRACKER.redis_client.pipeline()
+        for text, translation in zip(texts, translations):
+            if translation:
+                pipe.set(_cache_key(text, target), translation,
+                         ex=TRANSLATION_CACHE_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"Error writing translation cache: {e}")
+
+
+def pack_batches(texts: List[str], max_chars: int = TRANSLATE_BATCH_CHARS) -> List[List[int]]:
+    """Group text indices into batches whose joined length stays under max_chars."""
+    batches = []
+    current = []
+    current_chars = 0
+    for i, text in enumerate(texts):
+        size = len(text) + len(BATCH_SEPARATOR)
+        if current and current_chars + size > max_chars:
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(i)
+        current_chars += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def translate_batch(texts: List[str], target: str) -> List[str]:
+    """Translate several texts in one request, one paragraph each."""
+    async with TRANSLATE_LIMITER:
+        if len(texts) > 1:
+            # Paragraph breaks inside a text would shift the split below
+            joined = BATCH_SEPARATOR.join(
+                " ".join(text.split()) for text in texts)
+            translated = await translate_text(joined, target)
+            parts = [part.strip() for part in translated.split(BATCH_SEPARATOR)
+                     if part.strip()] if translated else []
+            if len(parts) == len(texts):
+                return parts
+            print(
+                f"Translated batch came back with {len(parts)} of {len(texts)} parts, translating one by one")
+        else:
+            return [await translate_text(texts[0], target)]
+
+    return list(await asyncio.gather(*[translate_batch([text], target) for text in texts]))
+
+
+async def translate_texts(texts: List[str], target: str = 'en') -> List[str]:
+    """
+    Translate many texts with as few requests as possible.
+
+    Texts already translated to ``target`` are served from Redis; the rest
+    are packed into size-limited batches that are translated concurrently.
+    Failed translations come back as "" like translate_text.
+    """
+    results = get_cached_translations(texts, target)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    missing_texts = [texts[i] for i in missing]
+    batches = pack_batches(missing_texts)
+    translated_batches = await asyncio.gather(
+        *[translate_batch([missing_texts[i] for i in batch], target) for batch in batches])
+
+    translations = [None] * len(missing_texts)
+    for batch, translated in zip(batches, translated_batches):
+        for i, translation in zip(batch, translated):
+            translations[i] = translation
+
+    set_cached_translations(missing_texts, translations, target)
+    for i, translation in zip(missing, translations):
+        results[i] = translation
+    return results
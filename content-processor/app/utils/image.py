@@ -1,11 +1,128 @@
+import asyncio
+import hashlib
 import io
+import json
 import os
-from typing import Dict, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional, Union
 
-import google.generativeai as genai
-import google.generativeai.types as typ
-import pytesseract
-from PIL import Image
+from cortex_shared import providers
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+
+from app.utils.app_logger_config import logger
+from app.utils.status_tracking import TRACKER
+
+genai = providers.lazy_import("google.generativeai")
+pytesseract = providers.lazy_import("pytesseract")
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+# Longest side of the derivative handed to OCR and the vision model. Phone
+# photos (~4000x3000) carry no extra signal for either beyond this size.
+MAX_IMAGE_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "2048"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+IMAGE_CACHE_TTL = 7 * 24 * 60 * 60  # 7 days
+
+_ocr_executor: Optional[Executor] = None
+
+
+@dataclass
+class PreparedImage:
+    """A decoded, size-capped image plus the facts we need about the original."""
+    image: Image.Image
+    width: int
+    height: int
+    format: str
+    # sha256 of the uploaded bytes; keys the description cache and in-batch dedupe
+    content_hash: str
+
+
+def _content_hash(source: Union[bytes, BinaryIO]) -> str:
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    for block in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def prepare_image(source: Union[bytes, BinaryIO], max_side: int = MAX_IMAGE_SIDE) -> PreparedImage:
+    """
+    Decode an image once and produce the derivative used for OCR and vision.
+    ``source`` is the image bytes or a seekable file holding them.
+
+    JPEGs are decoded directly at a reduced scale via ``Image.draft``, so a
+    12 MP photo never gets fully materialised in memory.
+    """
+    content_hash = _content_hash(source)
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    width, height = image.size
+    image_format = image.format or ""
+
+    image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    return PreparedImage(
+        image=image,
+        width=width,
+        height=height,
+        format=image_format,
+        content_hash=content_hash,
+    )
+
+
+def _get_ocr_executor() -> Executor:
+    global _ocr_executor
+    if _ocr_executor is None:
+        try:
+            _ocr_executor = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+        except (OSError, NotImplementedError) as e:
+            # Lambda has no /dev/shm, so multiprocessing primitives are
+            # unavailable. tesseract runs as a subprocess anyway, so threads
+            # still keep the event loop free.
+            logger.warning(f"Process pool unavailable for OCR, using threads: {e}")
+            _ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS)
+    return _ocr_executor
+
+
+async def extract_text(image: Image.Image) -> str:
+    """Run tesseract OCR on the image without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_ocr_executor(), pytesseract.image_to_string, image)
+
+
+def _cache_key(user_id: str, content_hash: str, title: Optional[str], user_description: Optional[str]) -> str:
+    """
+    Descriptions are private to the uploader and depend on the prompt, so the
+    key covers the user, the exact image bytes and the title/description.
+    """
+    prompt_hash = hashlib.sha256(
+        f"{title or ''}\0{user_description or ''}".encode()).hexdigest()
+    return f"image_desc:{user_id}:{content_hash}:{prompt_hash}"
+
+
+def get_cached_description(key: str) -> Optional[Dict]:
+    try:
+        data = TRACKER.redis_client.get(key)
+        return json.loads(data) if data else None
+    except Exception as e:
+        logger.error(f"Error reading image description cache: {e}")
+        return None
+
+
+def set_cached_description(key: str, result: Dict) -> None:
+    try:
+        TRACKER.redis_client.set(key, json.dumps(result), ex=IMAGE_CACHE_TTL)
+    except Exception as e:
+        logger.error(f"Error writing image description cache: {e}")
 
 
 class ImageDescriptionGenerator:
@@ -24,40 +141,50 @@ class ImageDescriptionGenerator:
             tools=[self.get_description_function]
         )
 
-    def generate_description(
+    async def generate_description(
         self,
-        image_bytes: bytes,
+        prepared: PreparedImage,
         title: Optional[str] = None,
-        user_description: Optional[str] = None
+        user_description: Optional[str] = None,
+        user_id: Optional[str] = None
     ) -> Dict:
         """
         Generate a comprehensive description of the image.
 
+        OCR and the vision call run concurrently on the size-capped derivative.
+        Results are cached per user, image bytes and prompt inputs, so a user
+        re-uploading the same image is free.
+
         Args:
-            image_bytes: Raw image data
+            prepared: Image returned by ``prepare_image``
             title: Optional image title
             user_description: Optional user-provided description
+            user_id: Owner of the image; without it nothing is cached
 
         Returns:
             Dictionary containing the structured description and metadata
         """
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_bytes))
+            cache_key = _cache_key(
+                user_id, prepared.content_hash, title, user_description) if user_id else None
+            if cache_key:
+                cached = get_cached_description(cache_key)
+                if cached is not None:
+                    return cached
 
-            # Extract text from image
-            extracted_text = pytesseract.image_to_string(image)
-
-            # Generate description using function calling
-            prompt = self._build_description_prompt(
-                title, user_description, extracted_text)
-            response = self.model.generate_content(
-                [prompt, image],
+            prompt = self._build_description_prompt(title, user_description)
+            extracted_text, response = await asyncio.gather(
+                extract_text(prepared.image),
+                self.model.generate_content_async([prompt, prepared.image]),
             )
 
             # Extract structured data from function call
             function_call = response.candidates[0].content.parts[0].function_call
-            structured_description = dict(function_call.args)
+            # Proto repeated fields are converted to lists so the result can be cached
+            structured_description = {
+                key: value if isinstance(value, str) else list(value)
+                for key, value in function_call.args.items()
+            }
 
             # Create vectorizable description
             vectorizable = self._create_vectorizable_description(
@@ -65,15 +192,18 @@ class ImageDescriptionGenerator:
                 structured_description
             )
 
-            return {
+            result = {
                 "success": True,
                 "extracted_text": extracted_text,
                 "structured_description": structured_description,
                 "vectorizable_description": vectorizable
             }
+            if cache_key:
+                set_cached_description(cache_key, result)
+            return result
 
         except Exception as e:
-            print(f"Error processing image: {str(e)}")
+            logger.error(f"Error processing image: {str(e)}")
             return {
                 "success": False,
                 "error": str(e)
@@ -82,8 +212,7 @@ class ImageDescriptionGenerator:
     def _build_description_prompt(
         self,
         title: Optional[str],
-        user_description: Optional[str],
-        extracted_text: str
+        user_description: Optional[str]
     ) -> str:
         """Build a detailed prompt for the description generation."""
         prompt = """
@@ -122,8 +251,6 @@ class ImageDescriptionGenerator:
             prompt += f"\nTitle: {title}"
         if user_description:
             prompt += f"\nUser Description: {user_description}"
-        if extracted_text.strip():
-            prompt += f"\nExtracted Text:\n{extracted_text}"
 
         prompt += """
         
@@ -166,7 +293,7 @@ class ImageDescriptionGenerator:
         return "\n".join([c for c in components if c.strip()])
 
     @property
-    def get_description_function(self) -> genai.types.Tool:
+    def get_description_function(self) -> "genai.types.Tool":
         return genai.types.Tool(
             function_declarations=[{
                 "name": "ImageDescription",
@@ -11,7 +11,7 @@ proxies = [
 
 def get_random_proxy(app='yt', index=0):
     if app == 'yt':
-        return proxies[0]
+        return proxies[index % len(proxies)]
     if index < len(proxies):
         return proxies[index]
     return random.choice(proxies)
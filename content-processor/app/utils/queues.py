@@ -0,0 +1,35 @@
+"""
+The Redis that carries the ingestion queues (REDIS_ADDR, as for the Go
+consumer), and producing messages in the Go consumer's format:
+``{"task": {"type", "data", "retries"}, ...}``.
+"""
+import json
+import os
+from typing import Any, Optional
+
+import redis
+from dotenv import load_dotenv
+
+if os.path.exists('.env'):
+    load_dotenv()
+
+# Same variable as the Go consumer, e.g. redis://localhost:6379
+QUEUE_REDIS_URL = os.getenv("REDIS_ADDR", "redis://localhost:6379")
+
+_queue_client: Optional[redis.Redis] = None
+
+
+def get_queue_client() -> redis.Redis:
+    global _queue_client
+    if _queue_client is None:
+        _queue_client = redis.Redis.from_url(
+            QUEUE_REDIS_URL, decode_responses=True)
+    return _queue_client
+
+
+def task_message(task_type: str, data: Any, **extra: Any) -> str:
+    return json.dumps({"task": {"type": task_type, "data": data, "retries": 0}, **extra})
+
+
+def enqueue(queue: str, task_type: str, data: Any, **extra: Any) -> None:
+    get_queue_client().lpush(queue, task_message(task_type, data, **extra))
@@ -1,6 +1,6 @@
 import os
 
-import boto3
+from cortex_shared import providers
 from dotenv import load_dotenv
 
 if (os.path.exists('.env')):
@@ -11,15 +11,21 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_S3_cortex_cache_manager_secret_key")
 AWS_REGION_NAME = os.getenv("AWS_S3_bucket_region")
 AWS_BUCKET_NAME = os.getenv("AWS_S3_bucket_name")
 
-# Create a session using your credentials
-session = boto3.Session(
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION_NAME
-)
 
-# Create an S3 client
-s3 = session.client('s3')
+def _s3_client():
+    import boto3
+
+    # Create a session using your credentials
+    session = boto3.Session(
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION_NAME
+    )
+    return session.client('s3')
+
+
+# Create an S3 client on first use
+s3 = providers.register("s3", _s3_client)
 
 
 class S3Operations():
@@ -36,6 +42,13 @@ class S3Operations():
         object_keys = [obj['Key'] for obj in response.get('Contents', [])]
         return object_keys
 
+    def list_objects(self, prefix: str, bucket_name=AWS_BUCKET_NAME) -> list[dict]:
+        paginator = s3.get_paginator('list_objects_v2')
+        objects = []
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            objects.extend(page.get('Contents', []))
+        return objects
+
     def get_object(self, object_key: str, bucket_name=AWS_BUCKET_NAME) -> dict:
         try:
             response = s3.get_object(Bucket=bucket_name, Key=object_key)
@@ -46,9 +59,15 @@ class S3Operations():
         except Exception as e:
             raise RuntimeError(f"Error retrieving object from S3: {str(e)}")
 
+    def head_object(self, object_key: str, bucket_name=AWS_BUCKET_NAME) -> dict:
+        return s3.head_object(Bucket=bucket_name, Key=object_key)
+
     def upload_object(self, object_key: str, file_path: str, bucket_name=AWS_BUCKET_NAME) -> None:
         s3.upload_file(file_path, bucket_name, object_key)
 
+    def put_object(self, object_key: str, body: bytes, bucket_name=AWS_BUCKET_NAME, **kwargs) -> dict:
+        return s3.put_object(Bucket=bucket_name, Key=object_key, Body=body, **kwargs)
+
     def download_object(self, object_key: str, bucket_name=AWS_BUCKET_NAME) -> bytes:
         response = s3.get_object(Bucket=bucket_name, Key=object_key)
         return response['Body'].read()
@@ -15,6 +15,8 @@ class ProcessingStatus(Enum):
     CONTEXTUALIZING = "CONTEXTUALIZING"
     CREATING_EMBEDDINGS = "CREATING_EMBEDDINGS"
     STORING_VECTORS = "STORING_VECTORS"
+    # Searchable on raw-chunk embeddings; contextualized vectors still pending
+    SEARCHABLE = "SEARCHABLE"
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
 
@@ -84,6 +86,36 @@ class StatusTracker:
             ttl = 10 * 60
         self.redis_client.set(key, json.dumps(current_data), ex=ttl)
 
+    def update_phase(
+        self,
+        user_id: str,
+        document_id: str,
+        phase: str,
+        status: ProcessingStatus,
+        progress: Optional[float] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Record the state of one ingestion phase ("fast" or "enrichment")
+        under ``phases`` without touching the document's overall status.
+        """
+        key = self._get_key(user_id, document_id)
+        data = self.redis_client.get(key)
+        if data is None:
+            return
+        current_data = json.loads(data)
+
+        phase_data = current_data.setdefault("phases", {}).setdefault(phase, {})
+        phase_data["status"] = status.value
+        if progress is not None:
+            phase_data["progress"] = progress
+        if error is not None:
+            phase_data["error"] = error
+        current_data["last_updated"] = datetime.utcnow().isoformat()
+
+        # Keep the status around while the background phase is running
+        self.redis_client.set(key, json.dumps(current_data), ex=60 * 60)
+
     def get_status(self, user_id: str, document_id: str) -> Dict:
         """Get current status of a document"""
         key = self._get_key(user_id, document_id)
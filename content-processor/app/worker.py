@@ -0,0 +1,51 @@
+import asyncio
+import signal
+
+from .core.jina_ai import Client as jina_client
+from .prisma import prisma
+from .services.CheckpointService import run_checkpoint_cleanup
+from .services.EnrichmentService import ENRICHMENT_CONCURRENCY, ENRICHMENT_QUEUE
+from .services.JobService import JOBS_QUEUE, run_job_recovery
+from .services.MemoryService import check_search_vector_schema
+from .services.QueueConsumer import (HIGH_PRIORITY_QUEUE, JOB_HANDLERS,
+                                     LOW_PRIORITY_QUEUE, QueueConsumer,
+                                     heavy_queue)
+from .utils.app_logger_config import logger
+
+
+async def main():
+    await prisma.prisma.connect()
+    await check_search_vector_schema()
+    cleanup_task = asyncio.create_task(run_checkpoint_cleanup())
+    recovery_task = asyncio.create_task(run_job_recovery())
+    consumers = [
+        QueueConsumer(divert_heavy=True),
+        QueueConsumer(queues=(JOBS_QUEUE,), handlers=JOB_HANDLERS,
+                      divert_heavy=True),
+        # Heavy tasks wait for admission in slots of their own
+        QueueConsumer(queues=(heavy_queue(HIGH_PRIORITY_QUEUE),
+                              heavy_queue(LOW_PRIORITY_QUEUE))),
+        QueueConsumer(queues=(heavy_queue(JOBS_QUEUE),),
+                      handlers=JOB_HANDLERS),
+        # Enrichment has its own slots so it never holds up ingestion
+        QueueConsumer(queues=(ENRICHMENT_QUEUE,),
+                      concurrency=ENRICHMENT_CONCURRENCY),
+    ]
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        for consumer in consumers:
+            loop.add_signal_handler(sig, consumer.stop)
+
+    try:
+        await asyncio.gather(*(consumer.run() for consumer in consumers))
+    finally:
+        logger.info("Queue consumer stopped")
+        cleanup_task.cancel()
+        recovery_task.cancel()
+        await jina_client.close_session()
+        await prisma.prisma.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,7 +4,10 @@ set -e
 mkdir -p /app/.prisma/binaries
 mkdir -p /app/.prisma/cache
 
-if [ -z "${AWS_LAMBDA_RUNTIME_API}" ]; then
+if [ "${WORKER_MODE}" = "queue" ]; then
+    # Consume the ingestion queues in-process instead of serving HTTP
+    exec python -m app.worker
+elif [ -z "${AWS_LAMBDA_RUNTIME_API}" ]; then
     # If not in Lambda environment, run local server
     exec uvicorn app.main:app --host 0.0.0.0 --port 8080
 else
@@ -0,0 +1,144 @@
+"""
+Shared test setup. Tests never talk to Postgres: ``app.prisma.prisma`` is
+replaced by an in-memory client before any app module imports it, so the
+suite also runs without ``prisma generate``, and the raw-SQL search vector
+helpers in MemoryService are pointed at a dict. Test dependencies are in
+requirements-test.txt.
+"""
+import sys
+import types
+from typing import Any, Dict, List
+
+import pytest
+
+
+class Row:
+    """A stored record; fields a test never set read as None, like nullable columns."""
+
+    def __init__(self, **fields: Any):
+        self.__dict__.update(fields)
+
+    def __getattr__(self, name: str) -> Any:
+        return None
+
+
+def _matches(row: Row, where: Dict[str, Any]) -> bool:
+    for key, condition in where.items():
+        if isinstance(condition, dict) and "in" in condition:
+            if getattr(row, key) not in condition["in"]:
+                return False
+        elif isinstance(condition, dict):
+            # Compound unique key such as userId_fileId
+            if not _matches(row, condition):
+                return False
+        elif getattr(row, key) != condition:
+            return False
+    return True
+
+
+class FakeTable:
+    def __init__(self):
+        self.rows: List[Row] = []
+
+    async def find_many(self, where: Dict[str, Any] = None, order=None) -> List[Row]:
+        rows = [row for row in self.rows if _matches(row, where or {})]
+        for rule in reversed(order or []):
+            [(key, direction)] = rule.items()
+            rows.sort(key=lambda row: (getattr(row, key) is None, getattr(row, key) or 0),
+                      reverse=direction == "desc")
+        return rows
+
+    async def find_first(self, where: Dict[str, Any] = None) -> Row:
+        rows = await self.find_many(where)
+        return rows[0] if rows else None
+
+    async def create(self, data: Dict[str, Any]) -> Row:
+        row = Row(**data)
+        self.rows.append(row)
+        return row
+
+    async def create_many(self, data: List[Dict[str, Any]], skip_duplicates: bool = False) -> int:
+        for fields in data:
+            await self.create(fields)
+        return len(data)
+
+    async def update(self, where: Dict[str, Any], data: Dict[str, Any]) -> Row:
+        row = await self.find_first(where)
+        if row is not None:
+            row.__dict__.update(data)
+        return row
+
+    async def update_many(self, where: Dict[str, Any], data: Dict[str, Any]) -> int:
+        rows = await self.find_many(where)
+        for row in rows:
+            row.__dict__.update(data)
+        return len(rows)
+
+    async def delete_many(self, where: Dict[str, Any] = None) -> int:
+        keep = [row for row in self.rows if not _matches(row, where or {})]
+        deleted = len(self.rows) - len(keep)
+        self.rows = keep
+        return deleted
+
+
+class FakePrisma:
+    def __init__(self):
+        self.memory = FakeTable()
+        self.connectedgdrivefiles = FakeTable()
+
+    async def connect(self) -> None:
+        pass
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def query_raw(self, query: str, *args: Any):
+        raise NotImplementedError("Raw SQL is not available in tests")
+
+
+_prisma_module = types.ModuleType("app.prisma.prisma")
+_prisma_module.prisma = FakePrisma()
+sys.modules["app.prisma.prisma"] = _prisma_module
+
+
+@pytest.fixture
+def db(monkeypatch) -> FakePrisma:
+    """A fresh in-memory database, with search vectors kept in ``db.search_vectors``."""
+    from app.services import MemoryService
+
+    fake = FakePrisma()
+    fake.search_vectors = {}
+    monkeypatch.setattr(_prisma_module, "prisma", fake)
+    for module in list(sys.modules.values()):
+        # Modules that did ``from app.prisma.prisma import prisma``
+        if getattr(module, "__name__", "").startswith("app.") and \
+                isinstance(getattr(module, "prisma", None), FakePrisma):
+            monkeypatch.setattr(module, "prisma", fake)
+
+    async def update_search_vectors(user_ids, mem_ids, chunk_ids, mem_data):
+        for key, text in zip(zip(user_ids, mem_ids, chunk_ids), mem_data):
+            fake.search_vectors[key] = text
+
+    async def delete_search_vectors(user_id, mem_id, chunk_ids):
+        for chunk_id in chunk_ids:
+            fake.search_vectors.pop((user_id, mem_id, chunk_id), None)
+
+    async def get_search_vectors(user_id, mem_id, chunk_ids):
+        return {chunk_id: fake.search_vectors[(user_id, mem_id, chunk_id)]
+                for chunk_id in chunk_ids if (user_id, mem_id, chunk_id) in fake.search_vectors}
+
+    async def set_search_vectors(user_id, mem_id, search_vectors):
+        for chunk_id, vector in search_vectors.items():
+            fake.search_vectors[(user_id, mem_id, chunk_id)] = vector
+
+    fakes = {function.__name__: function for function in (
+        update_search_vectors, delete_search_vectors, get_search_vectors, set_search_vectors)}
+    originals = {name: getattr(MemoryService, name) for name in fakes}
+    for module in list(sys.modules.values()):
+        # MemoryService itself and modules that imported these helpers by name
+        if not getattr(module, "__name__", "").startswith("app."):
+            continue
+        for name, function in fakes.items():
+            if getattr(module, name, None) is originals[name]:
+                monkeypatch.setattr(module, name, function)
+    return fake
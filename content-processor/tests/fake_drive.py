@@ -0,0 +1,167 @@
+"""
+In-memory stand-in for the parts of the Drive v3 and Docs v1 APIs used by
+GDriveProcessor, so incremental sync can be exercised without Google
+credentials:
+
+    drive = FakeDriveService()
+    drive.add_file("doc-1", "Notes", GDriveFileType.GDOC.value, text="...")
+    processor = GDriveProcessor("doc-1", "token", service_factory=drive.build)
+
+Page tokens are positions in the fake change log, like Drive's own
+monotonically increasing tokens. ``expire_page_tokens`` makes every token
+handed out so far stale, and errors carry ``resp.status`` like
+googleapiclient's HttpError.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from app.schemas.Metadata import GDriveFileType
+
+GOOGLE_NATIVE_TYPES = (
+    GDriveFileType.GDOC.value,
+    GDriveFileType.GSHEET.value,
+    GDriveFileType.GSLIDE.value,
+)
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.resp = SimpleNamespace(status=status)
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self, num_retries: int = 0):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeFiles:
+    def __init__(self, drive: "FakeDriveService"):
+        self.drive = drive
+
+    def get(self, fileId: str, fields: Optional[str] = None) -> FakeRequest:
+        file = self.drive.files_by_id.get(fileId)
+        if file is None:
+            return FakeRequest(FakeHttpError(404, f"File not found: {fileId}"))
+        # Trashed files can still be read, with trashed set
+        return FakeRequest({k: v for k, v in file.items() if k != "text"})
+
+    def list(self, q: str = "", fields: Optional[str] = None, pageSize: int = 100, pageToken: Optional[str] = None) -> FakeRequest:
+        files = [
+            {"id": file["id"], "name": file["name"], "mimeType": file["mimeType"]}
+            for file in self.drive.files_by_id.values()
+            if not file.get("trashed") and (not file["parents"] or f"'{file['parents'][0]}' in parents" in q)
+        ]
+        return FakeRequest({"files": files})
+
+
+class FakeChanges:
+    def __init__(self, drive: "FakeDriveService"):
+        self.drive = drive
+
+    def getStartPageToken(self) -> FakeRequest:
+        return FakeRequest({"startPageToken": str(len(self.drive.change_log))})
+
+    def list(self, pageToken: str, fields: Optional[str] = None, pageSize: int = 100) -> FakeRequest:
+        start = int(pageToken)
+        if start < self.drive.oldest_page_token:
+            return FakeRequest(FakeHttpError(404, f"Invalid page token: {pageToken}"))
+        end = min(start + pageSize, len(self.drive.change_log))
+        response = {"changes": self.drive.change_log[start:end]}
+        if end < len(self.drive.change_log):
+            response["nextPageToken"] = str(end)
+        else:
+            response["newStartPageToken"] = str(end)
+        return FakeRequest(response)
+
+
+class FakeDocuments:
+    def __init__(self, drive: "FakeDriveService"):
+        self.drive = drive
+
+    def get(self, documentId: str) -> FakeRequest:
+        file = self.drive.files_by_id.get(documentId)
+        if file is None:
+            return FakeRequest(FakeHttpError(404, f"Document not found: {documentId}"))
+        paragraphs = [
+            {"paragraph": {"elements": [{"textRun": {"content": line}}]}}
+            for line in file["text"].split("\n")
+        ]
+        return FakeRequest({"body": {"content": paragraphs}})
+
+
+class FakeDriveService:
+    def __init__(self):
+        self.files_by_id: Dict[str, dict] = {}
+        self.change_log: List[dict] = []
+        self.oldest_page_token = 0
+        self.clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.calls: List[str] = []
+
+    def build(self, service_name: str, version: str, credentials=None) -> "FakeDriveService":
+        """Drop-in replacement for drive_content_extractor.build_service."""
+        self.calls.append(service_name)
+        return self
+
+    def files(self) -> FakeFiles:
+        return FakeFiles(self)
+
+    def changes(self) -> FakeChanges:
+        return FakeChanges(self)
+
+    def documents(self) -> FakeDocuments:
+        return FakeDocuments(self)
+
+    def _touch(self, file: dict) -> None:
+        self.clock += timedelta(seconds=1)
+        file["modifiedTime"] = self.clock.isoformat().replace("+00:00", "Z")
+        # Drive only reports checksums for binary content
+        if file["mimeType"] not in GOOGLE_NATIVE_TYPES:
+            file["md5Checksum"] = hashlib.md5(file["text"].encode("utf-8")).hexdigest()
+            file["size"] = str(len(file["text"].encode("utf-8")))
+        self.change_log.append({"fileId": file["id"], "removed": False, "file": {"trashed": False}})
+
+    def add_file(self, file_id: str, name: str, mime_type: str, text: str = "", parent: Optional[str] = None) -> dict:
+        file = {
+            "id": file_id,
+            "name": name,
+            "mimeType": mime_type,
+            "text": text,
+            "parents": [parent] if parent else [],
+            "trashed": False,
+        }
+        self.files_by_id[file_id] = file
+        self._touch(file)
+        return file
+
+    def update_file(self, file_id: str, text: str) -> dict:
+        file = self.files_by_id[file_id]
+        file["text"] = text
+        self._touch(file)
+        return file
+
+    def move_file(self, file_id: str, parent: str) -> dict:
+        """A metadata-only change: logged, but content and checksum stay the same."""
+        file = self.files_by_id[file_id]
+        file["parents"] = [parent]
+        self.change_log.append({"fileId": file_id, "removed": False, "file": {"trashed": False}})
+        return file
+
+    def trash_file(self, file_id: str) -> None:
+        self.files_by_id[file_id]["trashed"] = True
+        self.change_log.append({"fileId": file_id, "removed": False, "file": {"trashed": True}})
+
+    def remove_file(self, file_id: str) -> None:
+        """Delete for good; files.get then answers 404."""
+        del self.files_by_id[file_id]
+        self.change_log.append({"fileId": file_id, "removed": True})
+
+    def expire_page_tokens(self) -> None:
+        self.oldest_page_token = len(self.change_log)
@@ -0,0 +1,16 @@
+"""
+URL normalization behind the web artifact cache keys.
+
+Run from content-processor/: python -m pytest tests
+"""
+from app.services.ArtifactService import normalize_url
+
+
+def test_normalize_url_drops_tracking_params():
+    url = "https://WWW.Example.com/post/?utm_source=x&UTM_Medium=y&fbclid=1&gclid=2&ref=hn&si=3&b=2&a=1#top"
+    assert normalize_url(url) == "https://example.com/post?a=1&b=2"
+
+
+def test_normalize_url_keeps_params_that_only_share_a_prefix():
+    url = "https://example.com/img?size=large&sid=42&reference=doc&gclid_x=1&refresh=1"
+    assert normalize_url(url) == "https://example.com/img?gclid_x=1&reference=doc&refresh=1&sid=42&size=large"
@@ -0,0 +1,244 @@
+"""
+Incremental Drive sync against the fake Drive API in fake_drive.py, injected
+through the ``service_factory`` parameter, and the in-memory database from
+conftest.py. Segmentation, contextualization, embedding and Pinecone are
+replaced by deterministic stand-ins.
+
+Run from content-processor/: python -m pytest tests
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.schemas.Metadata import GDriveFileType, GDriveSpecificMd, Metadata
+from app.services import ChunkSyncService, GDriveSyncService
+from app.services.ChunkSyncService import diff_chunks, hash_chunk
+from app.services.GDriveSyncService import sync_user_drive_files
+
+from fake_drive import FakeDriveService
+
+USER = "u1"
+MEM = "m1"
+
+
+class FakePinecone:
+    def __init__(self):
+        self.vectors = {}
+
+    def fetch(self, ids):
+        return SimpleNamespace(vectors={
+            id: SimpleNamespace(values=self.vectors[id]) for id in ids if id in self.vectors})
+
+    def upsert(self, vectors, batch_size=100):
+        for vector in vectors:
+            self.vectors[vector["id"]] = vector["values"]
+
+    def delete(self, ids):
+        for id in ids:
+            self.vectors.pop(id, None)
+
+
+@pytest.fixture
+def services(db, monkeypatch):
+    pinecone = FakePinecone()
+    embedded = []
+
+    async def segment_data(text):
+        return [line for line in text.split("\n") if line.strip()]
+
+    async def update_chunks(chunks, userId, memoryId, track_status=True):
+        return [f"context: {chunk}" for chunk in chunks]
+
+    async def embed(documents, is_code=False):
+        embedded.extend(documents)
+        return [[float(len(document))] for document in documents]
+
+    monkeypatch.setattr(GDriveSyncService.use_jina, "segment_data", segment_data)
+    monkeypatch.setattr(ChunkSyncService, "update_chunks", update_chunks)
+    monkeypatch.setattr(ChunkSyncService.voyage_client, "embed", embed)
+    monkeypatch.setattr(ChunkSyncService, "PineconeClient", lambda: pinecone)
+    return SimpleNamespace(db=db, pinecone=pinecone, embedded=embedded)
+
+
+def metadata() -> Metadata[GDriveSpecificMd]:
+    return Metadata[GDriveSpecificMd](
+        user_id=USER, memId="", title="Notes", description="d", created_at="c",
+        last_updated="l", tags=[], source="drive", type="drive",
+        specific_desc=GDriveSpecificMd(chunk_id="", file_id="doc-1", page_number=None, sheet_name=None))
+
+
+async def connect_doc(services, drive: FakeDriveService, text: str) -> None:
+    """A Google Doc already ingested as MEM and connected for sync."""
+    file = drive.add_file("doc-1", "Notes", GDriveFileType.GDOC.value, text=text)
+    md = metadata()
+    md.memId = MEM
+    chunks = [line for line in text.split("\n") if line.strip()]
+    await ChunkSyncService.sync_memory_chunks(
+        md, chunks, GDriveSpecificMd,
+        lambda i: {"chunk_id": f"{MEM}_{i}", "file_id": "doc-1", "page_number": i, "sheet_name": None},
+        "drive")
+    await services.db.connectedgdrivefiles.create({
+        "userId": USER, "fileId": "doc-1", "name": "Notes", "memId": MEM,
+        "state": "connected", "modifiedTime": file["modifiedTime"], "md5Checksum": None,
+    })
+    services.embedded.clear()
+
+
+def sync(drive: FakeDriveService):
+    return asyncio.run(sync_user_drive_files("token", metadata(), service_factory=drive.build))
+
+
+async def stored_chunks(db):
+    rows = await db.memory.find_many(where={"memId": MEM}, order=[{"chunkIndex": "asc"}])
+    return [row.memData for row in rows]
+
+
+def test_diff_chunks_unchanged_moved_changed_stale():
+    old = {i: hash_chunk(text) for i, text in enumerate(["a", "b", "c", "d"])}
+    diff = diff_chunks(old, ["b", "a", "x"])
+    assert diff.unchanged == []
+    assert diff.moved == {0: 1, 1: 0}
+    assert diff.changed == [2]
+    assert diff.stale == [3]
+
+
+def test_untouched_file_is_skipped(services):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha\nbeta"))
+
+    first = sync(drive)
+    assert [result.status for result in first.results] == ["unchanged"]
+    assert first.page_token is not None
+
+    calls = len(drive.calls)
+    second = sync(drive)
+    assert [result.status for result in second.results] == ["unchanged"]
+    # Nothing in the change log, so no per-file client was built
+    assert len(drive.calls) == calls + 1
+    assert services.embedded == []
+
+
+def test_edited_doc_reembeds_only_edited_chunks(services):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha\nbeta\ngamma"))
+    sync(drive)
+
+    drive.update_file("doc-1", "alpha\nBETA\ngamma")
+    [result] = sync(drive).results
+
+    assert result.status == "updated"
+    assert (result.unchanged_chunks, result.reembedded_chunks, result.deleted_chunks) == (2, 1, 0)
+    assert services.embedded == ["Notes d context: BETA"]
+    assert asyncio.run(stored_chunks(services.db)) == ["alpha", "BETA", "gamma"]
+
+
+def test_moved_chunks_keep_embedding_and_contextualized_search_text(services):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha\nbeta\ngamma"))
+    sync(drive)
+    before = dict(services.db.search_vectors)
+
+    drive.update_file("doc-1", "gamma\nalpha\nbeta")
+    [result] = sync(drive).results
+
+    assert (result.unchanged_chunks, result.reembedded_chunks) == (3, 0)
+    assert services.embedded == []
+    assert asyncio.run(stored_chunks(services.db)) == ["gamma", "alpha", "beta"]
+    # Search text moves with the chunk instead of falling back to the raw text
+    assert services.db.search_vectors[(USER, MEM, f"{MEM}_0")] == before[(USER, MEM, f"{MEM}_2")]
+    assert services.db.search_vectors[(USER, MEM, f"{MEM}_0")] == "Notes d context: gamma"
+
+
+def test_shortened_doc_deletes_stale_chunks(services):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha\nbeta\ngamma"))
+    sync(drive)
+
+    drive.update_file("doc-1", "alpha")
+    [result] = sync(drive).results
+
+    assert result.deleted_chunks == 2
+    assert asyncio.run(stored_chunks(services.db)) == ["alpha"]
+    assert set(services.pinecone.vectors) == {f"{MEM}_{MEM}_0"}
+
+
+def test_moved_file_without_content_change_is_unchanged(services):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha"))
+    sync(drive)
+
+    drive.move_file("doc-1", "folder-2")
+    [result] = sync(drive).results
+
+    assert result.status == "unchanged"
+    assert services.embedded == []
+
+
+@pytest.mark.parametrize("remove", ["trash_file", "remove_file"])
+def test_trashed_or_removed_file_drops_its_memory(services, remove):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha\nbeta"))
+    sync(drive)
+
+    getattr(drive, remove)("doc-1")
+    [result] = sync(drive).results
+
+    assert result.status == "removed"
+    assert asyncio.run(stored_chunks(services.db)) == []
+    assert services.pinecone.vectors == {}
+    [row] = services.db.connectedgdrivefiles.rows
+    assert (row.state, row.memId) == ("removed", None)
+
+
+def test_stale_page_token_falls_back_to_checking_every_file(services):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha\nbeta"))
+    first = sync(drive)
+
+    drive.update_file("doc-1", "alpha\nbeta\ngamma")
+    drive.expire_page_tokens()
+    response = sync(drive)
+
+    [result] = response.results
+    assert result.status == "updated"
+    assert result.reembedded_chunks == 1
+    # A fresh token replaces the stale one
+    assert int(response.page_token) > int(first.page_token)
+    [row] = services.db.connectedgdrivefiles.rows
+    assert row.changesPageToken == response.page_token
+
+
+def test_stale_page_token_with_deleted_file(services):
+    drive = FakeDriveService()
+    asyncio.run(connect_doc(services, drive, "alpha"))
+    sync(drive)
+
+    drive.remove_file("doc-1")
+    drive.expire_page_tokens()
+    [result] = sync(drive).results
+
+    assert result.status == "removed"
+
+
+def test_windowed_mem_types_are_stored_windowed(services, monkeypatch):
+    from app.utils import Vectors
+    monkeypatch.setattr(Vectors, "MEMORY_STORAGE_MODE", "windowed")
+    md = metadata()
+    md.memId = MEM
+
+    def build_specific_md(i):
+        return {"chunk_id": f"{MEM}_{i}", "file_id": "doc-1", "page_number": i, "sheet_name": None}
+
+    async def scenario():
+        await ChunkSyncService.sync_memory_chunks(md, ["a", "b", "c"], GDriveSpecificMd, build_specific_md, "note")
+        before = dict(services.db.search_vectors)
+        diff = await ChunkSyncService.sync_memory_chunks(
+            md, ["a", "B", "c"], GDriveSpecificMd, build_specific_md, "note")
+        assert diff.unchanged == [0, 2] and diff.changed == [1]
+        assert await stored_chunks(services.db) == Vectors.combine_chunk_windows(["a", "B", "c"])
+        # Neighbours only get their window refreshed; their search text stays
+        for index in (0, 2):
+            key = (USER, MEM, f"{MEM}_{index}")
+            assert services.db.search_vectors[key] == before[key]
+    asyncio.run(scenario())
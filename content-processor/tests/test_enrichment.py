@@ -0,0 +1,92 @@
+"""
+Two-phase ingestion of public sources: the fast phase stores raw-chunk
+vectors and the queued enrichment builds the shared source artifact.
+
+Run from content-processor/: python -m pytest tests
+"""
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.core.agents import LinkAgents
+from app.core.agents.LinkAgents import WebAgent
+from app.schemas.Metadata import Metadata, TextSpecificMd
+from app.services import EnrichmentService
+from app.utils.chunk_metadata import ChunkMetadata
+from app.utils.status_tracking import TRACKER
+
+MEM = "m1"
+
+
+class FakePinecone:
+    def __init__(self, upserts):
+        self.upserts = upserts
+
+    def upsert(self, vectors, batch_size=100):
+        self.upserts.append(vectors)
+
+
+@pytest.fixture
+def enrichment(monkeypatch):
+    upserts, saved, queued, embedded = [], [], [], []
+
+    async def update_chunks(chunks, userId, memoryId, track_status=True):
+        return [f"context: {chunk}" for chunk in chunks]
+
+    async def embed(documents, is_code=False):
+        embedded.append(documents)
+        return [[float(len(document))] for document in documents]
+
+    async def build_artifact(*args, **kwargs):
+        raise AssertionError("the fast phase must not contextualize")
+
+    for module in (EnrichmentService, LinkAgents):
+        monkeypatch.setattr(module, "PineconeClient", lambda: FakePinecone(upserts))
+    monkeypatch.setattr(EnrichmentService, "update_chunks", update_chunks)
+    monkeypatch.setattr(EnrichmentService.voyage_client, "embed", embed)
+    monkeypatch.setattr(EnrichmentService, "save_artifact", saved.append)
+    monkeypatch.setattr(EnrichmentService, "enqueue", lambda queue, task, data: queued.append(data))
+    monkeypatch.setattr(LinkAgents, "TWO_PHASE_INGESTION", True)
+    monkeypatch.setattr(WebAgent, "build_artifact", build_artifact)
+    monkeypatch.setattr(TRACKER, "redis_client", fakeredis.FakeRedis(decode_responses=True))
+    TRACKER.create_status("u1", MEM, "My title")
+    return upserts, saved, queued, embedded
+
+
+def web_agent() -> WebAgent:
+    md = Metadata[TextSpecificMd](
+        user_id="u1", memId=MEM, title="My title", description="my description", created_at="c",
+        last_updated="l", tags=[], source="web", type="web",
+        specific_desc=TextSpecificMd(chunk_id="", url="https://example.com/post"))
+    return WebAgent("https://example.com/post", md)
+
+
+def test_uncached_web_page_is_searchable_first_and_enriched_later(enrichment):
+    upserts, saved, queued, embedded = enrichment
+    agent = web_agent()
+    meta_chunks = ChunkMetadata(agent.md, TextSpecificMd)
+    for i in range(2):
+        meta_chunks.append(chunk_id=f"{MEM}_{i}", url="https://example.com/post")
+
+    async def ingest():
+        await agent.store_source_vectors(None, "web/key", ["a", "bb"], meta_chunks, "Post", "About")
+        agent.start_enrichment()
+    asyncio.run(ingest())
+
+    # Fast phase: raw chunks under the user's title, nothing cached yet
+    assert embedded == [["My title my description a", "My title my description bb"]]
+    assert saved == []
+    [task] = queued
+    assert task["artifact"]["key"] == "web/key"
+
+    asyncio.run(EnrichmentService.run_enrichment(task))
+
+    [artifact] = saved
+    assert artifact.key == "web/key"
+    assert artifact.contextualized == ["context: a", "context: bb"]
+    # Same embedding text as LinkAgent.build_artifact, so the cache is valid for anyone
+    assert embedded[-1] == ["Post About context: a", "Post About context: bb"]
+    assert artifact.embeddings == [[float(len(text))] for text in embedded[-1]]
+    # The fast phase's vectors are overwritten in place
+    assert [vector["id"] for vector in upserts[-1]] == [vector["id"] for vector in upserts[0]]
@@ -0,0 +1,25 @@
+"""
+Cold-start budget, see app/check_import_time.py. app.main is imported in a
+fresh interpreter, where the in-memory Prisma client of conftest.py does not
+apply, so this needs ``prisma generate``; CI runs it first.
+
+Run from content-processor/: python -m pytest tests
+"""
+import pytest
+
+from app import check_import_time
+
+
+def prisma_generated() -> bool:
+    try:
+        from prisma import Prisma  # noqa: F401
+    except RuntimeError:
+        return False
+    return True
+
+
+@pytest.mark.skipif(not prisma_generated(), reason="run prisma generate first")
+def test_app_imports_within_budget_without_provider_sdks():
+    result = check_import_time.measure()
+    assert [name for name in check_import_time.LAZY_MODULES if name in result["modules"]] == []
+    assert result["seconds"] <= check_import_time.IMPORT_TIME_BUDGET
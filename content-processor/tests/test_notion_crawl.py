@@ -0,0 +1,145 @@
+"""
+Incremental Notion crawls against an in-memory workspace that answers
+NotionTextExtractor.request, so no HTTP calls are made.
+
+Run from content-processor/: python -m pytest tests
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.services.NotionPageExtractor import NotionTextExtractor
+
+ROOT = "root"
+
+
+def paragraph(block_id: str, text: str, has_children: bool = False) -> dict:
+    return {"id": block_id, "type": "paragraph", "has_children": has_children,
+            "paragraph": {"rich_text": [{"plain_text": text}]}}
+
+
+class FakeNotion:
+    """
+    Pages, databases and the children of every block. Editing a block bumps
+    the last_edited_time of the page it is on, as Notion does.
+    """
+
+    def __init__(self):
+        self.clock = 0
+        self.pages = {}
+        self.children = {}
+        self.databases = {}
+        self.calls = []
+
+    def add_page(self, page_id: str, title: str, blocks: list) -> None:
+        self.clock += 1
+        self.pages[page_id] = {"title": title, "last_edited_time": str(self.clock)}
+        self.children[page_id] = blocks
+
+    def edit(self, page_id: str, block_id: str, text: str) -> None:
+        for blocks in self.children.values():
+            for block in blocks:
+                if block["id"] == block_id:
+                    block["paragraph"]["rich_text"] = [{"plain_text": text}]
+        self.clock += 1
+        self.pages[page_id]["last_edited_time"] = str(self.clock)
+
+    def page(self, page_id: str) -> dict:
+        page = self.pages[page_id]
+        return {"id": page_id, "last_edited_time": page["last_edited_time"],
+                "properties": {"title": {"type": "title", "title": [{"plain_text": page["title"]}]}}}
+
+    async def request(self, method, path, params=None, json=None):
+        self.calls.append(f"{method} {path}")
+        kind, object_id = path.split("/")[1:3]
+        if kind == "pages":
+            return self.page(object_id)
+        if kind == "databases":
+            return {"results": [self.page(row) for row in self.databases[object_id]], "has_more": False}
+        return {"results": [dict(block) for block in self.children.get(object_id, [])], "has_more": False}
+
+
+@pytest.fixture
+def notion(monkeypatch) -> FakeNotion:
+    notion = FakeNotion()
+    monkeypatch.setattr(NotionTextExtractor, "request", notion.request)
+    notion.add_page("sub", "Sub", [
+        paragraph("s1", "sub text", has_children=True),
+        {"id": "nested", "type": "child_page", "has_children": True, "child_page": {"title": "Nested"}},
+    ])
+    notion.children["s1"] = [paragraph("s1a", "inside toggle")]
+    notion.add_page("nested", "Nested", [paragraph("n1", "nested text")])
+    notion.add_page("row", "Row", [paragraph("r1", "row text")])
+    notion.databases["db"] = ["row"]
+    notion.add_page(ROOT, "Root", [
+        paragraph("p1", "root text"),
+        {"id": "sub", "type": "child_page", "has_children": True, "child_page": {"title": "Sub"}},
+        {"id": "db", "type": "child_database", "has_children": False, "child_database": {"title": "DB"}},
+    ])
+    return notion
+
+
+def crawl(notion: FakeNotion, page_trees=None, known_edit_time=None, crawl_child_pages=True):
+    """Crawl ROOT; the page trees round-trip through JSON as they do through the database."""
+    notion.calls.clear()
+    extractor = NotionTextExtractor(ROOT, "token", crawl_child_pages=crawl_child_pages,
+                                    page_trees=json.loads(json.dumps(page_trees)) if page_trees else None)
+    page = asyncio.run(extractor.crawl_page(known_edit_time=known_edit_time))
+    text = extractor.render_page(page["title"], page["blocks"]) if page["blocks"] is not None else None
+    return page, text
+
+
+def test_first_crawl_renders_subpages_and_database_rows(notion):
+    page, text = crawl(notion)
+    for line in ("root text", "sub text", "inside toggle", "nested text", "row text"):
+        assert line in text
+    assert set(page["page_trees"]) == {ROOT, "sub", "nested", "row"}
+
+
+def test_unchanged_pages_cost_one_request_each(notion):
+    first, _ = crawl(notion)
+    page, _ = crawl(notion, first["page_trees"])
+
+    assert page["blocks"] is None
+    assert sorted(notion.calls) == [
+        "GET /pages/nested", "GET /pages/root", "GET /pages/sub", "POST /databases/db/query"]
+
+
+def test_edited_subpage_is_listed_again_alone(notion):
+    first, _ = crawl(notion)
+    notion.edit("sub", "s1a", "edited inside toggle")
+    page, text = crawl(notion, first["page_trees"])
+
+    assert "edited inside toggle" in text and "root text" in text and "nested text" in text
+    assert "GET /blocks/sub/children" in notion.calls
+    assert "GET /blocks/s1/children" in notion.calls
+    assert "GET /blocks/root/children" not in notion.calls
+    assert "GET /blocks/nested/children" not in notion.calls
+
+
+def test_edit_in_nested_subpage_of_unchanged_subpage(notion):
+    first, _ = crawl(notion)
+    notion.edit("nested", "n1", "edited nested text")
+    _, text = crawl(notion, first["page_trees"])
+
+    assert "edited nested text" in text
+    assert "GET /blocks/sub/children" not in notion.calls
+
+
+def test_new_database_row_of_unchanged_page(notion):
+    first, _ = crawl(notion)
+    notion.add_page("row2", "Row 2", [paragraph("r2", "second row")])
+    notion.databases["db"].append("row2")
+    page, text = crawl(notion, first["page_trees"])
+
+    assert "second row" in text
+    assert "row2" in page["page_trees"]
+
+
+def test_without_child_pages_known_edit_time_skips_the_page(notion):
+    first, _ = crawl(notion, crawl_child_pages=False)
+    page, _ = crawl(notion, known_edit_time=first["last_edited_time"], crawl_child_pages=False)
+
+    assert page["blocks"] is None
+    assert notion.calls == ["GET /pages/root"]
@@ -0,0 +1,162 @@
+"""
+QueueConsumer against an in-memory Redis (fakeredis), so no server is needed.
+
+Run from content-processor/: python -m pytest tests
+"""
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from app.schemas.Common import AgentResponse
+from app.schemas.Text import TextRequest
+from app.services import QueueConsumer as queue_consumer
+from app.services.QueueConsumer import (FAILED_QUEUE, QueueConsumer,
+                                        TaskHandler, heavy_queue,
+                                        task_idempotency_key)
+
+QUEUE = "test:queue"
+
+NOTE = {
+    "text": "Notes <b>&</b> café ",
+    "metadata": {
+        "user_id": "u1", "memId": "", "title": "T", "description": "d",
+        "created_at": "c", "last_updated": "l", "tags": ["a", "b"], "source": "s",
+        "type": "note", "specific_desc": None, "score": 1.0, "ratio": 0.25, "big": 1e21,
+    },
+}
+
+
+def message(data=None, retries=0) -> str:
+    return json.dumps({"task": {"type": "note", "data": data or {**NOTE, "metadata": {
+        **NOTE["metadata"], "specific_desc": {"chunk_id": "0"}}}, "retries": retries}})
+
+
+def make_consumer(run, consumer_id="c1") -> QueueConsumer:
+    handler = TaskHandler(job_type="note", scope="text:note", request_model=TextRequest, run=run)
+    return QueueConsumer(client=fakeredis.aioredis.FakeRedis(decode_responses=True), queues=(QUEUE,),
+                         consumer_id=consumer_id, handlers={"note": handler})
+
+
+@pytest.fixture(autouse=True)
+def no_idempotency_store(monkeypatch):
+    # IdempotencyService talks to the status Redis; the consumer is what is under test
+    async def run_idempotent(key, scope, request, user_id, response_model, compute):
+        return await compute()
+    monkeypatch.setattr(queue_consumer, "run_idempotent", run_idempotent)
+
+
+async def respond(request: TextRequest) -> AgentResponse:
+    return AgentResponse(transcript=request.text, chunks=[request.text], metadata=[],
+                         userId=request.metadata.user_id, memoryId="m1")
+
+
+def test_idempotency_key_matches_go_consumer():
+    # sha256("/api/v1/text/process/note\n" + json.Marshal(data)) computed with the Go consumer's code
+    assert task_idempotency_key("note", json.loads(json.dumps(NOTE))) == \
+        "ca23b902a4efbcf29aceec453a82f9492c1b02fbbfe327be9791412fe0a191e7"
+
+
+def test_handled_message_is_acknowledged():
+    async def scenario():
+        consumer = make_consumer(respond)
+        await consumer.client.lpush(QUEUE, message())
+        [(queue, raw)] = await consumer.pull_batch(8)
+        assert await consumer.client.llen(consumer.processing[QUEUE]) == 1
+        await consumer.handle(queue, raw)
+        assert await consumer.client.llen(consumer.processing[QUEUE]) == 0
+        assert await consumer.client.llen(QUEUE) == 0
+    asyncio.run(scenario())
+
+
+def test_failed_message_is_retried_then_dead_lettered(monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    async def fail(request):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(queue_consumer, "QUEUE_MAX_RETRIES", 1)
+    monkeypatch.setattr(queue_consumer.asyncio, "sleep", no_sleep)
+
+    async def scenario():
+        consumer = make_consumer(fail)
+        await consumer.client.lpush(QUEUE, message())
+        [(queue, raw)] = await consumer.pull_batch(8)
+        await consumer.handle(queue, raw)
+        requeued = json.loads(await consumer.client.lindex(QUEUE, 0))
+        assert requeued["task"]["retries"] == 1
+
+        [(queue, raw)] = await consumer.pull_batch(8)
+        await consumer.handle(queue, raw)
+        assert await consumer.client.llen(QUEUE) == 0
+        assert await consumer.client.llen(FAILED_QUEUE) == 1
+        assert await consumer.client.llen(consumer.processing[QUEUE]) == 0
+    asyncio.run(scenario())
+
+
+def test_recover_returns_own_unacknowledged_messages():
+    async def scenario():
+        consumer = make_consumer(respond)
+        await consumer.client.lpush(consumer.processing[QUEUE], message())
+        assert await consumer.recover() == 1
+        assert await consumer.client.llen(QUEUE) == 1
+    asyncio.run(scenario())
+
+
+def test_reap_requeues_only_stopped_consumers():
+    async def scenario():
+        consumer = make_consumer(respond)
+        alive = QueueConsumer(client=consumer.client, queues=(QUEUE,), consumer_id="alive")
+        await alive.beat()
+        await consumer.client.lpush(f"{QUEUE}:processing:alive", message())
+        # Left behind by a worker that came back under another hostname
+        await consumer.client.lpush(f"{QUEUE}:processing:gone", message(), message())
+
+        assert await consumer.reap() == 2
+        assert await consumer.client.llen(QUEUE) == 2
+        assert await consumer.client.llen(f"{QUEUE}:processing:gone") == 0
+        assert await consumer.client.llen(f"{QUEUE}:processing:alive") == 1
+    asyncio.run(scenario())
+
+
+
+
+def test_heavy_tasks_are_diverted_and_light_ones_run():
+    ran = []
+
+    async def run(request):
+        ran.append(request.text)
+        return await respond(request)
+
+    handlers = {
+        "note": TaskHandler(job_type="note", scope="text:note", request_model=TextRequest, run=run),
+        "video": TaskHandler(job_type="video", scope="file:video", request_model=TextRequest, run=run),
+    }
+    video = json.dumps({"task": {**json.loads(message())["task"], "type": "video"}})
+
+    async def step(consumer: QueueConsumer) -> None:
+        for queue, raw in await consumer.pull_batch(8):
+            await consumer.start(queue, raw)
+        await asyncio.gather(*consumer.tasks)
+
+    async def scenario():
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        consumer = QueueConsumer(client=client, queues=(QUEUE,), consumer_id="c1",
+                                 handlers=handlers, divert_heavy=True)
+        await client.lpush(QUEUE, video, video, message())
+
+        await step(consumer)
+        # Only the note ran; the videos wait on the heavy queue, unstarted
+        assert len(ran) == 1
+        assert await client.llen(heavy_queue(QUEUE)) == 2
+        assert await client.llen(QUEUE) == 0
+        assert await client.llen(consumer.processing[QUEUE]) == 0
+
+        heavy = QueueConsumer(client=client, queues=(heavy_queue(QUEUE),), consumer_id="c1",
+                              handlers=handlers)
+        await step(heavy)
+        assert len(ran) == 3
+        assert await client.llen(heavy_queue(QUEUE)) == 0
+    asyncio.run(scenario())
@@ -2,15 +2,14 @@ from fastapi import APIRouter, Request
 from prisma.types import MemoryCreateInput, MemoryUpdateInput
 
 from app.core import voyage_client
-from app.prisma.prisma import prisma
 from app.schemas.query.query_related_types import (MemoryQueryRequest,
                                                    QueryRequest)
 from app.services.Memory import get_final_results_from_memory
-from app.services.MemoryOps import (CombinedMemory, CombinedMemoryChunk,
-                                    get_all_memories_by_user_id,
+from app.services.MemoryOps import (get_all_memories_by_user_id,
+                                    get_memories_by_mem_ids,
                                     get_memory_by_id)
+from app.utils import llm_gateway
 from app.utils.jwt import get_credentials
-from app.utils.llms import pro_query_llm
 from app.utils.prompts.MemorySearch import get_search_prompt
 
 router = APIRouter(
@@ -72,13 +71,13 @@ async def search_memories(request: MemoryQueryRequest, request2: Request):
         query = request.query
         prompt = get_search_prompt(query)
 
-        improved_query = pro_query_llm.invoke(prompt)
+        improved_query = (await llm_gateway.complete(prompt, "query-refiner")).text
 
         imp_q = ""
-        if len(improved_query.content) > 17:
-            imp_q = improved_query.content[17:]
+        if len(improved_query) > 17:
+            imp_q = improved_query[17:]
         else:
-            imp_q = improved_query.content
+            imp_q = improved_query
 
         combined_results = await get_final_results_from_memory(
             original_query=query, refined_query=imp_q, metadata=request.metadata, top_k=15)
@@ -94,30 +93,8 @@ async def search_memories(request: MemoryQueryRequest, request2: Request):
 
         unique_memIds = list(set(memIds))
 
-        memories = await prisma.memory.find_many(where={"memId": {"in": unique_memIds}})
-        combined_memories = {}
-        for memory in memories:
-            mem_id = memory.memId
-
-            if mem_id not in combined_memories:
-                combined_memories[mem_id] = CombinedMemory(
-                    chunks=[],
-                    metadata=memory.metadata,
-                    mem_id=mem_id,
-                    mem_type=memory.memType,
-                    user_id=memory.userId,
-                    created_at=memory.createdAt,
-                    updated_at=memory.updatedAt,
-                    tags=memory.tags
-                )
-
-            combined_memories[mem_id].chunks.append(CombinedMemoryChunk(
-                chunk_id=memory.chunkId,
-                contents=memory.memData
-            ))
-
-        for mem in combined_memories.values():
-            mem.chunks.sort(key=lambda x: int(x.chunk_id.split('_')[-1]))
+        combined_memories = await get_memories_by_mem_ids(
+            unique_memIds, (request.metadata or {}).get("user_id"))
 
         return {
             "chunkIds": chunk_ids,
@@ -0,0 +1,61 @@
+"""
+Cold-start budget check.
+
+Imports app.main in a fresh interpreter and fails if that takes longer than
+IMPORT_TIME_BUDGET seconds, or if a provider SDK was imported eagerly
+instead of through cortex_shared.providers:
+
+    python -m app.check_import_time
+
+tests/test_import_time.py runs the same check under pytest.
+"""
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "0.8"))
+
+# SDKs that must only load on first use
+LAZY_MODULES = (
+    "fireworks",
+    "google.generativeai",
+    "langchain",
+    "langchain_anthropic",
+    "langchain_core",
+    "langchain_google_genai",
+    "langchain_groq",
+    "langchain_openai",
+    "langchain_xai",
+    "openai",
+    "pinecone",
+    "voyageai",
+)
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure() -> dict:
+    probe = subprocess.run(
+        [sys.executable, "-c", PROBE], capture_output=True, text=True)
+    if probe.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{probe.stderr}")
+    return json.loads(probe.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    result = measure()
+    eager = [name for name in LAZY_MODULES if name in result["modules"]]
+    print(f"import app.main: {result['seconds']:.3f}s (budget {IMPORT_TIME_BUDGET:.3f}s)")
+    if eager:
+        print(f"Imported eagerly: {', '.join(eager)}")
+    return 0 if result["seconds"] <= IMPORT_TIME_BUDGET and not eager else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
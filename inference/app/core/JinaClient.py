@@ -1,61 +1,66 @@
+import asyncio
 import os
-import random
 
-import requests
+import aiohttp
+from cortex_shared import jina
+from cortex_shared.jina import KEY_REJECTED_STATUSES, JinaKeyPool, load_api_keys
 from dotenv import load_dotenv
 
 if os.path.exists(".env"):
     load_dotenv()
 
-total_keys = os.getenv("TOTAL_JINA_AI_API_KEYS")
-start = 1
+JINA_TIMEOUT = float(os.getenv("JINA_TIMEOUT", "30"))
 
-all_api_keys = []
+KEY_POOL = JinaKeyPool(load_api_keys())
 
-while start <= int(total_keys):
-    all_api_keys.append(os.getenv(f"JINA_API_KEY_{start}"))
-    start += 1
 
+def get_session() -> aiohttp.ClientSession:
+    return jina.get_session(JINA_TIMEOUT)
 
-def randomly_choose_one_key_with_equal_prob():
-    # print(all_api_keys)
-    key = random.choice(all_api_keys)
-    if key is None:
-        key = os.getenv("JINA_API_KEY_1")
-    return key
+
+close_session = jina.close_session
 
 
 class JinaAIClient():
     def __init__(self, base_url):
         self.base_url = base_url
 
-    def get_random_header(self):
-        key = randomly_choose_one_key_with_equal_prob()
+    def get_header(self, key: str):
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {key}"
         }
         return headers
 
-    def get(self, endpoint=''):
-        headers = self.get_random_header()
-        response = requests.get(self.base_url + endpoint, headers=headers)
-        return response.json()
-
-    def post(self, data, endpoint=''):
-        headers = self.get_random_header()
-        # print(headers)
-        response = requests.post(
-            self.base_url + endpoint, headers=headers, json=data)
-        return response.json()
-
-    def delete(self, endpoint=''):
-        headers = self.get_random_header()
-        response = requests.delete(self.base_url + endpoint, headers=headers)
-        return response.json()
-
-    def put(self, data, endpoint=''):
-        headers = self.get_random_header()
-        response = requests.put(self.base_url + endpoint,
-                                headers=headers, json=data)
-        return response.json()
+    async def request(self, method: str, endpoint='', data=None):
+        """
+        Send a request with the best available key, moving on to another key
+        when one is rate limited or out of quota.
+        """
+        for _ in range(len(KEY_POOL.keys) + 1):
+            state = KEY_POOL.acquire()
+            status = None
+            headers = {}
+            try:
+                await asyncio.sleep(KEY_POOL.wait_time(state))
+                async with get_session().request(method, self.base_url + endpoint, headers=self.get_header(state.key), json=data) as response:
+                    status = response.status
+                    headers = response.headers
+                    if status in KEY_REJECTED_STATUSES:
+                        continue
+                    return await response.json(content_type=None)
+            finally:
+                KEY_POOL.release(state, status, headers)
+        raise Exception("All Jina API keys are rate limited or exhausted")
+
+    async def get(self, endpoint=''):
+        return await self.request("GET", endpoint)
+
+    async def post(self, data, endpoint=''):
+        return await self.request("POST", endpoint, data=data)
+
+    async def delete(self, endpoint=''):
+        return await self.request("DELETE", endpoint)
+
+    async def put(self, data, endpoint=''):
+        return await self.request("PUT", endpoint, data=data)
@@ -1,11 +1,11 @@
 import re
 from typing import Dict, List
 
-from openai import AsyncOpenAI
-
 
 class BaseAgent:
     def __init__(self, api_key: str):
+        # Imported here so the SDK loads with the first agent, not with the app
+        from openai import AsyncOpenAI
         self.client = AsyncOpenAI(
             api_key=api_key, base_url="https://api.perplexity.ai")
         self.model = "llama-3.1-sonar-large-128k-online"
@@ -7,20 +7,25 @@ from collections import namedtuple
 from itertools import islice
 from typing import Dict, List, Optional, Tuple
 
-import voyageai
+from cortex_shared import providers
 from dotenv import load_dotenv
 
 from app.schemas.memory.ApiModel import Results, ResultsAfterReRanking
 from app.schemas.web_agent import ReRankedWebSearchResult, SearchResult
 # from app.services.query import process_gemini_response
-from app.utils import llms
+from app.utils import llm_gateway
 from app.utils.app_logger_config import logger
 
 if os.path.exists(".env"):
     load_dotenv()
 
 
-vo = voyageai.AsyncClient()
+def _voyage_client():
+    import voyageai
+    return voyageai.AsyncClient()
+
+
+vo = providers.register("voyage", _voyage_client)
 
 EMBEDDING_BATCH_SIZE = 128
 
@@ -295,18 +300,13 @@ Return JSON array with ALL original indexes (JSON array):
     return prompt
 
 
-def process_gemini_response_json(response) -> Tuple[Optional[str], Optional[Dict]]:
+def process_gemini_response_json(response: llm_gateway.LLMResponse) -> Tuple[Optional[str], Optional[Dict]]:
     """
     Processes Gemini API response with enhanced JSON parsing resilience
     """
+    text = response.text
     try:
-        # Extract response content
-        text = response.candidates[0].content.parts[0].text
-        token_counts = {
-            'prompt_tokens': response.usage_metadata.prompt_token_count,
-            'completion_tokens': response.usage_metadata.candidates_token_count,
-            'total_tokens': response.usage_metadata.total_token_count
-        }
+        token_counts = response.usage
 
         # Normalize response text
         text = text.strip()
@@ -393,8 +393,7 @@ async def process_batch(
         prompt = create_reranking_prompt(query, documents)
 
         # Get response from Gemini
-        model = llms.gemini_model
-        response = await model.generate_content_async(prompt)
+        response = await llm_gateway.complete(prompt, "rerank")
 
         # Process response
         text, _ = process_gemini_response_json(response)
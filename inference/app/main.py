@@ -6,6 +6,7 @@ from fastapi.concurrency import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from app.core import JinaClient
 from app.prisma import prisma
 
 from .api import api_router
@@ -17,11 +18,13 @@ from .api import api_router
 async def lifespan(app: FastAPI):
     await prisma.prisma.connect()
     print("Connected to database")
+    await prisma.check_search_vector_schema()
     # consume_messages()
     # for group_id in ["soham1"]:
     # await start_consumer(group_id)
     # logger.info("Kafka consumers started")
     yield
+    await JinaClient.close_session()
     await prisma.prisma.disconnect()
 
 app = FastAPI(lifespan=lifespan)
@@ -1,16 +1,73 @@
-from typing import List
+from typing import List, Optional, Tuple
 
 from prisma import Prisma
 
 prisma = Prisma()
 
+# full_text_search joins on userid; content-processor's app.partition_tables adds it
+SEARCH_VECTOR_SCHEMA_QUERY = '''
+    SELECT
+        EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'memory_search_vector' AND column_name = 'userid'
+        ) AS has_userid,
+        EXISTS (
+            SELECT 1 FROM pg_constraint c
+            WHERE c.conrelid = to_regclass('memory_search_vector')
+              AND c.contype IN ('p', 'u')
+              AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+                   FROM pg_attribute a
+                   WHERE a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey))
+                  = ARRAY['chunkid', 'memid', 'userid']
+        ) AS has_key
+'''
+
+
+async def check_search_vector_schema():
+    """Refuse to start against a memory_search_vector that predates partitioning."""
+    [row] = await prisma.query_raw(SEARCH_VECTOR_SCHEMA_QUERY)
+    if not row["has_userid"]:
+        raise RuntimeError(
+            "memory_search_vector has no userid column; run content-processor's python -m app.partition_tables")
+    if not row["has_key"]:
+        raise RuntimeError(
+            "memory_search_vector has no (userid, memid, chunkid) key; "
+            "run content-processor's python -m app.partition_tables")
+
 
 async def get_mem_based_on_id(memId: str):
     return await prisma.memory.find_many(where={"memId": memId})
 
 
-async def get_all_mems_based_on_chunk_ids(chunk_ids: List[str]):
-    return await prisma.memory.find_many(where={"chunkId": {"in": chunk_ids}})
+async def get_all_mems_based_on_chunk_ids(chunk_ids: List[str], user_id: Optional[str] = None):
+    # Uses the chunkId index; memId is not known for search hits
+    where = {"chunkId": {"in": chunk_ids}}
+    if user_id:
+        # Memory is hash-partitioned by userId, so this reads one partition
+        where["userId"] = user_id
+    return await prisma.memory.find_many(where=where)
+
+
+async def get_neighbour_chunks(hits: List[Tuple[str, str, int]], diff: int = 1):
+    """
+    Rows within ``diff`` chunkIndex of each (userId, memId, chunkIndex) hit,
+    hits included. Each hit is one range scan on the
+    (userId, memId, chunkIndex) index.
+    """
+    if not hits:
+        return []
+    user_ids, mem_ids, indexes = zip(*hits)
+    return await prisma.query_raw(
+        '''
+        SELECT DISTINCT m."memId", m."chunkId", m."chunkIndex", m."memData"
+        FROM unnest($1::text[], $2::text[], $3::int[]) AS hit("userId", "memId", "chunkIndex")
+        JOIN "Memory" m
+          ON m."userId" = hit."userId"
+         AND m."memId" = hit."memId"
+         AND m."chunkIndex" BETWEEN hit."chunkIndex" - $4 AND hit."chunkIndex" + $4
+        ''',
+        list(user_ids), list(mem_ids), list(indexes), diff,
+    )
 
 
 async def get_mem_based_on_chunk_id(chunk_id: str):
@@ -33,36 +90,44 @@ async def full_text_search(query: str, metadata: dict, top_k: int = 10):
                 if value:  # Only add if list is not empty
                     filters[key] = {"in": value}
 
-        # Build the filter string with proper handling of both single values and arrays
+        # Values are passed as parameters; $1 is the query
+        params = [query]
         filter_conditions = []
         for key, condition in filters.items():
+            columns = [f'm."{key}"']
+            if key == "userId":
+                # Filtering msv.userid as well lets Postgres prune both tables
+                # to the user's hash partition and read only its GIN index
+                columns.append('msv."userid"')
             if "equals" in condition:
-                # For single string values
-                filter_conditions.append(
-                    f'm."{key}" = \'{condition["equals"]}\'')
+                params.append(condition["equals"])
+                filter_conditions.extend(
+                    f'{column} = ${len(params)}' for column in columns)
             elif "in" in condition:
-                # For array values - use ANY or = ANY syntax
-                placeholders = ', '.join(
-                    f"'{str(x)}'" for x in condition["in"])
-                filter_conditions.append(
-                    f'm."{key}" = ANY(ARRAY[{placeholders}])')
+                params.append([str(x) for x in condition["in"]])
+                filter_conditions.extend(
+                    f'{column} = ANY(${len(params)}::text[])' for column in columns)
+
         # Combine all conditions with AND
         filter_string = " AND " + \
             " AND ".join(filter_conditions) if filter_conditions else ""
 
+        params.append(top_k)
         search_query = f"""
-            SELECT m."memId", m."chunkId", m."memData", ts_rank(msv.search_vector, plainto_tsquery('english', '{query}')) AS score
+            SELECT m."memId", m."chunkId", m."memData", ts_rank(msv.search_vector, plainto_tsquery('english', $1)) AS score
             FROM "Memory" m
-            JOIN memory_search_vector msv ON m."memId" = msv."memid" AND m."chunkId" = msv."chunkid"
-            WHERE msv.search_vector @@ plainto_tsquery('english', '{query}') {filter_string}
+            JOIN memory_search_vector msv
+              ON m."userId" = msv."userid" AND m."memId" = msv."memid" AND m."chunkId" = msv."chunkid"
+            WHERE msv.search_vector @@ plainto_tsquery('english', $1) {filter_string}
             ORDER BY score DESC
-            LIMIT {top_k};
+            LIMIT ${len(params)};
         """
-        results = await prisma.query_raw(search_query)
+        results = await prisma.query_raw(search_query, *params)
         # print("_____------------_____")
         # print(results)
         # print("_____------------_____")
     except Exception as e:
+        # Not swallowed: an empty result here would read as "no matches"
         print(f"Error performing full-text search: {str(e)}")
-        results = []
+        raise
     return results
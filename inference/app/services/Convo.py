@@ -5,7 +5,7 @@ from prisma.models import Memory
 from app.prisma.prisma import prisma
 from app.services.query import get_chat_context
 from app.utils.app_logger_config import logger
-from app.utils.llms import summary_llm
+from app.utils import llm_gateway
 
 
 class MemoryCitation(TypedDict):
@@ -138,13 +138,13 @@ async def get_citations_on_message_id(
 async def get_convo_summary(conversation_id: str):
     try:
         context = await get_chat_context(conversation_id, limit=10)
-        res = summary_llm.invoke(context.context)
+        res = await llm_gateway.complete(context.context, "summary")
         await prisma.conversation.update(
             where={"id": conversation_id},
-            data={"summary": res.content}
+            data={"summary": res.text}
         )
         return {
-            "summary": res.content
+            "summary": res.text
         }
     except Exception as e:
         print(f"Error in get_convo_summary: {str(e)}")
@@ -4,7 +4,9 @@ from functools import partial
 from logging import getLogger
 from typing import Dict, List, Set, Tuple, TypedDict
 
-from app.prisma.prisma import full_text_search, get_all_mems_based_on_chunk_ids
+from app.prisma.prisma import (full_text_search,
+                               get_all_mems_based_on_chunk_ids,
+                               get_neighbour_chunks)
 from app.schemas.memory.ApiModel import Results
 from app.utils.app_logger_config import logger
 from app.utils.Pinecone_query import pinecone_query
@@ -36,6 +38,17 @@ class SearchConfig:
     DEFAULT_ABSOLUTE_THRESHOLD = 0.1
     DEFAULT_RELATIVE_THRESHOLD = 0.6
     DEFAULT_RRF_K = 100
+    # Neighbouring chunks on each side added around a hit
+    CHUNK_WINDOW = 1
+    # memTypes content-processor used to store windowed; git, youtube, web,
+    # audio, drive and notion rows were always single chunks and stay so
+    WINDOWED_MEM_TYPES = frozenset({'note', 'video', 'image', 'pdf'})
+
+
+# Same markup content-processor used to store windowed chunks
+JOINER = '<joiner>'
+CENTRAL_OPENER = '<central>'
+CENTRAL_CLOSER = '</central>'
 
 
 async def execute_search_pair(
@@ -153,6 +166,50 @@ def get_unique_chunk_ids(search_results: SearchResults) -> Set[str]:
     return {result["chunkId"] for result in all_results}
 
 
+async def build_chunk_windows(memories_data, diff: int = SearchConfig.CHUNK_WINDOW) -> Dict[str, str]:
+    """
+    Rebuild the <central>/<joiner> window around chunks stored on their own.
+
+    Only memTypes that were stored windowed get a window. Rows written
+    before chunks were stored once (no chunkIndex, or memData already
+    windowed), and hits whose neighbours cannot be read, are left out and
+    used as they are.
+    """
+    hits = [
+        memory for memory in memories_data
+        if memory.memType in SearchConfig.WINDOWED_MEM_TYPES
+        and memory.chunkIndex is not None
+        and CENTRAL_OPENER not in memory.memData
+    ]
+    if not hits:
+        return {}
+
+    try:
+        neighbours = await get_neighbour_chunks(
+            [(memory.userId, memory.memId, memory.chunkIndex) for memory in hits], diff)
+    except Exception as e:
+        logger.error(f"Error fetching neighbouring chunks, using stored chunks: {e}")
+        return {}
+
+    by_position = {(row["memId"], row["chunkIndex"]): row["memData"]
+                   for row in neighbours}
+    windows = {}
+    for memory in hits:
+        if (memory.memId, memory.chunkIndex) not in by_position:
+            # Missing from the neighbour read; keep the stored chunk
+            continue
+        parts = []
+        for index in range(memory.chunkIndex - diff, memory.chunkIndex):
+            if (memory.memId, index) in by_position:
+                parts.append(f"{by_position[(memory.memId, index)]} {JOINER}")
+        parts.append(f"{CENTRAL_OPENER}{memory.memData}{CENTRAL_CLOSER}")
+        for index in range(memory.chunkIndex + 1, memory.chunkIndex + diff + 1):
+            if (memory.memId, index) in by_position:
+                parts.append(f"{JOINER} {by_position[(memory.memId, index)]}")
+        windows[memory.chunkId] = ' '.join(parts)
+    return windows
+
+
 async def get_final_results_from_memory(
     original_query: str,
     refined_query: str,
@@ -177,14 +234,17 @@ async def get_final_results_from_memory(
 
     # Get unique chunk IDs and retrieve memory data
     chunk_ids = get_unique_chunk_ids(search_results)
-    memories_data = await get_all_mems_based_on_chunk_ids(chunk_ids)
+    user_id = metadata.get("user_id") if metadata else None
+    memories_data = await get_all_mems_based_on_chunk_ids(
+        list(chunk_ids), user_id if isinstance(user_id, str) else None)
+    windows = await build_chunk_windows(memories_data)
 
     # Convert to final results
     return [
         Results(
             memId=memory.memId,
             chunkId=memory.chunkId,
-            mem_data=memory.memData
+            mem_data=windows.get(memory.chunkId, memory.memData)
         )
         for memory in memories_data
     ]
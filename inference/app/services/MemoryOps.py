@@ -47,9 +47,21 @@ class CombinedMemory(BaseModel):
     tags: Optional[List[str]] = None
 
 
-async def get_all_memories_by_user_id(userId: str) -> Dict[str, CombinedMemory]:
-    memories = await prisma.memory.find_many(where={"userId": userId})
+# Served by the (userId, memId, chunkIndex) index, so chunks come back in order
+CHUNK_ORDER = [{"memId": "asc"}, {"chunkIndex": "asc"}]
+
+
+def chunk_position(memory) -> int:
+    if memory.chunkIndex is not None:
+        return memory.chunkIndex
+    # Rows not yet backfilled: "<memId>_<n>", or a bare "<n>" for old config-file chunks
+    return int(memory.chunkId.split('_')[-1])
+
+
+def combine_memory_chunks(memories) -> Dict[str, CombinedMemory]:
+    """Group Memory rows, already sorted by CHUNK_ORDER, into one entry per memId."""
     combined_memories = {}
+    unindexed = set()
 
     for memory in memories:
         mem_id = memory.memId
@@ -70,13 +82,33 @@ async def get_all_memories_by_user_id(userId: str) -> Dict[str, CombinedMemory]:
             chunk_id=memory.chunkId,
             contents=memory.memData
         ))
+        if memory.chunkIndex is None:
+            unindexed.add(mem_id)
 
-    for mem in combined_memories.values():
-        mem.chunks.sort(key=lambda x: int(x.chunk_id.split('_')[-1]))
+    # NULL chunkIndex rows come back in no particular order
+    positions = {memory.chunkId: chunk_position(memory)
+                 for memory in memories if memory.memId in unindexed}
+    for mem_id in unindexed:
+        combined_memories[mem_id].chunks.sort(
+            key=lambda chunk: positions[chunk.chunk_id])
 
     return combined_memories
 
 
+async def get_all_memories_by_user_id(userId: str) -> Dict[str, CombinedMemory]:
+    memories = await prisma.memory.find_many(where={"userId": userId}, order=CHUNK_ORDER)
+    return combine_memory_chunks(memories)
+
+
+async def get_memories_by_mem_ids(mem_ids: List[str], userId: Optional[str] = None) -> Dict[str, CombinedMemory]:
+    where = {"memId": {"in": mem_ids}}
+    if userId:
+        # Lets Postgres range-scan the (userId, memId, chunkIndex) index
+        where["userId"] = userId
+    memories = await prisma.memory.find_many(where=where, order=CHUNK_ORDER)
+    return combine_memory_chunks(memories)
+
+
 async def update_memory_chunk_wise(memory_id: str, memData: str):
     memory = await prisma.memory.find_unique(where={"id": memory_id})
     if memory is None:
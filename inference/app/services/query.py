@@ -1,8 +1,8 @@
 import os
 from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 
+from cortex_shared import providers
 from dotenv import load_dotenv
-from langchain.schema import HumanMessage
 
 from app.core import voyage_client
 from app.core.pxity_client import (CodeAgent, RedditAgent, ResearchAgent,
@@ -14,9 +14,8 @@ from app.schemas.query.query_related_types import (ChatContext, MessageContent,
                                                    QueryRequest)
 from app.services.Memory import get_final_results_from_memory
 from app.services.messages import insert_message_in_db
-from app.utils import llms
+from app.utils import llm_gateway
 from app.utils.app_logger_config import logger
-from app.utils.llms import get_answer_llm
 from app.utils.Preprocessor import improve_query, preprocess_query
 from app.utils.prompts.final_ans import prompt as final_ans_prompt
 from app.utils.prompts.frameworks import NO_MEMORY_PROMPT
@@ -32,11 +31,16 @@ load_dotenv()
 
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
 
-pxity_web_agent = WebAgent(api_key=PERPLEXITY_API_KEY)
-pxity_code_agent = CodeAgent(api_key=PERPLEXITY_API_KEY)
-pxity_research_agent = ResearchAgent(api_key=PERPLEXITY_API_KEY)
-pxity_video_agent = VideoAgent(api_key=PERPLEXITY_API_KEY)
-pxity_reddit_agent = RedditAgent(api_key=PERPLEXITY_API_KEY)
+pxity_web_agent = providers.register(
+    "pxity_web", lambda: WebAgent(api_key=PERPLEXITY_API_KEY))
+pxity_code_agent = providers.register(
+    "pxity_code", lambda: CodeAgent(api_key=PERPLEXITY_API_KEY))
+pxity_research_agent = providers.register(
+    "pxity_research", lambda: ResearchAgent(api_key=PERPLEXITY_API_KEY))
+pxity_video_agent = providers.register(
+    "pxity_video", lambda: VideoAgent(api_key=PERPLEXITY_API_KEY))
+pxity_reddit_agent = providers.register(
+    "pxity_reddit", lambda: RedditAgent(api_key=PERPLEXITY_API_KEY))
 
 
 async def process_user_query(query: QueryRequest, is_stream: bool = False) -> Dict:
@@ -82,7 +86,7 @@ async def handle_query_response(
 ) -> Dict:
     """Handle query processing and return appropriate response."""
     try:
-        llm_query = improve_query(
+        llm_query = await improve_query(
             query.query, refined_query, query_context or context)
         logger.info(f"Improved query: {llm_query}")
 
@@ -195,17 +199,15 @@ async def handle_query_response(
                 "messageId": message.id
             }
 
-        final_answer = get_final_pro_answer(
-            query.query,
-            llm_query,
-            context,
-            memory_data,
-            llm=query.llm
+        final_answer = await get_final_pro_answer(
+            get_pro_answer_prompt(query, llm_query, context, memory_data, web_data, len(chunk_ids))
+            if query.is_pro else final_ans_prompt + memory_data,
+            llm=(query.llm or 'gpt-4o') if query.is_pro else 'free'
         )
 
         return {
             "query": llm_query,
-            "final_ans": final_answer.content,
+            "final_ans": final_answer,
             "messageId": message.id
         }
 
@@ -315,117 +317,15 @@ async def stream_response(
         f"Starting stream with LLM type: {llm_type}, prompt: {prompt}")
 
     try:
-        llm = get_answer_llm(llm_type, is_pro=True)
-        if (llm_type == 'gemini-pro' or llm_type == 'gemini-flash'):
-            llm = llms.gemini_model_pro if llm_type == 'gemini-pro' else llms.gemini_model
-            response = await llm.generate_content_async(
-                prompt,
-                # generation_config={"stream": True},
-                stream=True
-            )
-
-            async for chunk in response:
-                # print(chunk)
-                chunk_text = chunk.text
-                message_content.append(chunk_text)
-                # Format chunk for streaming
-                chunk_data = chunk_text.replace('\n', '\\n')
-                if first_chunk:
-                    yield f"messageId: {message_id},data: {chunk_data}\n\n"
-                    first_chunk = False
-                else:
-                    yield f"data: {chunk_data}\n\n"
-        elif (llm_type == 'deepseek-r1'):
-            messages = [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            # import fireworks.client
-            # fireworks.client.api_key = os.getenv("FIREWORKS_API_KEY")
-            response = llms.fireworks_client.chat.completions.acreate(
-                model="accounts/fireworks/models/deepseek-r1",
-                messages=messages,
-                # prompt=prompt,
-                stream=True
-            )
-            reasoning_over = False
-            async for chunk in response:
-                # print("__________")
-                # print(chunk)
-                content = ""
-                if chunk and chunk.choices and chunk.choices[0]:
-                    content = chunk.choices[0].delta.content
-                chunk_text = content
-                # print(chunk_text)
-
-                if not chunk_text:
-                    continue
-                # print(content)
-                if not reasoning_over:
-                    type = "reasoning"
-                else:
-                    type = "data"
-                chunk_text = content
-                if '</think>' in content:
-                    reasoning_over = True
-
-                # if type == "reasoning":
-                #     print(chunk_text + " - " + type)
-
-                # type = 'data'
-                # Format chunk for streaming
-                if chunk_text:
-                    message_content.append(chunk_text)
-                    chunk_data = chunk_text.replace('\n', '\\n')
-                    if first_chunk:
-                        yield f"messageId: {message_id},{type} : {chunk_data}\n\n"
-                        first_chunk = False
-                    else:
-                        yield f"{type}: {chunk_data}\n\n"
-        elif (llm_type == 'deepseek-chat'):
-            messages = [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            response = llms.fireworks_client.chat.completions.acreate(
-                model="accounts/fireworks/models/deepseek-v3",
-                messages=messages,
-                # prompt=prompt,
-                stream=True
-            )
-
-            async for chunk in response:
-                print(chunk)
-                content = ""
-                if chunk and chunk.choices and chunk.choices[0]:
-                    content = chunk.choices[0].delta.content
-                chunk_text = content
-                print(chunk_text)
-                # Format chunk for streaming
-                if chunk_text:
-                    message_content.append(chunk_text)
-                    chunk_data = chunk_text.replace('\n', '\\n')
-                    if first_chunk:
-                        yield f"messageId: {message_id},data: {chunk_data}\n\n"
-                        first_chunk = False
-                    else:
-                        yield f"data: {chunk_data}\n\n"
-        else:
-            async for chunk in llm.astream([HumanMessage(content=prompt)]):
-                chunk_text = chunk.content
-                message_content.append(chunk_text)
-                # print(f"Chunk {i}: {chunk_text}")
-                # Format chunk for streaming
-                chunk_data = chunk_text.replace('\n', '\\n')
-                if first_chunk:
-                    yield f"messageId: {message_id},data: {chunk_data}\n\n"
-                    first_chunk = False
-                else:
-                    yield f"data: {chunk_data}\n\n"
+        async for chunk in llm_gateway.stream(prompt, llm_type):
+            message_content.append(chunk.text)
+            # Format chunk for streaming
+            chunk_data = chunk.text.replace('\n', '\\n')
+            if first_chunk:
+                yield f"messageId: {message_id},{chunk.kind}: {chunk_data}\n\n"
+                first_chunk = False
+            else:
+                yield f"{chunk.kind}: {chunk_data}\n\n"
 
         # Store complete message
         complete_message = ''.join(message_content)
@@ -557,28 +457,7 @@ Conversation to analyze:
 {context}
 """
     # print(context)
-    model = llms.gemini_model
-    response = await model.generate_content_async(
-        prompt,
-    )
-    text, token_count = process_gemini_response(response)
-
-    return text
+    response = await llm_gateway.complete(prompt, "context")
 
+    return response.text
 
-def process_gemini_response(response):
-    """
-    Extract text and token counts from Gemini API response
-    Returns tuple of (text, dict with token counts)
-    """
-    # Extract text from the response
-    text = response.candidates[0].content.parts[0].text
-
-    # Extract token counts
-    token_counts = {
-        'prompt_tokens': response.usage_metadata.prompt_token_count,
-        'completion_tokens': response.usage_metadata.candidates_token_count,
-        'total_tokens': response.usage_metadata.total_token_count
-    }
-
-    return text, token_counts
@@ -9,17 +9,17 @@ jina_seg_client = JinaClient.JinaAIClient(JINA_AI_BASE_URL_SEGMENTATION)
 jina_embed_client = JinaClient.JinaAIClient(JINA_AI_BASE_URL_EMBEDDING)
 
 
-def segment_data(data: str):
+async def segment_data(data: str):
     body = {
         'content': data,
         "tokenizer": "o200k_base",
         "max_chunk_length": "1000",
         "return_chunks": "true"
     }
-    return jina_seg_client.post(data=body)
+    return await jina_seg_client.post(data=body)
 
 
-def get_embedding(data: list[str], retries=5, task: Union[f'retrieval.query', f'retrieval.passage', f'text-matching'] = 'text-matching'):
+async def get_embedding(data: list[str], retries=5, task: Union[f'retrieval.query', f'retrieval.passage', f'text-matching'] = 'text-matching'):
 
     body = {
         'model': 'jina-embeddings-v3',
@@ -38,9 +38,9 @@ def get_embedding(data: list[str], retries=5, task: Union[f'retrieval.query', f'
     # print('Embeddings')
     # print(body)
     # print(res)
-    res = jina_embed_client.post(data=body)
+    res = await jina_embed_client.post(data=body)
     if not res or not res['data']:
         if retries > 0:
-            return get_embedding(data, retries - 1)
+            return await get_embedding(data, retries - 1)
         return None
     return res
@@ -1,7 +1,7 @@
 import re
 from typing import List
 
-from app.utils.llms import pro_query_llm
+from app.utils import llm_gateway
 
 # from spacy.lang.en.stop_words import STOP_WORDS
 
@@ -70,7 +70,7 @@ def prepare_fulltext_query(natural_query: str) -> str:
     return ' & '.join(query_terms)
 
 
-def improve_query(query: str, refined_query: str, context: str = "", want_to_update: bool = False) -> str:
+async def improve_query(query: str, refined_query: str, context: str = "", want_to_update: bool = False) -> str:
     """Improve query using LLM"""
     try:
         if want_to_update:
@@ -83,8 +83,8 @@ def improve_query(query: str, refined_query: str, context: str = "", want_to_upd
         else:
             prompt = refined_query
 
-        improved_query = pro_query_llm.invoke(prompt)
-        return improved_query.content
+        improved_query = await llm_gateway.complete(prompt, "query-refiner")
+        return improved_query.text
     except Exception as e:
         print(f"Error in improve_query: {str(e)}")
         return query
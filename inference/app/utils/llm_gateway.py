@@ -0,0 +1,266 @@
+"""
+One async entry point for every LLM call in the inference service.
+
+``complete`` returns the whole answer and ``stream`` yields LLMChunk
+objects, whatever the provider. ``complete`` applies LLM_TIMEOUT, or
+LLM_ANSWER_TIMEOUT for the answer models, and ``stream`` an idle timeout
+between chunks. Both retry timeouts, connection errors, 429s and 5xx with
+backoff, and fail at once on anything else (bad requests, auth); a stream
+is only retried until its first chunk has been yielded. Clients are built on first use, one per
+(provider, model, params), and reused, so handlers never build a client
+per request or block the event loop on a synchronous ``.invoke()``.
+
+Models are referred to by the names the API accepts (``gpt-4o``,
+``sonnet-3.5``, ``deepseek-r1``...) or by the role names below
+(``query-refiner``, ``summary``...).
+"""
+import asyncio
+import os
+import random
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.utils import llms
+from app.utils.app_logger_config import logger
+
+if os.path.exists(".env"):
+    load_dotenv()
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Full answers run to thousands of tokens, well past LLM_TIMEOUT
+LLM_ANSWER_TIMEOUT = float(os.getenv("LLM_ANSWER_TIMEOUT", "180"))
+# Longest gap allowed between two chunks of a stream
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    provider: str
+    model: str
+    # Sorted (name, value) pairs so specs can key the client cache
+    params: Tuple[Tuple[str, object], ...] = ()
+    # Streams <think>...</think> before the answer (DeepSeek R1)
+    reasoning: bool = False
+
+
+def spec(provider: str, model: str, reasoning: bool = False, **params) -> ModelSpec:
+    return ModelSpec(provider, model, tuple(sorted(params.items())), reasoning)
+
+
+GEMINI_PARAMS = dict(temperature=0.2, top_p=0.95, top_k=40, max_output_tokens=8192)
+
+MODELS: Dict[str, ModelSpec] = {
+    # Answer models offered to users
+    "gpt-4o": spec("openai", "gpt-4o", temperature=0.4, max_tokens=3500),
+    "gpt-4o-mini": spec("openai", "gpt-4o-mini", temperature=0.4, max_tokens=1800),
+    "sonnet-3.5": spec("anthropic", "claude-3-5-sonnet-20241022", temperature=0.4, max_tokens=3500),
+    "grok": spec("xai", "grok-2-latest", temperature=0.4, max_tokens=3500),
+    "llama-3.1-70b": spec("groq", "llama-3.1-70b-versatile", temperature=0.4, max_tokens=1800),
+    "llama-3.2-3b": spec("groq", "llama-3.2-3b-preview", temperature=0.1, max_tokens=1000),
+    "llama-3.2-90b": spec("groq", "llama-3.2-90b", temperature=0.7, max_tokens=1000),
+    "gemini-pro": spec("gemini", "gemini-1.5-pro", **GEMINI_PARAMS),
+    "gemini-flash": spec("gemini", "gemini-1.5-flash-8b", **GEMINI_PARAMS),
+    "deepseek-r1": spec("fireworks", "accounts/fireworks/models/deepseek-r1", reasoning=True),
+    "deepseek-chat": spec("fireworks", "accounts/fireworks/models/deepseek-v3"),
+    # Internal roles
+    "free": spec("groq", "llama-3.1-70b-versatile", temperature=0.7, max_tokens=1000),
+    "query-refiner": spec("openai", "gpt-4o-mini", temperature=0.3, max_tokens=1800),
+    "summary": spec("openai", "gpt-4o-mini", temperature=0.3, max_tokens=1800),
+    "context": spec("gemini", "gemini-1.5-flash-8b", **GEMINI_PARAMS),
+    "rerank": spec("gemini", "gemini-1.5-flash-8b", **GEMINI_PARAMS),
+}
+
+# complete() gives these LLM_ANSWER_TIMEOUT instead of LLM_TIMEOUT
+ANSWER_MODELS = frozenset({
+    "gpt-4o", "gpt-4o-mini", "sonnet-3.5", "grok", "llama-3.1-70b", "llama-3.2-3b",
+    "llama-3.2-90b", "gemini-pro", "gemini-flash", "deepseek-r1", "deepseek-chat",
+})
+
+
+@dataclass
+class LLMChunk:
+    text: str
+    # "data" for the answer, "reasoning" for a reasoning model's thinking
+    kind: str = "data"
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    model: str
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+def resolve(model: str) -> ModelSpec:
+    if model not in MODELS:
+        raise ValueError(f"Unknown model: {model}")
+    return MODELS[model]
+
+
+@lru_cache(maxsize=None)
+def get_client(model_spec: ModelSpec):
+    """The client for ``model_spec``, built once per process."""
+    params = dict(model_spec.params)
+    provider = model_spec.provider
+    # Retries and timeouts are applied here, not by the SDKs
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(api_key=llms.OPEN_API_KEY, model_name=model_spec.model,
+                          max_retries=0, timeout=None, **params)
+    if provider == "anthropic":
+        from langchain_anthropic import ChatAnthropic
+        return ChatAnthropic(api_key=llms.ANTHROPIC_API_KEY, model=model_spec.model,
+                             max_retries=0, **params)
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(model=model_spec.model, max_retries=0, timeout=None, **params)
+    if provider == "xai":
+        from langchain_xai import ChatXAI
+        return ChatXAI(api_key=llms.XAI_API_KEY, model_name=model_spec.model,
+                       max_retries=0, timeout=None, **params)
+    if provider == "gemini":
+        return llms.genai.GenerativeModel(
+            model_name=model_spec.model,
+            generation_config={**params, "response_mime_type": "text/plain"},
+        )
+    if provider == "fireworks":
+        # One client serves every Fireworks model
+        return llms.fireworks_client
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+def _gemini_usage(response) -> Dict[str, int]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    return {
+        'prompt_tokens': usage.prompt_token_count,
+        'completion_tokens': usage.candidates_token_count,
+        'total_tokens': usage.total_token_count,
+    }
+
+
+async def _complete_once(model_spec: ModelSpec, prompt: str) -> Tuple[str, Dict[str, int]]:
+    client = get_client(model_spec)
+    if model_spec.provider == "gemini":
+        response = await client.generate_content_async(prompt)
+        return response.candidates[0].content.parts[0].text, _gemini_usage(response)
+    if model_spec.provider == "fireworks":
+        response = await client.chat.completions.acreate(
+            model=model_spec.model,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        usage = response.usage
+        return response.choices[0].message.content, {
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens,
+            'total_tokens': usage.total_tokens,
+        } if usage else {}
+    message = await client.ainvoke(prompt)
+    usage = getattr(message, "usage_metadata", None) or {}
+    return message.content, {
+        'prompt_tokens': usage.get('input_tokens', 0),
+        'completion_tokens': usage.get('output_tokens', 0),
+        'total_tokens': usage.get('total_tokens', 0),
+    } if usage else {}
+
+
+async def _stream_texts(model_spec: ModelSpec, prompt: str) -> AsyncIterator[str]:
+    client = get_client(model_spec)
+    if model_spec.provider == "gemini":
+        response = await client.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+    elif model_spec.provider == "fireworks":
+        response = client.chat.completions.acreate(
+            model=model_spec.model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        )
+        async for chunk in response:
+            if chunk and chunk.choices and chunk.choices[0]:
+                yield chunk.choices[0].delta.content or ""
+    else:
+        async for chunk in client.astream(prompt):
+            yield chunk.content
+
+
+# SDK exceptions, by class name so checking them does not import the SDKs:
+# openai/anthropic/groq/xai timeouts and connection errors, httpx transport
+# errors, and google.api_core's deadline and 503 errors
+TRANSIENT_ERROR_NAMES = frozenset({
+    "APITimeoutError", "APIConnectionError", "TransportError",
+    "DeadlineExceeded", "ServiceUnavailable",
+})
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether retrying could help: timeouts, connection errors, 429 and 5xx."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    # status_code on openai-style errors, code on google.api_core ones
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def _backoff(attempt: int) -> float:
+    return min(0.5 * 2 ** attempt, 8) + random.uniform(0, 0.25)
+
+
+async def complete(prompt: str, model: str = "gpt-4o-mini", timeout: Optional[float] = None,
+                   retries: int = LLM_MAX_RETRIES) -> LLMResponse:
+    """Full answer to ``prompt`` from ``model``."""
+    model_spec = resolve(model)
+    if timeout is None:
+        timeout = LLM_ANSWER_TIMEOUT if model in ANSWER_MODELS else LLM_TIMEOUT
+    for attempt in range(retries + 1):
+        try:
+            text, usage = await asyncio.wait_for(_complete_once(model_spec, prompt), timeout)
+            return LLMResponse(text=text or "", model=model, usage=usage)
+        except Exception as e:
+            if not is_transient(e):
+                raise RuntimeError(f"{model} failed: {e!r}") from e
+            if attempt == retries:
+                raise RuntimeError(f"{model} failed after {attempt + 1} attempts: {e!r}") from e
+            logger.warning(f"{model} attempt {attempt + 1} failed, retrying: {e!r}")
+            await asyncio.sleep(_backoff(attempt))
+
+
+async def stream(prompt: str, model: str = "gpt-4o", timeout: float = LLM_STREAM_IDLE_TIMEOUT,
+                 retries: int = LLM_MAX_RETRIES) -> AsyncIterator[LLMChunk]:
+    """
+    Answer to ``prompt`` as it is generated. Empty chunks are dropped, and
+    a reasoning model's ``<think>`` section comes as ``reasoning`` chunks.
+    """
+    model_spec = resolve(model)
+    for attempt in range(retries + 1):
+        started = False
+        reasoning = model_spec.reasoning
+        texts = _stream_texts(model_spec, prompt)
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(texts.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+                if not text:
+                    continue
+                kind = "reasoning" if reasoning else "data"
+                if reasoning and '</think>' in text:
+                    reasoning = False
+                started = True
+                yield LLMChunk(text=text, kind=kind)
+        except Exception as e:
+            # Chunks already sent cannot be taken back
+            if started or attempt == retries or not is_transient(e):
+                raise RuntimeError(f"{model} stream failed: {e!r}") from e
+            logger.warning(f"{model} stream attempt {attempt + 1} failed, retrying: {e!r}")
+            await asyncio.sleep(_backoff(attempt))
+        finally:
+            await texts.aclose()
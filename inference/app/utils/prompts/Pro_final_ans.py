@@ -3,7 +3,7 @@ from typing import List, Optional
 
 # from app.utils.llms import answer_llm_pro as llm
 from app.schemas.prompt_context import FrameworkType, PromptContext
-from app.utils.llms import get_answer_llm
+from app.utils import llm_gateway
 from app.utils.prompts.agents.CodingAgent import generate_coding_agent_prompt
 from app.utils.prompts.agents.SocialMedia import \
     generate_social_media_content_prompt
@@ -190,13 +190,10 @@ FRAMEWORKS = {
 }
 
 
-def get_final_pro_answer(original_query, refined_query, context, initial_answer, is_stream=True, llm='gpt-4o'):
+async def get_final_pro_answer(prompt: str, llm: str = 'gpt-4o') -> str:
     try:
-
-        prompt = get_final_pro_answer_prompt(
-            original_query, refined_query, context, initial_answer, is_stream)
-        final_ans = get_answer_llm(llm).invoke(prompt)
-        return final_ans
+        final_ans = await llm_gateway.complete(prompt, llm)
+        return final_ans.text
     except Exception as e:
         raise RuntimeError(
             f"Error occurred while getting final answer for pro user: {e}")
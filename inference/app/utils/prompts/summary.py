@@ -1,7 +1,7 @@
-from app.utils.llms import summary_llm as llm
+from app.utils import llm_gateway
 
 
-def get_summary(context: str):
+async def get_summary(context: str):
     prompt = f"""
 You are a precise conversation summarizer for an AI assistant. Summarize the conversation history in 150 words or less, focusing on recent user-AI interactions and any details the user attaches to their identity. Follow these guidelines:
 1. Analyze the conversation pairs in provided context.
@@ -19,5 +19,5 @@ Use this structure:
 
 Strictly adhere to the 150-word limit. Prioritize recent interactions and user-specific information. Avoid repetition and irrelevant details. Provide a concise and informative summary.
 User's context with user and AI chats: {context}"""
-    summary = llm.invoke(prompt)
-    return summary
+    summary = await llm_gateway.complete(prompt, "summary")
+    return summary.text
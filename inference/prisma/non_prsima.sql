@@ -1,8 +1,30 @@
+-- Hash-partitioned by user like "Memory"; existing databases are converted
+-- with content-processor's python -m app.partition_tables
 CREATE TABLE memory_search_vector (
-    memId TEXT,
-    chunkId TEXT,
+    userId TEXT NOT NULL,
+    memId TEXT NOT NULL,
+    chunkId TEXT NOT NULL,
     search_vector tsvector,
-    PRIMARY KEY (memId, chunkId)
-);
+    PRIMARY KEY (userId, memId, chunkId)
+) PARTITION BY HASH (userId);
 
-CREATE INDEX idx_memory_search_vector ON memory_search_vector USING GIN (search_vector);
\ No newline at end of file
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE memory_search_vector_p%s PARTITION OF memory_search_vector FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            i, i);
+    END LOOP;
+END $$;
+
+CREATE INDEX idx_memory_search_vector ON memory_search_vector USING GIN (search_vector);
+
+-- Memory.chunkIndex backfill for rows written before the column existed.
+-- content-processor runs the same thing in batches: python -m app.backfill_chunk_index
+ALTER TABLE "Memory" ADD COLUMN IF NOT EXISTS "chunkIndex" INTEGER;
+
+UPDATE "Memory" SET "chunkIndex" = substring("chunkId" from '([0-9]+)$')::int
+WHERE "chunkIndex" IS NULL AND "chunkId" ~ '(^|_)[0-9]+$';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "Memory_userId_memId_chunkIndex_idx" ON "Memory" ("userId", "memId", "chunkIndex");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "Memory_chunkId_idx" ON "Memory" ("chunkId");
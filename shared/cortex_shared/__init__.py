@@ -0,0 +1 @@
+"""Code used by both the content-processor and inference services."""
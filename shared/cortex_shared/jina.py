@@ -0,0 +1,134 @@
+"""
+Jina API key rotation and the process-wide aiohttp session, shared by the
+JinaAIClient of both services.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Mapping, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+JINA_MAX_CONNECTIONS = int(os.getenv("JINA_MAX_CONNECTIONS", "100"))
+JINA_MAX_CONNECTIONS_PER_HOST = int(
+    os.getenv("JINA_MAX_CONNECTIONS_PER_HOST", "20"))
+# Out of balance or revoked keys are parked for this long
+JINA_EXHAUSTED_COOLDOWN = float(os.getenv("JINA_EXHAUSTED_COOLDOWN", "3600"))
+JINA_MAX_COOLDOWN = 60.0
+
+# Statuses that are about the key rather than the request: revoked (401),
+# out of balance (402) or rate limited (429). Anything else, including a 403
+# from a site the reader could not fetch, is returned to the caller.
+KEY_REJECTED_STATUSES = (401, 402, 429)
+
+
+def load_api_keys() -> List[str]:
+    """JINA_API_KEY_1 .. JINA_API_KEY_<TOTAL_JINA_AI_API_KEYS> from the environment."""
+    total = int(os.getenv("TOTAL_JINA_AI_API_KEYS", "1"))
+    return [os.getenv(f"JINA_API_KEY_{i}") for i in range(1, total + 1)]
+
+
+@dataclass
+class KeyState:
+    key: str
+    cooldown_until: float = 0.0
+    consecutive_429: int = 0
+    remaining: Optional[int] = None
+    in_flight: int = 0
+
+
+class JinaKeyPool:
+    """
+    Picks API keys by observed quota instead of uniformly at random.
+
+    Keys that return 429 cool down with exponential backoff (or for
+    Retry-After), keys reporting an exhausted balance are parked, and among
+    the usable keys the one with the most remaining quota and fewest
+    requests in flight wins. Safe to share between the event loop and
+    worker threads.
+    """
+
+    def __init__(self, keys: List[str]):
+        keys = [key for key in keys if key] or [os.getenv("JINA_API_KEY_1")]
+        self.keys = [KeyState(key) for key in keys]
+        self.lock = threading.Lock()
+
+    def acquire(self) -> KeyState:
+        with self.lock:
+            now = time.monotonic()
+            available = [k for k in self.keys if k.cooldown_until <= now]
+            if not available:
+                # Everything is cooling down; the caller waits for the first one
+                state = min(self.keys, key=lambda k: k.cooldown_until)
+            else:
+                random.shuffle(available)
+                state = max(available, key=lambda k: (
+                    k.remaining if k.remaining is not None else float("inf"), -k.in_flight))
+            state.in_flight += 1
+            return state
+
+    def wait_time(self, state: KeyState) -> float:
+        return max(0.0, state.cooldown_until - time.monotonic())
+
+    def release(self, state: KeyState, status: Optional[int], headers: Optional[Mapping[str, str]] = None) -> None:
+        headers = headers or {}
+        with self.lock:
+            state.in_flight -= 1
+            now = time.monotonic()
+            if status == 429:
+                state.consecutive_429 += 1
+                retry_after = headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else min(
+                    JINA_MAX_COOLDOWN, 2 ** state.consecutive_429) * random.uniform(0.5, 1.0)
+                state.cooldown_until = now + delay
+                logger.warning(
+                    f"Jina key ...{state.key[-4:]} rate limited, cooling down {delay:.1f}s")
+            elif status in (401, 402):
+                state.cooldown_until = now + JINA_EXHAUSTED_COOLDOWN
+                state.remaining = 0
+                logger.error(
+                    f"Jina key ...{state.key[-4:]} rejected with {status}, parking it")
+            elif status is not None and status < 400:
+                state.consecutive_429 = 0
+                remaining = headers.get("X-RateLimit-Remaining")
+                if remaining is not None and remaining.isdigit():
+                    state.remaining = int(remaining)
+                    if state.remaining == 0:
+                        reset = headers.get("X-RateLimit-Reset", "1")
+                        state.cooldown_until = now + \
+                            (float(reset) if reset.isdigit() else 1.0)
+
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_session(timeout: float) -> aiohttp.ClientSession:
+    """Process-wide aiohttp session, recreated if its event loop changed."""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=JINA_MAX_CONNECTIONS,
+                limit_per_host=JINA_MAX_CONNECTIONS_PER_HOST,
+                keepalive_timeout=30,
+            ),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+        _session_loop = loop
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
@@ -0,0 +1,81 @@
+"""
+Lazy registry for SDK clients.
+
+Importing anthropic, openai, fireworks, boto3, voyageai and friends costs
+seconds on a Lambda cold start, and most requests only need one or two of
+them. Modules register a factory under a name instead of constructing the
+client at import time; the factory, including its SDK import, runs on first
+use and the client is reused after that.
+
+``register`` returns a proxy that forwards attribute access to the client,
+so module-level names such as ``openai_client`` keep working unchanged.
+Only attribute access, attribute assignment and calls are forwarded. Python
+looks special methods up on the type, so ``isinstance``, ``with``,
+iteration, ``len`` and operators see the proxy; use ``get(name)`` for those.
+"""
+import importlib
+import threading
+from typing import Any, Callable, Dict, List
+
+_factories: Dict[str, Callable[[], Any]] = {}
+_instances: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+class LazyProvider:
+    """
+    Stands in for a registered client until it is first used.
+
+    Forwards ``getattr``, ``setattr`` and calls only; see the module docstring.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(get(self._name), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(get(self._name), attr, value)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return get(self._name)(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._name in _instances else "not loaded"
+        return f"<LazyProvider {self._name} ({state})>"
+
+
+def register(name: str, factory: Callable[[], Any]) -> LazyProvider:
+    """Register ``factory`` under ``name``; the client is built on first use."""
+    with _lock:
+        if name in _factories:
+            raise ValueError(f"A provider is already registered as {name}")
+        _factories[name] = factory
+    return LazyProvider(name)
+
+
+def get(name: str) -> Any:
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _lock:
+        # Another thread may have built it while this one waited
+        if name not in _instances:
+            if name not in _factories:
+                raise KeyError(f"No provider registered as {name}")
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+def loaded() -> List[str]:
+    """Names of the providers built so far, for diagnostics."""
+    return sorted(_instances)
+
+
+def lazy_import(module: str) -> Any:
+    """A module that is only imported when one of its attributes is used."""
+    name = f"module:{module}"
+    if name in _factories:
+        return LazyProvider(name)
+    return register(name, lambda: importlib.import_module(module))